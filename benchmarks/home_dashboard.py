@@ -0,0 +1,301 @@
+# benchmarks/home_dashboard.py
+"""
+Benchmark und Statement-Zählung der Startseite (home.index).
+
+Pro Größe (Standard: 1000, 10000 Aufträge) wird eine frische SQLite-DB mit
+gemischten Aufträgen befüllt (alle Status und Kostenstellen, mit/ohne
+E-Mail, Rechnungen in mehreren Versionen, teils versendet). Dann:
+
+- Vergleich: count_dashboard() (ein SELECT) muss dieselben Zahlen liefern
+  wie die früheren acht Einzel-COUNTs (legacy_counts unten),
+- Zeit pro Aufruf für beide Varianten und für den Zähler-Cache (--repeat),
+- Zähler-Cache nach Änderungen über die ORM (Status, neue Rechnung,
+  E-Mail eines Instituts) gegen frisch gezählte Werte,
+- GET / mit Zählung aller SQL-Statements; mehr als MAX_STATEMENTS -> Fehler.
+
+Aufruf (aus dem Projekt-Root):
+    python -m benchmarks.home_dashboard --sizes 1000 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmarks.invoice_pipeline import RESULTS_DIR, _git_revision, _stats
+
+DEFAULT_SIZES = (1000, 10000)
+# home.index: letzte Aufträge + (nur nach Änderungen) Zähler
+MAX_STATEMENTS = 2
+
+
+def seed_dashboard_dataset(n: int) -> None:
+    """n Aufträge mit zufälligem Status/Kostenstelle, 0–3 Rechnungsversionen je Auftrag."""
+    from sqlalchemy.exc import IntegrityError
+
+    from lsb_app.extensions import db
+    from lsb_app.models import AuftragsStatusEnum, KostenstelleEnum, RechnungsStatusEnum
+    from seed import (AngehoerigerHas, AuftragHas, RechnungHas, create_address, create_angehoeriger,
+                      create_auftrag, create_behoerde, create_bestattungsinstitut, create_patient,
+                      create_rechnung)
+
+    random.seed(n)
+    institute = []
+    while len(institute) < 20:
+        # kurzbezeichnung ist unique, Faker wiederholt sich gelegentlich
+        try:
+            with db.session.begin_nested():
+                institute.append(create_bestattungsinstitut())
+        except IntegrityError:
+            pass
+    for institut in institute[::2]:
+        institut.email = None
+    behoerden = [create_behoerde() for _ in range(10)]
+    for behoerde in behoerden[::2]:
+        behoerde.email = None
+
+    today = date.today()
+    for i in range(n):
+        patient = create_patient()
+        status = random.choice(list(AuftragsStatusEnum))
+        kostenstelle = random.choice(list(KostenstelleEnum))
+        auftrag = create_auftrag(
+            has=AuftragHas(bestattungsinstitut_id=True, wait_due_date=True),
+            status=status,
+            kostenstelle=kostenstelle,
+            patient_id=patient.id,
+            auftragsnummer=10000 + i,
+            auftragsdatum=today - timedelta(days=random.randint(0, 60)),
+            auftragsadresse_id=create_address().id,
+            bestattungsinstitut_id=random.choice(institute).id if random.random() < 0.7 else None,
+            wait_due_date=today + timedelta(days=random.randint(-10, 10)) if random.random() < 0.5 else None,
+        )
+        if kostenstelle == KostenstelleEnum.ANGEHOERIGE:
+            create_angehoeriger(
+                patient,
+                has=AngehoerigerHas(name=True, vorname=True, email=random.random() < 0.5, adresse=True),
+                adresse=patient.meldeadresse,
+            )
+        elif kostenstelle == KostenstelleEnum.BEHOERDE:
+            auftrag.behoerden.append(random.choice(behoerden))
+
+        for version in range(1, random.randint(0, 3) + 1):
+            sent = random.random() < 0.5
+            create_rechnung(
+                auftrag.id,
+                has=RechnungHas(gesendet_datum=True),
+                version=version,
+                status=RechnungsStatusEnum.SENT if sent else random.choice(list(RechnungsStatusEnum)),
+                gesendet_datum=datetime.now() - timedelta(days=random.randint(0, 90)) if sent else None,
+            )
+
+        if i % 500 == 499:
+            db.session.commit()
+    db.session.commit()
+
+
+def legacy_counts() -> dict:
+    """Die früheren acht COUNTs von home.index (Referenz für den Vergleich)."""
+    from sqlalchemy import and_, func
+
+    from lsb_app.extensions import db
+    from lsb_app.models import Auftrag, AuftragsStatusEnum, Rechnung, RechnungsStatusEnum
+    from lsb_app.services.auftrag_filters import (ready_for_email_filter, ready_for_inquiry_filter,
+                                                  ready_for_post_filter)
+
+    def count(*conditions, latest=None):
+        query = db.session.query(func.count(Auftrag.id))
+        if latest is not None:
+            query = query.join(latest, latest.c.auftrag_id == Auftrag.id).join(
+                Rechnung,
+                and_(Rechnung.auftrag_id == latest.c.auftrag_id, Rechnung.version == latest.c.max_version),
+            )
+        return query.filter(*conditions).scalar()
+
+    def latest_rechnung():
+        return (
+            db.session.query(Rechnung.auftrag_id.label("auftrag_id"), func.max(Rechnung.version).label("max_version"))
+            .group_by(Rechnung.auftrag_id)
+            .subquery()
+        )
+
+    cutoff = datetime.now() - timedelta(days=30)
+    return {
+        "ready_email_count": count(ready_for_email_filter()),
+        "ready_post_count": count(ready_for_post_filter()),
+        "print_count": count(Auftrag.status == AuftragsStatusEnum.PRINT),
+        "todo_count": count(Auftrag.status == AuftragsStatusEnum.TODO),
+        "inquiry_count": count(ready_for_inquiry_filter()),
+        "wait_overdue_count": count(
+            Auftrag.status == AuftragsStatusEnum.WAIT,
+            Auftrag.wait_due_date.isnot(None),
+            Auftrag.wait_due_date < date.today(),
+        ),
+        "overdue_count": count(
+            Auftrag.status == AuftragsStatusEnum.SENT,
+            Rechnung.gesendet_datum.isnot(None),
+            Rechnung.gesendet_datum <= cutoff,
+            latest=latest_rechnung(),
+        ),
+        "sent_count": count(
+            Auftrag.status != AuftragsStatusEnum.DONE,
+            Rechnung.status == RechnungsStatusEnum.SENT,
+            latest=latest_rechnung(),
+        ),
+    }
+
+
+@contextmanager
+def count_statements(engine):
+    """Sammelt alle SQL-Statements, die im Block auf engine laufen."""
+    from sqlalchemy import event
+
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def run_size(n: int, repeat: int) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f"lsb_homebench_{n}_"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["RECHNUNG_PRERENDER"] = "0"
+    os.environ["DISTANCE_BACKFILL"] = "0"
+    os.environ["DASHBOARD_COUNTER_CACHE"] = "1"
+
+    from dataclasses import asdict
+
+    from lsb_app import create_app
+    from lsb_app.extensions import db
+    from lsb_app.services.dashboard import count_dashboard, dashboard_counts
+
+    app = create_app()
+    app.instance_path = str(workdir / "instance")
+    result: dict = {"size": n}
+
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        seed_dashboard_dataset(n)
+        result["seed_s"] = round(time.perf_counter() - t0, 3)
+
+        counts = asdict(count_dashboard())
+        legacy = legacy_counts()
+        if counts != legacy:
+            raise AssertionError(f"Zähler weichen ab: neu {counts}, bisher {legacy}")
+        result["counts"] = counts
+
+        result["legacy_counts"] = _stats([_time(legacy_counts) for _ in range(repeat)])
+        result["count_dashboard"] = _stats([_time(count_dashboard) for _ in range(repeat)])
+
+        # der Cache zählt "überfällig" ab Tagesbeginn
+        day_start = datetime.combine(date.today(), datetime.min.time())
+        _check_cache(dashboard_counts(), count_dashboard(now=day_start), "nach dem Aufbau")
+        result["cached_counts"] = _stats([_time(dashboard_counts) for _ in range(repeat)])
+        result["cache_refresh"] = _stats([_time(lambda: _mutate_and_read(dashboard_counts)) for _ in range(repeat)])
+        _check_cache(dashboard_counts(), count_dashboard(now=day_start), "nach Änderungen")
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    client.get("/")  # Warm-up (Templates kompilieren)
+    with app.app_context():
+        # eine Änderung, damit der Aufruf die Zähler tatsächlich nachzieht
+        _mutate_and_read(lambda: None)
+        db.session.remove()
+    with count_statements(engine) as statements:
+        resp = client.get("/")
+    if resp.status_code != 200:
+        raise AssertionError(f"GET / lieferte {resp.status_code}")
+    if len(statements) > MAX_STATEMENTS:
+        raise AssertionError(
+            f"GET / braucht {len(statements)} Statements (höchstens {MAX_STATEMENTS}):\n"
+            + "\n---\n".join(statements)
+        )
+    result["home_statements"] = len(statements)
+    return result
+
+
+def _mutate_and_read(read) -> None:
+    """Ein paar Änderungen wie im Alltag committen, dann die Zähler lesen."""
+    from lsb_app.extensions import db
+    from lsb_app.models import Auftrag, AuftragsStatusEnum, Bestattungsinstitut, RechnungsStatusEnum
+    from seed import RechnungHas, create_rechnung
+
+    auftraege = db.session.query(Auftrag).order_by(db.func.random()).limit(3).all()
+    auftraege[0].status = random.choice(list(AuftragsStatusEnum))
+    create_rechnung(
+        auftraege[1].id,
+        has=RechnungHas(gesendet_datum=True),
+        version=max((r.version for r in auftraege[1].rechnungen), default=0) + 1,
+        status=RechnungsStatusEnum.SENT,
+        gesendet_datum=datetime.now() - timedelta(days=random.randint(0, 60)),
+    )
+    institut = db.session.query(Bestattungsinstitut).order_by(db.func.random()).first()
+    institut.email = None if institut.email else "neu@example.com"
+    db.session.commit()
+    read()
+
+
+def _check_cache(cached, fresh, when: str) -> None:
+    if cached != fresh:
+        raise AssertionError(f"Zähler-Cache {when} falsch: Cache {cached}, DB {fresh}")
+
+
+def _time(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Kommagetrennte Anzahl Aufträge (Standard: 1000,10000)")
+    parser.add_argument("--repeat", type=int, default=20, help="Messungen pro Variante")
+    parser.add_argument("--out", type=Path, help="JSON-Datei (Standard: benchmarks/results/home_dashboard_<zeit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        print(f"== {n} Aufträge ==", flush=True)
+        res = run_size(n, args.repeat)
+        for variant in ("legacy_counts", "count_dashboard", "cached_counts", "cache_refresh"):
+            st = res[variant]
+            print(f"  {variant:<16} median={st['median_ms']:9.3f} ms  p95={st['p95_ms']:9.3f} ms")
+        print(f"  GET /            {res['home_statements']} Statement(s) (höchstens {MAX_STATEMENTS})")
+        results.append(res)
+
+    report = {
+        "benchmark": "home_dashboard",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    out = args.out or RESULTS_DIR / f"home_dashboard_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Ergebnis: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# benchmarks/invoice_pipeline.py
+"""
+Benchmark der Rechnungs-Pipeline auf geseedeten Datensätzen.
+
+Pro Datensatzgröße (Standard: 100, 1000, 10000 Aufträge) wird eine frische
+SQLite-DB in einem Temp-Verzeichnis mit den Buildern aus seed.py befüllt
+(Distanz ist gesetzt -> keine Netzwerkzugriffe). Gemessen werden:
+
+- build_rechnung_vm                 (alle Aufträge)
+- render_template(standard.html)    (alle Aufträge)
+- HTML.write_pdf()                  (Stichprobe, --pdf-limit)
+- POST /rechnungen/send-batch-post  (Stichprobe, --flow-limit; bis der Job fertig ist, 0 = aus)
+
+PDF-Cache und Vorab-Rendering sind abgeschaltet, damit jede Messung
+tatsächlich rendert. Ergebnis als JSON (--out) zum Vergleich zwischen
+Releases.
+
+Aufruf (aus dem Projekt-Root):
+    python -m benchmarks.invoice_pipeline --sizes 100,1000 --pdf-limit 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+DEFAULT_SIZES = (100, 1000, 10000)
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _stats(samples: list[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "n": len(samples),
+        "total_s": round(sum(samples), 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+    }
+
+
+def _timed(fn, items) -> tuple[list[float], list]:
+    times, out = [], []
+    for item in items:
+        t0 = time.perf_counter()
+        out.append(fn(item))
+        times.append(time.perf_counter() - t0)
+    return times, out
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except Exception:
+        return None
+
+
+def seed_dataset(n: int) -> None:
+    """
+    n READY-Aufträge, älter als 3 Tage, gemischt:
+    - Angehörige ohne E-Mail (Postversand mit Anschreiben)
+    - Bestattungsinstitut mit E-Mail (E-Mail-Versand)
+    - Behörde ohne E-Mail (Postversand)
+    """
+    from sqlalchemy.exc import IntegrityError
+
+    from lsb_app.extensions import db
+    from lsb_app.models import AuftragsStatusEnum, KostenstelleEnum
+    from seed import (AngehoerigerHas, AuftragHas, create_address, create_angehoeriger,
+                      create_auftrag, create_behoerde, create_bestattungsinstitut, create_patient)
+
+    random.seed(n)
+    institute = []
+    while len(institute) < 20:
+        # kurzbezeichnung ist unique, Faker wiederholt sich gelegentlich
+        try:
+            with db.session.begin_nested():
+                institute.append(create_bestattungsinstitut())
+        except IntegrityError:
+            pass
+    behoerden = [create_behoerde() for _ in range(10)]
+    for b in behoerden:
+        b.email = None
+
+    for i in range(n):
+        patient = create_patient()
+        common = dict(
+            status=AuftragsStatusEnum.READY,
+            patient_id=patient.id,
+            auftragsnummer=10000 + i,
+            auftragsdatum=date.today() - timedelta(days=random.randint(4, 30)),
+        )
+
+        if i % 3 == 0:
+            create_angehoeriger(
+                patient,
+                has=AngehoerigerHas(name=True, vorname=True, telefonnummer=True, adresse=True),
+                adresse=patient.meldeadresse,
+            )
+            create_auftrag(
+                kostenstelle=KostenstelleEnum.ANGEHOERIGE,
+                auftragsadresse_id=patient.meldeadresse_id,
+                **common,
+            )
+        elif i % 3 == 1:
+            create_auftrag(
+                has=AuftragHas(bestattungsinstitut_id=True),
+                kostenstelle=KostenstelleEnum.BESTATTUNGSINSTITUT,
+                bestattungsinstitut_id=random.choice(institute).id,
+                auftragsadresse_id=create_address().id,
+                **common,
+            )
+        else:
+            auftrag = create_auftrag(
+                kostenstelle=KostenstelleEnum.BEHOERDE,
+                auftragsadresse_id=create_address().id,
+                **common,
+            )
+            auftrag.behoerden.append(random.choice(behoerden))
+
+        if i % 500 == 499:
+            db.session.commit()
+    db.session.commit()
+
+
+def run_size(n: int, pdf_limit: int, flow_limit: int) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f"lsb_bench_{n}_"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["PDF_CACHE_ENABLED"] = "0"
+    os.environ["RECHNUNG_PRERENDER"] = "0"
+
+    from flask import render_template
+    from sqlalchemy.orm import selectinload
+    from weasyprint import HTML
+
+    from lsb_app import create_app
+    from lsb_app.extensions import db
+    from lsb_app.models import Auftrag, Patient
+    from lsb_app.services.auftrag_filters import ready_for_post_filter
+    from lsb_app.services.pdf_assets import PDF_BASE_URL, app_asset_fetcher
+    from lsb_app.services.pdf_styles import RECHNUNG_CSS, pdf_style_kwargs
+    from lsb_app.services.rechnung_vm_factory import build_rechnung_vm
+
+    app = create_app()
+    app.instance_path = str(workdir / "instance")
+    app.config["WTF_CSRF_ENABLED"] = False
+    result: dict = {"size": n}
+
+    with app.app_context():
+        db.create_all()
+
+        t0 = time.perf_counter()
+        seed_dataset(n)
+        result["seed_s"] = round(time.perf_counter() - t0, 3)
+
+        auftraege = (
+            db.session.query(Auftrag)
+            .options(
+                selectinload(Auftrag.patient).selectinload(Patient.angehoerige),
+                selectinload(Auftrag.auftragsadresse),
+                selectinload(Auftrag.bestattungsinstitut),
+            )
+            .order_by(Auftrag.id)
+            .all()
+        )
+        today = date.today()
+
+        vm_times, vms = _timed(
+            lambda a: build_rechnung_vm(auftrag=a, cfg=app.config, rechnungsdatum=today, rechnungsart="RECHNUNG"),
+            auftraege,
+        )
+        with app.test_request_context():
+            html_times, html_strs = _timed(
+                lambda vm: render_template("rechnungen/standard.html", vm=vm, pdf=True),
+                vms,
+            )
+
+        fetcher = app_asset_fetcher()
+        pdf_sample = html_strs[:pdf_limit]
+        if pdf_sample:
+            # Warm-up: Stylesheet/Fonts kompilieren, nicht mitmessen
+            HTML(string=pdf_sample[0], base_url=PDF_BASE_URL, url_fetcher=fetcher).write_pdf(
+                **pdf_style_kwargs(RECHNUNG_CSS)
+            )
+        pdf_times, _ = _timed(
+            lambda html_str: HTML(string=html_str, base_url=PDF_BASE_URL, url_fetcher=fetcher).write_pdf(
+                **pdf_style_kwargs(RECHNUNG_CSS)
+            ),
+            pdf_sample,
+        )
+
+        result["stages"] = {
+            "build_rechnung_vm": _stats(vm_times),
+            "render_template": _stats(html_times),
+            "write_pdf": _stats(pdf_times),
+        }
+
+        post_ids = [
+            a.id for a in db.session.query(Auftrag.id)
+            .filter(ready_for_post_filter())
+            .order_by(Auftrag.id)
+            .limit(flow_limit)
+        ]
+        db.session.remove()
+
+    # --flow-limit 0 oder keine versandbereiten Aufträge: die Route leitet dann
+    # ohne Job zurück auf das Formular, es gibt nichts zu messen
+    result["send_batch_post"] = _send_batch_post(app, post_ids) if post_ids else None
+    return result
+
+
+def _send_batch_post(app, post_ids: list[int]) -> dict:
+    from lsb_app.services.batch_jobs import wait_for_job
+
+    client = app.test_client()
+    t0 = time.perf_counter()
+    resp = client.post("/rechnungen/send-batch-post", data={"auftrag_ids": [str(i) for i in post_ids]})
+    # POST startet einen Hintergrund-Job und leitet auf /rechnungen/jobs/<id> weiter
+    location = resp.headers.get("Location", "")
+    head, _, job_part = location.rstrip("/").rpartition("/")
+    if not head.endswith("/jobs") or not job_part.isdigit():
+        raise RuntimeError(f"send-batch-post hat keinen Job gestartet (Status {resp.status_code}, Location {location!r})")
+    with app.app_context():
+        summary = wait_for_job(int(job_part))
+    flow_s = time.perf_counter() - t0
+    return {
+        "n": len(post_ids),
+        "status": resp.status_code,
+        "job_status": summary["status"] if summary else None,
+        "total_s": round(flow_s, 3),
+        "per_auftrag_ms": round(flow_s / len(post_ids) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Kommagetrennte Datensatzgrößen (Standard: 100,1000,10000)")
+    parser.add_argument("--pdf-limit", type=int, default=100, help="Anzahl PDFs für die write_pdf-Messung")
+    parser.add_argument("--flow-limit", type=int, default=100, help="Aufträge im send_batch_post-Durchlauf")
+    parser.add_argument("--out", type=Path, help="JSON-Datei (Standard: benchmarks/results/invoice_pipeline_<zeit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        print(f"== {n} Aufträge ==", flush=True)
+        res = run_size(n, args.pdf_limit, args.flow_limit)
+        for stage, st in res["stages"].items():
+            if st["n"]:
+                print(f"  {stage:<18} n={st['n']:<6} median={st['median_ms']:9.3f} ms  p95={st['p95_ms']:9.3f} ms")
+        flow = res["send_batch_post"]
+        if flow:
+            print(f"  send_batch_post    n={flow['n']:<6} total={flow['total_s']:.3f} s  (Job {flow['job_status']})")
+        else:
+            print("  send_batch_post    übersprungen (keine Aufträge)")
+        results.append(res)
+
+    import weasyprint
+
+    report = {
+        "benchmark": "invoice_pipeline",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "weasyprint": getattr(weasyprint, "__version__", None),
+        "pdf_limit": args.pdf_limit,
+        "flow_limit": args.flow_limit,
+        "results": results,
+    }
+
+    out = args.out or RESULTS_DIR / f"invoice_pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Ergebnis: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# benchmarks/mail_throughput.py
+"""
+Benchmark des Batch-Mailversands gegen die lokale Mail-Sandbox.
+
+Pro Größe (Standard: 10, 100, 1000 Rechnungen) wird eine frische SQLite-DB
+mit READY-Aufträgen (Bestattungsinstitut mit E-Mail) befüllt, eine
+MailSandbox (SMTP-Sink + IMAP-Ablage, siehe lsb_app/services/mail_sandbox.py)
+gestartet und der komplette Weg durchlaufen:
+
+- POST /rechnungen/send-batch, Hintergrund-Job bis zum Ende:
+    create   Rechnungen anlegen
+    render   PDFs rendern
+    enqueue  MIME bauen + in die Outbox
+- Outbox-Worker (einmalig) bis die Outbox leer ist:
+    smtp     erste bis letzte Zustellung (laut Outbox)
+    imap     Summe der IMAP-Sitzungen (laut Sandbox)
+
+Ausgegeben werden Mails/s und die Zeit pro Phase; Ergebnis als JSON (--out).
+Die Phasen des Jobs werden aus den Zeitpunkten seiner Fortschritts-Events
+abgeleitet (letztes Event der jeweiligen Stufe).
+
+Aufruf (aus dem Projekt-Root):
+    python -m benchmarks.mail_throughput --sizes 10,100 --concurrency 3 --delay 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmarks.invoice_pipeline import RESULTS_DIR, _git_revision
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+def seed_email_dataset(n: int) -> None:
+    """n READY-Aufträge, älter als 3 Tage, Kostenstelle Bestattungsinstitut mit E-Mail."""
+    from sqlalchemy.exc import IntegrityError
+
+    from lsb_app.extensions import db
+    from lsb_app.models import AuftragsStatusEnum, KostenstelleEnum
+    from seed import AuftragHas, create_address, create_auftrag, create_bestattungsinstitut, create_patient
+
+    random.seed(n)
+    institute = []
+    while len(institute) < 20:
+        # kurzbezeichnung ist unique, Faker wiederholt sich gelegentlich
+        try:
+            with db.session.begin_nested():
+                institut = create_bestattungsinstitut()
+                institut.email = f"institut{len(institute)}@example.com"
+                institute.append(institut)
+        except IntegrityError:
+            pass
+
+    for i in range(n):
+        patient = create_patient()
+        create_auftrag(
+            has=AuftragHas(bestattungsinstitut_id=True),
+            status=AuftragsStatusEnum.READY,
+            patient_id=patient.id,
+            auftragsnummer=10000 + i,
+            auftragsdatum=date.today() - timedelta(days=random.randint(4, 30)),
+            kostenstelle=KostenstelleEnum.BESTATTUNGSINSTITUT,
+            bestattungsinstitut_id=random.choice(institute).id,
+            auftragsadresse_id=create_address().id,
+        )
+        if i % 500 == 499:
+            db.session.commit()
+    db.session.commit()
+
+
+def _watch_job(job_id: int, t0: float) -> tuple[dict, dict]:
+    """Verfolgt die Events des Jobs; (Zusammenfassung, Stufe -> Sekunden seit t0 des letzten Events)."""
+    from lsb_app.services.batch_jobs import get_progress
+
+    progress = get_progress(job_id)
+    stage_end: dict[str, float] = {}
+    seq = 0
+    while True:
+        events, finished = progress.events_after(seq, timeout=1.0)
+        now = time.perf_counter() - t0
+        for ev in events:
+            seq = ev["seq"]
+            stage_end[ev["stage"]] = now
+        if finished and not events:
+            return progress.summary(), stage_end
+
+
+def run_size(n: int, concurrency: int, rate: float, delay: float) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f"lsb_mailbench_{n}_"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["PDF_CACHE_ENABLED"] = "0"
+    os.environ["RECHNUNG_PRERENDER"] = "0"
+
+    from lsb_app import create_app
+    from lsb_app.extensions import db
+    from lsb_app.models import Auftrag, OutboxMessage
+    from lsb_app.services.auftrag_filters import ready_for_email_filter
+    from lsb_app.services.batch_jobs import STAGE_CREATED, STAGE_QUEUED, STAGE_RENDERED
+    from lsb_app.services.mail_outbox import OutboxSettings, batch_report, run_worker
+    from lsb_app.services.mail_sandbox import MailSandbox
+    from lsb_app.services.mail_transport import MailSettings
+
+    app = create_app()
+    app.instance_path = str(workdir / "instance")
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["OUTBOX_CONCURRENCY"] = concurrency
+    app.config["MAIL_RATE_PER_MINUTE"] = rate
+    result: dict = {"size": n}
+
+    with MailSandbox(delay=delay) as sandbox:
+        app.config.update(sandbox.config())
+
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            seed_email_dataset(n)
+            result["seed_s"] = round(time.perf_counter() - t0, 3)
+            ids = [a.id for a in db.session.query(Auftrag.id).filter(ready_for_email_filter()).order_by(Auftrag.id)]
+            db.session.remove()
+
+        client = app.test_client()
+        t0 = time.perf_counter()
+        resp = client.post("/rechnungen/send-batch", data={"auftrag_ids": [str(i) for i in ids]})
+        job_id = int(resp.headers["Location"].rstrip("/").rsplit("/", 1)[-1])
+        with app.app_context():
+            summary, stage_end = _watch_job(job_id, t0)
+        job_s = time.perf_counter() - t0
+
+        with app.app_context():
+            t1 = time.perf_counter()
+            run_worker(MailSettings.from_config(app.config), OutboxSettings.from_config(app.config), once=True)
+            deliver_s = time.perf_counter() - t1
+
+            batch_id = summary["result"].get("outbox_batch_id")
+            report = batch_report(batch_id) if batch_id else None
+            outbox_total = db.session.query(OutboxMessage).count()
+            db.session.remove()
+
+        stats = sandbox.stats()
+
+    created = stage_end.get(STAGE_CREATED, 0.0)
+    rendered = stage_end.get(STAGE_RENDERED, created)
+    queued = stage_end.get(STAGE_QUEUED, rendered)
+    total_s = job_s + deliver_s
+    sent = report.sent if report else 0
+
+    result.update({
+        "job_status": summary["status"],
+        "queued": outbox_total,
+        "sent": sent,
+        "failed": report.failed if report else 0,
+        "phases_s": {
+            "create": round(created, 3),
+            "render": round(rendered - created, 3),
+            "enqueue": round(queued - rendered, 3),
+            "job_total": round(job_s, 3),
+            "smtp": round(report.send_seconds, 3) if report and report.send_seconds is not None else None,
+            "imap": round(stats["imap"]["seconds"], 3),
+            "deliver_total": round(deliver_s, 3),
+        },
+        "total_s": round(total_s, 3),
+        "messages_per_second": round(sent / total_s, 2) if total_s else None,
+        "delivery_messages_per_second": round(sent / deliver_s, 2) if deliver_s else None,
+        "sandbox": stats,
+    })
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Kommagetrennte Anzahl Rechnungen (Standard: 10,100,1000)")
+    parser.add_argument("--concurrency", type=int, default=3, help="OUTBOX_CONCURRENCY (SMTP-Verbindungen)")
+    parser.add_argument("--rate", type=float, default=0, help="MAIL_RATE_PER_MINUTE (0 = unbegrenzt)")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Simulierte Serverlatenz pro Nachricht in der Sandbox (Sekunden)")
+    parser.add_argument("--out", type=Path, help="JSON-Datei (Standard: benchmarks/results/mail_throughput_<zeit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        print(f"== {n} Rechnungen ==", flush=True)
+        res = run_size(n, args.concurrency, args.rate, args.delay)
+        for phase, seconds in res["phases_s"].items():
+            if seconds is not None:
+                print(f"  {phase:<14} {seconds:9.3f} s")
+        print(f"  gesendet {res['sent']}/{res['queued']} (Job {res['job_status']}), "
+              f"{res['messages_per_second']} Mails/s gesamt, {res['delivery_messages_per_second']} Mails/s Zustellung")
+        results.append(res)
+
+    report = {
+        "benchmark": "mail_throughput",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "rate_per_minute": args.rate,
+        "sandbox_delay_s": args.delay,
+        "results": results,
+    }
+
+    out = args.out or RESULTS_DIR / f"mail_throughput_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Ergebnis: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/pdf_merge.py
+"""
+Benchmark des Sammel-PDF-Merges (lsb_app/services/pdf_merge.py).
+
+Pro Größe (Standard: 30, 300 Eingaben) werden synthetische PDFs in einem
+Temp-Verzeichnis erzeugt, die alle dieselbe Ressource (--shared-kb, wie
+Font/Logo) einbetten, und zweimal zusammengefügt:
+
+- ohne Messung     (wie im Betrieb: Laufzeit)
+- measure_memory   (tracemalloc: Spitzen-Speicher; deutlich langsamer)
+
+Ergebnis als JSON (--out).
+
+Aufruf (aus dem Projekt-Root):
+    python -m benchmarks.pdf_merge --sizes 30,300 --shared-kb 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from benchmarks.invoice_pipeline import RESULTS_DIR, _git_revision
+from lsb_app.services.pdf_merge import merge_pdf_files
+
+DEFAULT_SIZES = (30, 300)
+
+
+def write_inputs(tmp: Path, n: int, shared_kb: int) -> list[Path]:
+    """n einseitige PDFs mit identischer eingebetteter Ressource."""
+    shared = os.urandom(shared_kb * 1024)
+    paths = []
+    for i in range(n):
+        writer = PdfWriter()
+        page = writer.add_blank_page(595, 842)
+        blob = DecodedStreamObject()
+        blob.set_data(shared)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Shared"): writer._add_object(blob)}),
+        })
+        path = tmp / f"in_{i:05d}.pdf"
+        writer.write(path)
+        paths.append(path)
+    return paths
+
+
+def run_size(n: int, shared_kb: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="lsb_bench_merge_") as tmp_dir:
+        tmp = Path(tmp_dir)
+        paths = write_inputs(tmp, n, shared_kb)
+        plain = merge_pdf_files(paths, tmp / "plain.pdf")
+        measured = merge_pdf_files(paths, tmp / "measured.pdf", measure_memory=True)
+    return {
+        "n": n,
+        "pages": plain.pages,
+        "input_kb": round(plain.input_bytes / 1024, 1),
+        "output_kb": round(plain.output_bytes / 1024, 1),
+        "saved_percent": plain.saved_percent,
+        "seconds": round(plain.seconds, 3),
+        "seconds_measured": round(measured.seconds, 3),
+        "peak_mem_mb": measured.peak_mem_mb,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Kommagetrennte Anzahl Eingabe-PDFs (Standard: 30,300)")
+    parser.add_argument("--shared-kb", type=int, default=200, help="Größe der gemeinsamen Ressource in KB")
+    parser.add_argument("--out", type=Path, help="JSON-Datei (Standard: benchmarks/results/pdf_merge_<zeit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        print(f"== {n} PDFs ==", flush=True)
+        res = run_size(n, args.shared_kb)
+        print(f"  {res['input_kb']:.1f} KB -> {res['output_kb']:.1f} KB (-{res['saved_percent']} %)")
+        print(f"  {res['seconds']:.3f} s  (mit tracemalloc {res['seconds_measured']:.3f} s, "
+              f"Spitzen-Speicher {res['peak_mem_mb']} MB)")
+        results.append(res)
+
+    report = {
+        "benchmark": "pdf_merge",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "shared_kb": args.shared_kb,
+        "results": results,
+    }
+
+    out = args.out or RESULTS_DIR / f"pdf_merge_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Ergebnis: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/pdf_stylesheets.py
+"""
+Vergleich: Inline-<style> + neue FontConfiguration pro Rechnung (alter Weg)
+gegen vorkompiliertes Stylesheet + geteilte FontConfiguration (pdf_styles).
+
+Aufruf (aus dem Projekt-Root):
+    python -m benchmarks.pdf_stylesheets -n 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+
+from flask import render_template
+from markupsafe import Markup
+from weasyprint import HTML
+from weasyprint.text.fonts import FontConfiguration
+
+from lsb_app import create_app
+from lsb_app.services.pdf_assets import PDF_BASE_URL, app_asset_fetcher
+from lsb_app.services.pdf_styles import PDF_CSS_DIR, RECHNUNG_CSS, get_font_config, get_stylesheet, pdf_style_kwargs
+from lsb_app.viewmodels.rechnung_vm import LeistungVM, RechnungVM
+
+
+def _dummy_vm(cfg) -> RechnungVM:
+    return RechnungVM(
+        auftrag_id=1,
+        auftragsnummer=1001,
+        rechnungsart="RECHNUNG",
+        rechnungsdatum=date.today(),
+        auftragsdatum=date.today(),
+        patient_name="Mustermann",
+        patient_vorname="Max",
+        patient_geburtsdatum=date(1940, 1, 1),
+        patient_geschlecht="männlich",
+        anschrift_html=Markup("Bestattungen Muster<br>Hauptstraße 1<br>80331 München"),
+        leistungen=[
+            LeistungVM(kurz="GOÄ-Nr. 101", beschreibung="Leichenschau", betrag="165,77"),
+            LeistungVM(kurz="Auslagen", beschreibung="Formular Todesbescheinigung + Materialien", betrag="3,50"),
+            LeistungVM(kurz="Wegegeld", beschreibung="5 - 10 km (tags)", betrag="10,23"),
+        ],
+        summe_str="179,50",
+        config={k: cfg.get(k, "") for k in (
+            "COMPANY_NAME", "COMPANY_ROLE", "COMPANY_ADDRESS", "COMPANY_PHONE",
+            "COMPANY_EMAIL", "BANK_IBAN", "BANK_BIC", "TAX_NUMBER",
+        )},
+    )
+
+
+def _time_runs(fn, n: int) -> list[float]:
+    runs = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return runs
+
+
+def run(n: int) -> dict:
+    app = create_app()
+    with app.app_context():
+        vm = _dummy_vm(app.config)
+        fetcher = app_asset_fetcher()
+        html_str = render_template("rechnungen/standard.html", vm=vm, pdf=True)
+
+        # alter Weg: CSS inline im Dokument, Fonts jedes Mal neu
+        css_src = (PDF_CSS_DIR / f"{RECHNUNG_CSS}.css").read_text(encoding="utf-8")
+        inline_html = html_str.replace("</head>", f"<style>{css_src}</style></head>", 1)
+
+        def legacy():
+            HTML(string=inline_html, base_url=PDF_BASE_URL, url_fetcher=fetcher).write_pdf(
+                font_config=FontConfiguration()
+            )
+
+        # neuer Weg: einmal kompiliert (Warm-up außerhalb der Messung)
+        get_stylesheet(RECHNUNG_CSS)
+        get_font_config()
+
+        def shared():
+            HTML(string=html_str, base_url=PDF_BASE_URL, url_fetcher=fetcher).write_pdf(
+                **pdf_style_kwargs(RECHNUNG_CSS)
+            )
+
+        legacy()  # Warm-up (Imports, Pango)
+        legacy_runs = _time_runs(legacy, n)
+        shared_runs = _time_runs(shared, n)
+
+    legacy_ms = statistics.median(legacy_runs) * 1000
+    shared_ms = statistics.median(shared_runs) * 1000
+    return {
+        "runs": n,
+        "legacy_median_ms": round(legacy_ms, 2),
+        "shared_median_ms": round(shared_ms, 2),
+        "saving_per_invoice_ms": round(legacy_ms - shared_ms, 2),
+        "saving_percent": round((legacy_ms - shared_ms) / legacy_ms * 100, 1) if legacy_ms else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=20, help="Messungen pro Variante")
+    parser.add_argument("--json", action="store_true", help="Ergebnis als JSON ausgeben")
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"Inline-CSS + neue Fonts : {result['legacy_median_ms']:8.2f} ms / Rechnung (Median)")
+    print(f"Geteiltes Stylesheet    : {result['shared_median_ms']:8.2f} ms / Rechnung (Median)")
+    print(f"Ersparnis               : {result['saving_per_invoice_ms']:8.2f} ms ({result['saving_percent']} %)")
+
+
+if __name__ == "__main__":
+    main()
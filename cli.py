@@ -6,6 +6,16 @@ from lsb_app.extensions import db
 from seed import seed_data
 from pathlib import Path
 import shutil
+import sys
+import time
+from lsb_app.models import Adresse, RechnungsStatusEnum
+from lsb_app.services.distance_estimate import build_estimator, import_centroids
+from lsb_app.services.distances import DEFAULT_CHUNK_SIZE, backfill as distances_backfill
+from lsb_app.services.geocoding import GeocodingUnavailable, geocode_text, prefill as geocode_prefill
+from lsb_app.services.invoice_archive import ArchiveFilter, iter_archive_files, write_zip
+from lsb_app.services.mail_outbox import OutboxSettings, run_worker
+from lsb_app.services.mail_sandbox import MailSandbox
+from lsb_app.services.mail_transport import MailSettings
 
 def wipe_dir_contents(path: Path) -> int:
     """
@@ -117,3 +127,166 @@ def register_cli(app):
         db.session.commit()
 
         click.echo("✅ Alle Tabellen im public-Schema geleert.")
+
+    @app.cli.command("invoices-export")
+    @click.option("--year", type=int, help="Rechnungsjahr")
+    @click.option("--month", type=click.IntRange(1, 12), help="Rechnungsmonat (nur mit --year)")
+    @click.option("--institut", "institut_id", type=int, help="ID des Bestattungsinstituts")
+    @click.option("--status", type=click.Choice([s.value for s in RechnungsStatusEnum]), help="Rechnungsstatus")
+    @click.option("-o", "--output", type=click.Path(dir_okay=False, allow_dash=True),
+                  help="Ziel-ZIP ('-' = stdout), Standard: Name aus den Filtern")
+    def invoices_export(year, month, institut_id, status, output):
+        """Rechnungs-PDFs als ZIP exportieren (gestreamt, ohne Temp-Datei)."""
+        try:
+            filt = ArchiveFilter(
+                year=year,
+                month=month,
+                institut_id=institut_id,
+                status=RechnungsStatusEnum(status) if status else None,
+            )
+        except ValueError as exc:
+            raise click.BadParameter(str(exc))
+
+        invoices_dir = Path(app.instance_path) / "invoices"
+        files = iter_archive_files(filt, invoices_dir)
+
+        if output == "-":
+            write_zip(files, sys.stdout.buffer)
+            return
+
+        out_path = Path(output or filt.zip_name)
+        with out_path.open("wb") as fh:
+            total = write_zip(files, fh)
+        click.echo(f"✅ {out_path} geschrieben ({total / (1024 * 1024):.1f} MB).")
+
+    @app.cli.command("outbox-worker")
+    @click.option("--once", is_flag=True, help="Nur fällige Nachrichten zustellen und beenden")
+    def outbox_worker(once):
+        """Mail-Outbox abarbeiten (Zustellung mit Retry/Backoff)."""
+        try:
+            mail_settings = MailSettings.from_config(app.config)
+        except RuntimeError as exc:
+            click.echo(f"❌ {exc}")
+            raise click.Abort()
+
+        click.echo("📮 Outbox-Worker läuft" + (" (einmalig)" if once else ", Abbruch mit Strg+C") + " ...")
+        try:
+            run_worker(mail_settings, OutboxSettings.from_config(app.config), once=once)
+        except KeyboardInterrupt:
+            click.echo("👋 Outbox-Worker beendet.")
+
+    @app.cli.command("mail-sandbox")
+    @click.option("--host", default="127.0.0.1", show_default=True)
+    @click.option("--smtp-port", type=int, default=1025, show_default=True)
+    @click.option("--imap-port", type=int, default=1143, show_default=True)
+    @click.option("--delay", type=float, default=0.0, help="Simulierte Serverlatenz pro Nachricht (Sekunden)")
+    @click.option("--store", "store_dir", type=click.Path(file_okay=False, path_type=Path),
+                  help="Angenommene Mails als .eml in diesem Ordner ablegen")
+    def mail_sandbox(host, smtp_port, imap_port, delay, store_dir):
+        """Lokaler SMTP-Sink + IMAP-Ablage für Entwicklung und Benchmarks."""
+        sandbox = MailSandbox(host, smtp_port, imap_port, delay=delay, store_dir=store_dir)
+        with sandbox:
+            click.echo(f"📭 Mail-Sandbox läuft: SMTP {host}:{sandbox.smtp_port}, IMAP {host}:{sandbox.imap_port}")
+            click.echo("   App darauf zeigen lassen (.env):")
+            for key, value in sandbox.config().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                click.echo(f"     {key}={value}")
+            click.echo("   Abbruch mit Strg+C")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+        stats = sandbox.stats()
+        click.echo(f"👋 Mail-Sandbox beendet: {stats['smtp']['messages']} Mail(s) per SMTP, "
+                   f"{stats['imap']['messages']} per IMAP abgelegt.")
+
+    @app.cli.group("geocode")
+    def geocode_cli():
+        """Geocode-Cache (Nominatim) verwalten."""
+
+    @geocode_cli.command("prefill")
+    @click.option("--refresh", is_flag=True, help="Auch gültige Cache-Einträge neu abfragen")
+    @click.option("--limit", type=int, help="Höchstens so viele Adressen")
+    @click.option("--delay", type=float, default=1.0, show_default=True,
+                  help="Pause zwischen Nominatim-Anfragen (Sekunden, Nutzungsbedingungen: >= 1)")
+    def geocode_prefill_cmd(refresh, limit, delay):
+        """Alle bekannten Adressen (und die Startadresse) in den Geocode-Cache laden."""
+        query = (
+            db.session.query(Adresse.strasse, Adresse.hausnummer, Adresse.plz, Adresse.ort)
+            .distinct()
+            .order_by(Adresse.plz, Adresse.ort, Adresse.strasse, Adresse.hausnummer)
+        )
+        if limit:
+            query = query.limit(limit)
+        addresses = [tuple(row) for row in query]
+
+        start = app.config.get("STARTADRESSE")
+        if start:
+            try:
+                geocode_text(start, refresh=refresh)
+            except GeocodingUnavailable as exc:
+                click.echo(f"⚠️ Startadresse nicht geokodiert: {exc}")
+
+        click.echo(f"🌍 {len(addresses)} Adresse(n) prüfen ...")
+
+        def progress(stats):
+            done = stats.found + stats.not_found + stats.errors
+            if done % 25 == 0:
+                click.echo(f"   ... {done} abgefragt")
+
+        stats = geocode_prefill(addresses, refresh=refresh, delay=delay, on_progress=progress)
+        click.echo(
+            f"✅ {stats.total} Adresse(n): {stats.cached} bereits im Cache, {stats.found} gefunden, "
+            f"{stats.not_found} nicht gefunden, {stats.errors} Fehler."
+        )
+
+    @app.cli.group("distances")
+    def distances_cli():
+        """Entfernungen (Adresse.distanz) verwalten."""
+
+    @distances_cli.command("backfill")
+    @click.option("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, show_default=True,
+                  help="Ziele pro ORS-Matrix-Aufruf")
+    @click.option("--limit", type=int, help="Höchstens so viele Adressen")
+    @click.option("--delay", type=float, default=1.0, show_default=True,
+                  help="Pause zwischen Nominatim-Anfragen (Sekunden, nur ohne Cache-Treffer)")
+    def distances_backfill_cmd(chunk_size, limit, delay):
+        """Fehlende Entfernungen aller Adressen über die ORS-Matrix berechnen."""
+        def progress(stats, n):
+            click.echo(f"   ... Chunk mit {n} Adresse(n) fertig ({stats.matrix_calls} Matrix-Aufruf(e))")
+
+        try:
+            stats = distances_backfill(chunk_size=chunk_size, delay=delay, limit=limit, on_progress=progress)
+        except Exception as exc:
+            click.echo(f"❌ Backfill abgebrochen: {exc}")
+            raise click.Abort()
+        if not stats.total:
+            click.echo("✅ Alle Adressen haben eine Entfernung.")
+            return
+        click.echo(
+            f"✅ {stats.total} Adresse(n) ohne Entfernung ({stats.unique} Anschriften): {stats.updated} aktualisiert "
+            f"(davon {stats.estimated} geschätzt), {stats.not_found} nicht gefunden, {stats.no_route} ohne Route, "
+            f"{stats.errors} Fehler."
+        )
+
+    @distances_cli.command("import-plz")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+    def distances_import_plz_cmd(path):
+        """PLZ-Mittelpunkte (CSV: plz, lat, lon) importieren; überschreiben den mitgelieferten Grundbestand."""
+        created, updated = import_centroids(path)
+        click.echo(f"✅ {created} PLZ neu, {updated} aktualisiert.")
+
+    @distances_cli.command("calibrate")
+    def distances_calibrate_cmd():
+        """Umwegfaktor der Offline-Schätzung neu bestimmen und anzeigen."""
+        try:
+            estimator = build_estimator()
+        except Exception as exc:
+            click.echo(f"❌ Schätzung nicht möglich: {exc}")
+            raise click.Abort()
+        total = db.session.query(Adresse).filter(Adresse.distanz.isnot(None)).count()
+        click.echo(f"📍 {len(estimator.centroids)} PLZ-Mittelpunkte")
+        click.echo(f"📏 Umwegfaktor {estimator.road_factor:.3f} aus {estimator.samples} Stichprobe(n) "
+                   f"({total} Adresse(n) mit Entfernung)")
@@ -37,26 +37,66 @@ def create_app():
 
     # openrouteservice
     app.config["STARTADRESSE"] = os.getenv("STARTADRESSE", "")
+    # Optional "lat,lon" der Startadresse; sonst wird STARTADRESSE einmal geokodiert
+    app.config["STARTKOORDINATEN"] = os.getenv("STARTKOORDINATEN", "")
     app.config["ORS_API_KEY"] = os.getenv("ORS_API_KEY", "")
+    # Fehlende Entfernungen nach dem Commit im Hintergrund berechnen (ORS-Matrix)
+    app.config["DISTANCE_BACKFILL"] = os.getenv("DISTANCE_BACKFILL", "1").lower() in ("1", "true", "yes")
 
     app.config["NOMINATIM_URL"] = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
     app.config["NOMINATIM_USER_AGENT"] = os.getenv("NOMINATIM_USER_AGENT", "LSBayern/1.0 (info@example.com)")
+    # Geocode-Cache: Gültigkeit von Treffern bzw. "nicht gefunden"
+    app.config["GEOCODE_CACHE_TTL_DAYS"] = int(os.getenv("GEOCODE_CACHE_TTL_DAYS", "180"))
+    app.config["GEOCODE_CACHE_NEGATIVE_TTL_DAYS"] = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL_DAYS", "7"))
+    # Nominatim-Limit für alle Prozesse zusammen (Nutzungsbedingungen: 1/s); 0 = unbegrenzt (eigene Instanz)
+    app.config["NOMINATIM_RATE_PER_MINUTE"] = float(os.getenv("NOMINATIM_RATE_PER_MINUTE", "60"))
+    # Live-Adressprüfung: höchstens so lange (Sekunden) auf einen Nominatim-Slot warten
+    app.config["ADDRESS_VALIDATION_WAIT"] = float(os.getenv("ADDRESS_VALIDATION_WAIT", "2"))
+    # TB-Anlage: Frist (Sekunden) für die Prüfung aller Adressen des Formulars zusammen
+    app.config["ADDRESS_VALIDATION_DEADLINE"] = float(os.getenv("ADDRESS_VALIDATION_DEADLINE", "8"))
 
     # Mail-Konfiguration (SMTP)
     app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.mail.de")
     app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", "587"))
     app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "1") == "1"
+    # 1 = implizites TLS (SMTP_SSL/IMAP4_SSL); 0 = Klartext bzw. STARTTLS mit MAIL_USE_TLS
+    app.config["MAIL_USE_SSL"] = os.getenv("MAIL_USE_SSL", "1") == "1"
     app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME", "")
     app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD", "")
     app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER", app.config["MAIL_USERNAME"])
     app.config["MAIL_IMAP_SERVER"] = os.getenv("MAIL_IMAP_SERVER", "")
     app.config["MAIL_IMAP_PORT"] = int(os.getenv("MAIL_IMAP_PORT", "993"))
     app.config["MAIL_IMAP_FOLDER"] = os.getenv("MAIL_IMAP_FOLDER", "Rechnungen")
+    # Nach so vielen Mails wird die SMTP-Verbindung neu aufgebaut (0 = unbegrenzt)
+    app.config["MAIL_MAX_MESSAGES_PER_CONNECTION"] = int(os.getenv("MAIL_MAX_MESSAGES_PER_CONNECTION", "50"))
+    app.config["MAIL_TIMEOUT"] = int(os.getenv("MAIL_TIMEOUT", "30"))
+
+    # Mail-Outbox (flask outbox-worker)
+    app.config["OUTBOX_MAX_ATTEMPTS"] = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+    app.config["OUTBOX_RETRY_BASE_SECONDS"] = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "60"))
+    app.config["OUTBOX_RETRY_MAX_SECONDS"] = int(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+    app.config["OUTBOX_POLL_SECONDS"] = int(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+    app.config["OUTBOX_BATCH_SIZE"] = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    # Parallele SMTP-Verbindungen und Provider-Limit (0 = unbegrenzt)
+    app.config["OUTBOX_CONCURRENCY"] = int(os.getenv("OUTBOX_CONCURRENCY", "3"))
+    app.config["MAIL_RATE_PER_MINUTE"] = float(os.getenv("MAIL_RATE_PER_MINUTE", "0"))
 
     # YNAB-Konfiguration
     app.config["YNAB_ACCESS_TOKEN"] = os.getenv("YNAB_ACCESS_TOKEN", "")
     app.config["YNAB_BUDGET_ID"] = os.getenv("YNAB_BUDGET_ID", "")
 
+    # PDF-Rendering (0 = alle Kerne)
+    app.config["PDF_RENDER_WORKERS"] = int(os.getenv("PDF_RENDER_WORKERS", "0"))
+    app.config["PDF_RENDER_START_METHOD"] = os.getenv("PDF_RENDER_START_METHOD", "spawn")
+    # Inhaltsadressierter PDF-Cache unter instance/pdf_cache
+    app.config["PDF_CACHE_ENABLED"] = os.getenv("PDF_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+    # Rechnungsentwürfe im Hintergrund vorbereiten, sobald ein Auftrag READY ist
+    app.config["RECHNUNG_PRERENDER"] = os.getenv("RECHNUNG_PRERENDER", "1").lower() in ("1", "true", "yes")
+
+    # Zähler der Startseite im Speicher halten; Abgleich mit der DB spätestens nach n Sekunden
+    app.config["DASHBOARD_COUNTER_CACHE"] = os.getenv("DASHBOARD_COUNTER_CACHE", "1").lower() in ("1", "true", "yes")
+    app.config["DASHBOARD_RECONCILE_SECONDS"] = int(os.getenv("DASHBOARD_RECONCILE_SECONDS", "300"))
+
 
 
 
@@ -71,6 +111,18 @@ def create_app():
     csrf.init_app(app)
     migrate.init_app(app, db)
 
+    from lsb_app.services import rechnung_drafts
+    rechnung_drafts.init_app(app)
+
+    from lsb_app.services import entfernungsrechner
+    entfernungsrechner.init_app(app)
+
+    from lsb_app.services import distances
+    distances.init_app(app)
+
+    from lsb_app.services import dashboard
+    dashboard.init_app(app)
+
     # Blueprints registrieren
     from lsb_app.blueprints.patients import bp as patients_bp
     app.register_blueprint(patients_bp, url_prefix="/patients")
@@ -4,6 +4,10 @@ from lsb_app.blueprints.addresses import bp
 from lsb_app.extensions import db
 from lsb_app.models import Adresse
 from lsb_app.forms import AddressForm
+from lsb_app.services.batch_jobs import STAGE_INFO, JobProgress, start_job
+from lsb_app.services.distances import backfill, pending_addresses, resolve_pending
+
+JOB_DISTANCES_BACKFILL = "distances_backfill"
 
 @bp.route("/<int:aid>/edit", methods=["GET", "POST"])
 def edit(aid: int):
@@ -14,11 +18,16 @@ def edit(aid: int):
     form = AddressForm(obj=adr)
 
     if form.validate_on_submit():
-        adr.strasse = form.strasse.data
-        adr.hausnummer = form.hausnummer.data
-        adr.plz = form.plz.data
-        adr.ort = form.ort.data
-        adr.distanz = form.distanz.data
+        anschrift = (form.strasse.data, form.hausnummer.data, form.plz.data, form.ort.data)
+        anschrift_geaendert = anschrift != (adr.strasse, adr.hausnummer, adr.plz, adr.ort)
+        adr.strasse, adr.hausnummer, adr.plz, adr.ort = anschrift
+        if form.distanz.data is not None and form.distanz.data != adr.distanz:
+            # von Hand eingetragen: keine Schätzung mehr
+            adr.distanz, adr.distanz_geschaetzt = form.distanz.data, False
+        elif form.distanz.data is None or anschrift_geaendert:
+            # neu auflösen: Schätzung jetzt, Fahrstrecke nach dem Commit im Hintergrund
+            adr.distanz, adr.distanz_geschaetzt = None, False
+            resolve_pending()
 
         try:
             db.session.commit()
@@ -30,3 +39,34 @@ def edit(aid: int):
             flash(f"Fehler beim Speichern: {e}", "danger")
 
     return render_template("addresses/edit.html", form=form, adresse=adr)
+
+@bp.post("/distances/backfill", endpoint="backfill_distances")
+def backfill_distances():
+    """Fehlende Entfernungen als Batch-Job berechnen; weiter zur Job-Seite."""
+    total = len(pending_addresses())
+    if not total:
+        flash("Alle Adressen haben bereits eine Entfernung.", "info")
+        return redirect(request.referrer or url_for("home.index"))
+
+    job_id = start_job(
+        JOB_DISTANCES_BACKFILL,
+        total=total,
+        params={},
+        runner=_run_backfill_distances,
+        base_url=request.url_root,
+    )
+    return redirect(url_for("rechnungen.batch_job", job_id=job_id))
+
+def _run_backfill_distances(progress: JobProgress) -> dict:
+    def on_progress(stats, n):
+        progress.emit(STAGE_INFO, message=f"{n} Adresse(n) abgefragt, {stats.matrix_calls} Matrix-Aufruf(e)",
+                      final=True, count=n)
+
+    stats = backfill(on_progress=on_progress)
+    progress.emit(
+        STAGE_INFO,
+        message=(f"{stats.updated} Adresse(n) aktualisiert (davon {stats.estimated} geschätzt), "
+                 f"{stats.not_found} nicht gefunden, {stats.no_route} ohne Route, {stats.errors} Fehler"),
+    )
+    return {"updated": stats.updated, "estimated": stats.estimated, "not_found": stats.not_found,
+            "no_route": stats.no_route, "errors": stats.errors, "matrix_calls": stats.matrix_calls}
@@ -1,8 +1,9 @@
 # lsb_app/blueprints/debug/routes.py
 from __future__ import annotations
-from flask import request, render_template, current_app, abort
+from flask import request, render_template, current_app, abort, jsonify
 from lsb_app.blueprints.debug import bp
 from lsb_app.extensions import db
+from lsb_app.services import pdf_cache
 
 # Modelle einmal importieren (nur die, die es tatsächlich gibt)
 # Passen Sie die Liste bei Bedarf an.
@@ -99,3 +100,13 @@ def db_overview():
 
     # Funktion `fmt` für das Template bereitstellen
     return render_template("debug_db.html", models=models_out, fmt=_fmt)
+
+
+@bp.route("/pdf-cache", methods=["GET"])
+def pdf_cache_stats():
+    """Trefferquote und eingesparte Renderzeit des PDF-Caches (dieser Prozess)."""
+    return jsonify(
+        enabled=bool(current_app.config.get("PDF_CACHE_ENABLED", True)),
+        template_version=pdf_cache.template_version(),
+        **pdf_cache.stats.snapshot(),
+    )
@@ -1,127 +1,32 @@
 # lsb_app/blueprints/home/routes.py
 from flask import Blueprint, render_template, current_app
+from dataclasses import asdict
 from lsb_app.extensions import db
 from lsb_app.models import Auftrag
-from sqlalchemy import func, or_, and_
-from sqlalchemy.orm import selectinload
-from datetime import date
-from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload, lazyload
 from lsb_app.viewmodels.home_vm import HomeVM
-from lsb_app.models import (AuftragsStatusEnum, Rechnung,
-        RechnungsStatusEnum, Angehoeriger, Behoerde, Patient)
-from lsb_app.services.auftrag_filters import (ready_for_email_filter, ready_for_inquiry_filter,
-            ready_for_post_filter)
+from lsb_app.services.dashboard import dashboard_counts
 
 bp = Blueprint("home", __name__)
 
 @bp.route("/")
 def index():
-    
+    # höchstens zwei Statements: die letzten Aufträge (mit Patient) und,
+    # falls sich seit dem letzten Aufruf etwas geändert hat, die Zähler;
+    # die selectin-Beziehungen von Auftrag/Patient braucht die Tabelle nicht
     recent_auftraege = (
         db.session.query(Auftrag)
+        .options(lazyload("*"), joinedload(Auftrag.patient).lazyload("*"))
         .order_by(Auftrag.id.desc())
         .limit(10)
         .all()
     )
 
-    ready_email_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(ready_for_email_filter())
-        .scalar()
-    )
-
-    ready_post_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(ready_for_post_filter())
-        .scalar()
-    )
-
-    print_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(Auftrag.status == AuftragsStatusEnum.PRINT)
-        .scalar()
-    )
-
-    todo_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(Auftrag.status == AuftragsStatusEnum.TODO)
-        .scalar()
-    )
-
-    inquiry_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(ready_for_inquiry_filter())
-        .scalar()
-    )
-
-    today = date.today()
-
-    wait_overdue_count = (
-        db.session.query(func.count(Auftrag.id))
-        .filter(
-            Auftrag.status == AuftragsStatusEnum.WAIT,
-            Auftrag.wait_due_date.isnot(None),
-            Auftrag.wait_due_date < today,
-        )
-        .scalar()
-    )
-
-    
-    cutoff = datetime.now() - timedelta(days=30)
-
-    latest_rechnung = (
-        db.session.query(
-            Rechnung.auftrag_id.label("auftrag_id"),
-            func.max(Rechnung.version).label("max_version"),
-        )
-        .group_by(Rechnung.auftrag_id)
-        .subquery()
-    )
-
-    overdue_count = (
-    db.session.query(func.count(Auftrag.id))
-    .join(latest_rechnung, latest_rechnung.c.auftrag_id == Auftrag.id)
-    .join(
-        Rechnung,
-        and_(
-            Rechnung.auftrag_id == latest_rechnung.c.auftrag_id,
-            Rechnung.version == latest_rechnung.c.max_version,
-        ),
-    )
-    .filter(Auftrag.status == AuftragsStatusEnum.SENT)
-    .filter(Rechnung.gesendet_datum.isnot(None))
-    .filter(Rechnung.gesendet_datum <= cutoff)
-    .scalar()
-    )
-
-    sent_count = (
-    db.session.query(func.count(Auftrag.id))
-    .join(latest_rechnung, latest_rechnung.c.auftrag_id == Auftrag.id)
-    .join(
-        Rechnung,
-        and_(
-            Rechnung.auftrag_id == latest_rechnung.c.auftrag_id,
-            Rechnung.version == latest_rechnung.c.max_version,
-        ),
-    )
-    .filter(
-        Auftrag.status != AuftragsStatusEnum.DONE,
-        Rechnung.status == RechnungsStatusEnum.SENT,
-    )
-    .scalar()
-)
-
+    counts = dashboard_counts()
 
     vm = HomeVM(
         recent_auftraege=recent_auftraege,
-        ready_email_count=ready_email_count,
-        ready_post_count=ready_post_count,
-        print_count=print_count,
-        todo_count=todo_count,
-        inquiry_count=inquiry_count,
-        wait_overdue_count=wait_overdue_count,
-        overdue_count=overdue_count,
-        sent_count=sent_count,
+        **asdict(counts),
         debug=current_app.debug,
     )
-    return render_template("home.html", vm=vm)
\ No newline at end of file
+    return render_template("home.html", vm=vm)
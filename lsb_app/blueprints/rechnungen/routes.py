@@ -1,16 +1,34 @@
 # lsb_app/blueprints/rechnungen/routes.py
 from flask import (url_for, current_app, render_template, request, flash, send_file, 
-                   redirect, abort)
-import zipfile
-from pypdf import PdfWriter, PdfReader
+                   redirect, abort, Response, stream_with_context)
 from lsb_app.blueprints.rechnungen import bp
 from lsb_app.models import (Rechnung, Auftrag, AuftragsStatusEnum, RechnungsStatusEnum,
-                            RechnungsArtEnum, KostenstelleEnum)
-from lsb_app.services.rechnung_vm_factory import build_rechnung_vm, erstelle_anschrift_html_angehoeriger
+                            RechnungsArtEnum, KostenstelleEnum, OutboxMessage, OutboxStatusEnum,
+                            BatchJob, Verlauf)
+from lsb_app.services.rechnung_vm_factory import (EntfernungFehlt, build_rechnung_vm,
+                                                  erstelle_anschrift_html_angehoeriger)
+from lsb_app.services.rechnung_drafts import get_rechnung_vm
+from lsb_app.services.distances import ensure_distance
 from datetime import date, datetime, timedelta
 from weasyprint import HTML
+from lsb_app.services.pdf_render import (PdfJob, render_rechnung_pdfs, rechnung_pdf_path,
+                                         cached_rechnung_pdf)
+from lsb_app.services.pdf_assets import PDF_BASE_URL, app_asset_fetcher
+from lsb_app.services.pdf_bundle import BundleDoc, DOC_ANSCHREIBEN, DOC_RECHNUNG, render_bundle
+from lsb_app.services.pdf_cache import rechnung_cache_key
+from lsb_app.services.pdf_merge import merge_pdf_files
+from lsb_app.services.mail_transport import MailSettings, SmtpTransport
+from lsb_app.services.mail_archive import ImapArchiver, RECHNUNGEN_FOLDER, ANFRAGEN_FOLDER
+from lsb_app.services.mail_outbox import (enqueue as enqueue_mail, new_batch_id, batch_report,
+                                         watch_batch, PENDING_STATUSES)
+from lsb_app.services.batch_jobs import (JobProgress, start_job, job_snapshot, event_stream,
+                                         STAGE_INFO, STAGE_CREATED, STAGE_RENDERED, STAGE_QUEUED,
+                                         STAGE_SENT, STAGE_FAILED)
+from lsb_app.services.invoice_archive import ArchiveFilter, iter_archive_files, stream_zip, write_zip
+from lsb_app.services.pdf_styles import ANSCHREIBEN_CSS, pdf_style_kwargs
+from lsb_app.viewmodels.rechnung_vm import RechnungVM
 from pathlib import Path
-from sqlalchemy import and_, desc, asc, select
+from sqlalchemy import and_, desc, asc, insert, select, update
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from lsb_app.services.auftrag_filters import (ready_for_email_filter, ready_for_inquiry_filter,
@@ -19,45 +37,48 @@ from lsb_app.forms import RechnungForm, RechnungCreateForm, DummyCSRFForm, Print
 from lsb_app.extensions import db
 from lsb_app.models import Angehoeriger, Bestattungsinstitut, Behoerde, GeschlechtEnum
 from decimal import Decimal
-import smtplib
-from typing import Optional, Tuple, Union
+from functools import partial
+from itertools import groupby
+from typing import Callable, Optional, Tuple, Union
 from email.message import EmailMessage
-import imaplib
 from lsb_app.services.verlauf import add_verlauf
 from email.utils import formatdate
-import time
 import mimetypes
 import logging
 logger = logging.getLogger(__name__)
 
 RecipientModel = Union[Angehoeriger, Bestattungsinstitut, Behoerde]
 
+# Frist nach versendeter Anfrage, bis der Auftrag wieder vorgelegt wird
+INQUIRY_WAIT_DAYS = 7
+
+JOB_SEND_BATCH_EMAIL = "send_batch_email"
+JOB_SEND_BATCH_POST = "send_batch_post"
+JOB_PRINT_BATCH = "print_batch"
+
+# Job-Art -> Auswahlseite für den Zurück-Link
+JOB_BACK_ENDPOINTS = {
+    JOB_SEND_BATCH_EMAIL: "rechnungen.send_batch_email",
+    JOB_SEND_BATCH_POST: "rechnungen.send_batch_post",
+    JOB_PRINT_BATCH: "rechnungen.print_batch",
+}
+
 def _zip_pdfs(paths: list[Path], zip_path: Path) -> Path:
-    """Erstellt ein ZIP aus PDF-Dateien."""
+    """Erstellt ein ZIP aus PDF-Dateien (ungepackt, PDFs sind schon komprimiert)."""
     zip_path.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for p in paths:
-            if p.is_file():
-                zf.write(p, arcname=p.name)
-            else:
-                logger.warning("ZIP: PDF nicht gefunden: %s", p)
+    existing = []
+    for p in paths:
+        if p.is_file():
+            existing.append((p, p.name))
+        else:
+            logger.warning("ZIP: PDF nicht gefunden: %s", p)
+    with zip_path.open("wb") as fh:
+        write_zip(existing, fh)
     return zip_path
 
 def merge_pdfs(pdf_paths: list[Path], out_path: Path) -> Path:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    writer = PdfWriter()
-
-    for p in pdf_paths:
-        if not p.is_file():
-            logger.warning("merge_pdfs: PDF fehlt: %s", p)
-            continue
-        reader = PdfReader(str(p))
-        for page in reader.pages:
-            writer.add_page(page)
-
-    with out_path.open("wb") as f:
-        writer.write(f)
-
+    """Fügt die PDFs blockweise und mit Objekt-Deduplizierung zusammen (siehe pdf_merge)."""
+    merge_pdf_files(pdf_paths, out_path)
     return out_path
 
 def determine_recipient_for_auftrag(auftrag: Auftrag) -> tuple[Optional[str], Optional[RecipientModel]]:
@@ -109,13 +130,8 @@ def build_anrede_for_angehoeriger(ang: Angehoeriger) -> str:
         # Fallback
         return f" Damen und Herren"
 
-def generate_and_save_rechnung_pdf(rechnung: Rechnung) -> Path:
-    """Erzeugt das PDF für eine Rechnung und speichert es im instance-/invoices-Ordner.
-       Gibt den Pfad zur Datei zurück.
-    """
-    
-    auftrag = rechnung.auftrag
-
+def build_pdf_vm_for_rechnung(rechnung: Rechnung) -> RechnungVM:
+    """ViewModel für das PDF einer gespeicherten Rechnung (Titel RECHNUNG/MAHNUNG)."""
     if rechnung.art == RechnungsArtEnum.MAHNUNG:
         rechnungsart_str = "MAHNUNG"
     else:
@@ -123,46 +139,78 @@ def generate_and_save_rechnung_pdf(rechnung: Rechnung) -> Path:
     # rechnungsart = getattr(rechnung.art, "value", rechnung.art)
 
     # ViewModel auf Basis des Auftrags + Rechnungsdatum der Rechnung
-    vm = build_rechnung_vm(
-        auftrag=auftrag,
-        cfg=current_app.config,
+    # (vorbereiteter Entwurf, falls der Auftrag seit READY unverändert ist)
+    return get_rechnung_vm(
+        auftrag=rechnung.auftrag,
         rechnungsdatum=rechnung.rechnungsdatum,
         # rechnungsart=rechnung.art,
         rechnungsart=rechnungsart_str,
     )
 
-    # HTML rendern
-    html_str = render_template("rechnungen/standard.html", vm=vm)
+def pdf_job_for_rechnung(rechnung: Rechnung) -> PdfJob:
+    """Render-Auftrag (ViewModel + Zielpfad) für die Rendering-Engine."""
+    return PdfJob(
+        vm=build_pdf_vm_for_rechnung(rechnung),
+        out_path=rechnung_pdf_path(
+            rechnung.auftrag.auftragsnummer,
+            rechnung.version,
+            rechnung.rechnungsdatum,
+        ),
+    )
 
-    # Basis-URL (für static-Dateien im Template)
-    base_url = request.host_url
+def generate_and_save_rechnung_pdf(rechnung: Rechnung) -> Path:
+    """Erzeugt das PDF für eine Rechnung und speichert es im instance-/invoices-Ordner.
+       Gibt den Pfad zur Datei zurück.
+    """
+    [result] = render_rechnung_pdfs([pdf_job_for_rechnung(rechnung)], workers=1)
+    if not result.ok:
+        raise RuntimeError(f"PDF-Erstellung fehlgeschlagen: {result.error}")
+    return result.path
+
+def render_pdfs_for_rechnungen(
+    rechnungen: list[Rechnung],
+    on_rendered: Callable[[Rechnung, str | None], None] | None = None,
+) -> dict[int, str]:
+    """
+    Erzeugt die PDFs mehrerer (bereits geflushter) Rechnungen parallel über
+    render_rechnung_pdfs und setzt pdf_path.
+    Gibt {rechnung.id: Fehlermeldung} für alle fehlgeschlagenen PDFs zurück.
+    on_rendered(rechnung, fehler_oder_None) meldet jedes fertige PDF sofort.
+    """
+    errors: dict[int, str] = {}
+    prepared: list[tuple[Rechnung, PdfJob]] = []
 
-    # PDF erzeugen
-    pdf_bytes = HTML(string=html_str, base_url=base_url).write_pdf()
+    for r in rechnungen:
+        try:
+            prepared.append((r, pdf_job_for_rechnung(r)))
+        except Exception as exc:
+            logger.exception("render_pdfs_for_rechnungen: ViewModel fehlgeschlagen – rechnung_id=%s", r.id)
+            errors[r.id] = str(exc)
+            if on_rendered is not None:
+                on_rendered(r, str(exc))
 
-    # Speicherort
-    save_dir = Path(current_app.instance_path) / "invoices"
-    save_dir.mkdir(parents=True, exist_ok=True)
+    by_job = {id(job): r for r, job in prepared}
 
-    # Ordnerstruktur nach Jahr/Monat
-    rechnungsdatum = rechnung.rechnungsdatum or date.today()
-    year = str(rechnungsdatum.year)
-    month = f"{rechnungsdatum.month:02d}"
+    def _on_result(result) -> None:
+        if on_rendered is not None:
+            on_rendered(by_job[id(result.job)], result.error)
 
-    save_dir = Path(current_app.instance_path) / "invoices" / year / month
-    save_dir.mkdir(parents=True, exist_ok=True)
+    results = render_rechnung_pdfs([job for _, job in prepared], on_result=_on_result)
 
-    filename = f"Rechnung_{auftrag.auftragsnummer}_v{rechnung.version}.pdf"
-    file_path = save_dir / filename
+    for (r, _), result in zip(prepared, results):
+        if result.ok:
+            r.pdf_path = str(result.path)
+        else:
+            errors[r.id] = f"PDF-Erstellung fehlgeschlagen: {result.error}"
 
-    file_path.write_bytes(pdf_bytes)
-    return file_path
+    return errors
 
 def create_rechnung_for_auftrag(
     auftrag: Auftrag,
     art: RechnungsArtEnum | None = None,
     rechnungsdatum: date | None = None,
     bemerkung: str | None = None,
+    render_pdf: bool = True,
 ) -> Rechnung:
     """
     Legt IMMER eine neue Rechnung für den Auftrag an:
@@ -170,6 +218,8 @@ def create_rechnung_for_auftrag(
     - Betrag über build_rechnung_vm
     - Status = CREATED
     - PDF wird erzeugt, pdf_path gesetzt
+      (render_pdf=False: kein PDF, z. B. wenn der Batch die PDFs
+      gesammelt über render_rechnung_pdfs erzeugt)
     -> Gibt die Rechnung zurück (noch nicht committed).
 
     Später kannst du hier drin die Logik erweitern
@@ -216,12 +266,13 @@ def create_rechnung_for_auftrag(
         neue_version,
     )
 
-    # 2) Betrag über ViewModel berechnen
-    vm = build_rechnung_vm(
+    # 2) Betrag über ViewModel berechnen (Entwurf wiederverwenden, wenn vorhanden;
+    #    der Betrag hängt nicht vom Titel ab); Altbestand ohne Entfernung: Schätzung
+    ensure_distance(auftrag.auftragsadresse)
+    vm = get_rechnung_vm(
         auftrag=auftrag,
-        cfg=current_app.config,
         rechnungsdatum=rechnungsdatum,
-        rechnungsart=art.value,
+        rechnungsart="MAHNUNG" if art == RechnungsArtEnum.MAHNUNG else "RECHNUNG",
     )
     betrag = Decimal(vm.summe_str.replace(",", "."))
 
@@ -239,6 +290,9 @@ def create_rechnung_for_auftrag(
     db.session.add(rechnung)
     db.session.flush()  # rechnung.id ist jetzt gesetzt
 
+    if not render_pdf:
+        return rechnung
+
     # 4) PDF erzeugen & pfad setzen
     pdf_path = generate_and_save_rechnung_pdf(rechnung)
     rechnung.pdf_path = str(pdf_path)
@@ -251,35 +305,117 @@ def create_rechnung_for_auftrag(
 
     return rechnung
 
-def generate_anschreiben_pdf(rechnung: Rechnung) -> Path:
-    """
-    Erzeugt eine einfache Test-Anschreibenseite (1 Seite).
-    """
+def render_anschreiben_html(rechnung: Rechnung) -> str:
+    """HTML des Anschreibens an die Angehörigen (Template mit pdf=True)."""
     auftrag = rechnung.auftrag
 
     anrede = build_anrede_for_angehoeriger(pick_angehoeriger_for_auftrag(auftrag=auftrag))
     anschrift_html = erstelle_anschrift_html_angehoeriger(auftrag=auftrag)
 
-    html_str = render_template(
+    return render_template(
         "rechnungen/anschreiben.html",
         anrede=anrede,
         anschrift_html=anschrift_html,
         cfg=current_app.config,
+        pdf=True,
     )
 
+def anschreiben_pdf_path(rechnung: Rechnung) -> Path:
+    out_dir = Path(current_app.instance_path) / "exports" / "anschreiben"
+    return out_dir / f"Anschreiben_{rechnung.auftrag.auftragsnummer}_v{rechnung.version}.pdf"
+
+def generate_anschreiben_pdf(rechnung: Rechnung) -> Path:
+    """
+    Erzeugt eine einfache Test-Anschreibenseite (1 Seite).
+    """
+    html_str = render_anschreiben_html(rechnung)
+
     pdf_bytes = HTML(
         string=html_str,
-        base_url=request.host_url,
-    ).write_pdf()
-
-    out_dir = Path(current_app.instance_path) / "exports" / "anschreiben"
-    out_dir.mkdir(parents=True, exist_ok=True)
+        base_url=PDF_BASE_URL,
+        url_fetcher=app_asset_fetcher(),
+    ).write_pdf(**pdf_style_kwargs(ANSCHREIBEN_CSS))
 
-    out_path = out_dir / f"Anschreiben_{auftrag.auftragsnummer}_v{rechnung.version}.pdf"
+    out_path = anschreiben_pdf_path(rechnung)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_bytes(pdf_bytes)
 
     return out_path
 
+def _postversand_bundle_einzeln(prepared: list[tuple[Auftrag, Rechnung]], bundle_path: Path) -> dict[int, str]:
+    """
+    Fallback für den Sammeldruck: jedes PDF einzeln rendern und mit
+    merge_pdfs zusammenfügen.
+    """
+    errors = render_pdfs_for_rechnungen([r for _, r in prepared])
+    bundle_parts: list[Path] = []
+
+    for a, rechnung in prepared:
+        if rechnung.id in errors:
+            continue
+        try:
+            if a.kostenstelle == KostenstelleEnum.ANGEHOERIGE:
+                bundle_parts.append(generate_anschreiben_pdf(rechnung))
+            bundle_parts.append(Path(rechnung.pdf_path))
+        except Exception as exc:
+            logger.exception("send_batch_post: Anschreiben fehlgeschlagen – auftrag_id=%s", a.id)
+            errors[rechnung.id] = str(exc)
+
+    if bundle_parts:
+        merge_pdfs(bundle_parts, bundle_path)
+    return errors
+
+def render_postversand_bundle(prepared: list[tuple[Auftrag, Rechnung]], bundle_path: Path) -> dict[int, str]:
+    """
+    Erzeugt das Sammel-PDF (Anschreiben bei Angehörigen + Rechnung je Auftrag)
+    in einem WeasyPrint-Durchlauf; die Einzel-PDFs werden aus den Seiten
+    geschnitten und pdf_path gesetzt.
+    Gibt {rechnung.id: Fehlermeldung} zurück; fehlerhafte Aufträge fehlen im Bundle.
+    """
+    errors: dict[int, str] = {}
+    docs: list[BundleDoc] = []
+    included: list[tuple[Rechnung, Path]] = []
+
+    for a, rechnung in prepared:
+        try:
+            job = pdf_job_for_rechnung(rechnung)
+            auftrag_docs = []
+            if a.kostenstelle == KostenstelleEnum.ANGEHOERIGE:
+                auftrag_docs.append(BundleDoc(
+                    kind=DOC_ANSCHREIBEN,
+                    html=render_anschreiben_html(rechnung),
+                    out_path=anschreiben_pdf_path(rechnung),
+                ))
+            auftrag_docs.append(BundleDoc(
+                kind=DOC_RECHNUNG,
+                html=render_template("rechnungen/standard.html", vm=job.vm, pdf=True),
+                out_path=job.out_path,
+                cache_key=rechnung_cache_key(job.vm),
+            ))
+        except Exception as exc:
+            logger.exception("send_batch_post: Dokumente nicht vorbereitet – auftrag_id=%s", a.id)
+            errors[rechnung.id] = str(exc)
+            continue
+        docs += auftrag_docs
+        included.append((rechnung, job.out_path))
+
+    if not docs:
+        return errors
+
+    try:
+        render_bundle(docs, bundle_path)
+    except Exception:
+        logger.exception("send_batch_post: Sammeldruck in einem Durchlauf fehlgeschlagen, rendere einzeln")
+        failed = set(errors)
+        errors.update(_postversand_bundle_einzeln(
+            [(a, r) for a, r in prepared if r.id not in failed], bundle_path
+        ))
+        return errors
+
+    for rechnung, out_path in included:
+        rechnung.pdf_path = str(out_path)
+    return errors
+
 @bp.get("/postversand/download/<path:bundle_name>")
 def download_postversand_bundle(bundle_name: str):
     bundle_dir = Path(current_app.instance_path) / "exports" / "postversand"
@@ -304,33 +440,68 @@ def download_postversand_bundle(bundle_name: str):
         max_age=0,
     )
 
+@bp.get("/archiv.zip", endpoint="archive_zip")
+def archive_zip():
+    """
+    Rechnungs-PDFs als ZIP-Stream, gefiltert über
+    ?year=2025&month=3&institut_id=4&status=SENT (alle optional).
+    """
+    try:
+        status = request.args.get("status")
+        filt = ArchiveFilter(
+            year=request.args.get("year", type=int),
+            month=request.args.get("month", type=int),
+            institut_id=request.args.get("institut_id", type=int),
+            status=RechnungsStatusEnum(status) if status else None,
+        )
+    except ValueError as exc:
+        abort(400, description=str(exc))
+
+    invoices_dir = Path(current_app.instance_path) / "invoices"
+    logger.info("archive_zip: Export gestartet – %s", filt)
+
+    return Response(
+        stream_with_context(stream_zip(iter_archive_files(filt, invoices_dir))),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filt.zip_name}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
 def pick_angehoeriger_for_auftrag(auftrag: Auftrag) -> Angehoeriger | None:
     if not auftrag.patient or not auftrag.patient.angehoerige:
         return None
     # simple Heuristik: erster Eintrag
     return auftrag.patient.angehoerige[0]
 
-def send_invoice_email(
+def _send_via_transport(msg: EmailMessage, settings: MailSettings, transport: SmtpTransport | None) -> None:
+    """Über die offene Batch-Verbindung senden, sonst eine eigene für diese Mail."""
+    if transport is not None:
+        transport.send(msg)
+        return
+    with SmtpTransport(settings) as single:
+        single.send(msg)
+
+def _archive_via_archiver(
+    msg: EmailMessage, folder: str, label: str, settings: MailSettings, archiver: ImapArchiver | None
+) -> None:
+    """Beim Batch-Archiver vormerken, sonst sofort in einer eigenen IMAP-Sitzung ablegen."""
+    if archiver is not None:
+        archiver.add(folder, msg.as_bytes(), label)
+        return
+    with ImapArchiver(settings) as single:
+        single.add(folder, msg.as_bytes(), label)
+
+def build_invoice_message(
     rechnung: Rechnung,
     recipient_email: str,
-    empfaenger_obj: RecipientModel | None = None,
-) -> None:
-    """
-    Versendet die Rechnung als E-Mail mit PDF-Anhang und legt sie im IMAP-"Sent"-Ordner ab.
-    - SMTP/IMAP-Konfiguration wird aus current_app.config gelesen.
-    """
-
+    empfaenger_obj: RecipientModel | None,
+    settings: MailSettings,
+) -> EmailMessage:
+    """Baut die Rechnungs-Mail (Text je nach Empfänger + PDF-Anhang)."""
     cfg = current_app.config
-
-    EMAIL_ADDRESS = cfg.get("MAIL_USERNAME")
-    EMAIL_PASSWORD = cfg.get("MAIL_PASSWORD")
-    SMTP_SERVER = cfg.get("MAIL_SERVER", "smtp.mail.de")
-    SMTP_PORT = int(cfg.get("MAIL_PORT", 465))  # SSL-Port (z. B. 465)
-    IMAP_SERVER = cfg.get("MAIL_IMAP_SERVER", cfg.get("IMAP_SERVER", "imap.mail.de"))
-
-    if not all([EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER, SMTP_PORT, IMAP_SERVER]):
-        logger.error("Mail-Konfiguration unvollständig, Versand abgebrochen.")
-        raise RuntimeError("Mail-Konfiguration ist unvollständig.")
+    EMAIL_ADDRESS = settings.username
 
     if not rechnung.pdf_path:
         raise RuntimeError("Rechnung hat keinen pdf_path – PDF muss vorher erzeugt werden.")
@@ -338,7 +509,7 @@ def send_invoice_email(
     dateipfad = Path(rechnung.pdf_path)
     if not dateipfad.is_file():
         raise FileNotFoundError(f"PDF-Datei nicht gefunden: {dateipfad}")
-    
+
     is_angehoeriger = isinstance(empfaenger_obj, Angehoeriger)
     if is_angehoeriger:
         anrede_angehoerige = build_anrede_for_angehoeriger(empfaenger_obj)
@@ -366,11 +537,6 @@ def send_invoice_email(
         )
 
     filename = f"Rechnung_{rechnung.auftrag.auftragsnummer}.pdf"
-    logger.info(
-        "Starte E-Mail-Versand an %s mit Anhang: %s",
-        recipient_email,
-        filename,
-    )
 
     msg = EmailMessage()
     msg["Subject"] = betreff
@@ -391,34 +557,41 @@ def send_invoice_email(
             subtype=sub_type,
             filename=filename,
         )
+    return msg
+
+def send_invoice_email(
+    rechnung: Rechnung,
+    recipient_email: str,
+    empfaenger_obj: RecipientModel | None = None,
+    transport: SmtpTransport | None = None,
+    archiver: ImapArchiver | None = None,
+) -> None:
+    """
+    Versendet die Rechnung als E-Mail mit PDF-Anhang und legt sie im IMAP-"Sent"-Ordner ab.
+    - SMTP/IMAP-Konfiguration wird aus current_app.config gelesen.
+    - transport: offene SMTP-Verbindung des Batch-Laufs; ohne wird für
+      diese eine Mail eine Verbindung aufgebaut.
+    - archiver: sammelt die Mail für die IMAP-Ablage nach dem Versandlauf;
+      ohne wird sie sofort abgelegt.
+    """
+    settings = MailSettings.from_config(current_app.config)
+    msg = build_invoice_message(rechnung, recipient_email, empfaenger_obj, settings)
+
+    logger.info(
+        "Starte E-Mail-Versand an %s für Rechnung %s",
+        recipient_email,
+        rechnung.id,
+    )
 
-    # --- SMTP-Versand (wie in deiner anderen App: SMTP_SSL) ---
+    # --- SMTP-Versand über die (geteilte) Verbindung ---
     try:
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
-            smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            smtp.send_message(msg)
+        _send_via_transport(msg, settings, transport)
     except Exception:
         logger.exception("Fehler beim SMTP-Versand")
         raise
 
-    # --- IMAP: in "Rechnungen_LS" ablegen (identisch zum bewährten Code) ---
-    try:
-        time.sleep(1)  # kleiner Delay wie in deiner anderen App
-        raw_message = msg.as_bytes()
-
-        with imaplib.IMAP4_SSL(IMAP_SERVER) as imap:
-            imap.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            # imap.append('"Sent"', '\\Seen', imaplib.Time2Internaldate(time.localtime()), raw_message)
-            imap.append('"Leichenschau/Rechnungen"', '\\Seen', imaplib.Time2Internaldate(time.localtime()), raw_message)
-
-        logger.info(
-            "E-Mail für Rechnung %s im IMAP-Ordner 'Rechnungen_LS' gespeichert.",
-            rechnung.id,
-        )
-
-    except Exception:
-        logger.exception("Fehler beim Speichern der Mail im IMAP-Ordner 'Rechnungen_LS' (IMAP)")
-        # Versand war erfolgreich, daher Fehler hier nur loggen
+    # --- IMAP: in "Leichenschau/Rechnungen" ablegen (Fehler werden nur geloggt) ---
+    _archive_via_archiver(msg, RECHNUNGEN_FOLDER, f"Rechnung {rechnung.id}", settings, archiver)
 
 def build_inquiry_html_table(auftraege: list[Auftrag]) -> str:
     """
@@ -473,29 +646,20 @@ def build_inquiry_html_table(auftraege: list[Auftrag]) -> str:
     """
     return table_html
 
-def send_inquiry_email(
+def build_inquiry_message(
     institut: Bestattungsinstitut,
     auftraege: list[Auftrag],
-) -> None:
+    settings: MailSettings,
+) -> EmailMessage:
     """
-    Versendet eine Anfrage an ein Bestattungsinstitut mit einer Tabelle
+    Baut die Anfrage-Mail an ein Bestattungsinstitut mit einer Tabelle
     der betroffenen Leichenschauen im Mailtext (HTML).
     """
-
     if not institut.email:
         raise RuntimeError("Bestattungsinstitut hat keine E-Mail-Adresse.")
 
     cfg = current_app.config
-
-    EMAIL_ADDRESS = cfg.get("MAIL_USERNAME")
-    EMAIL_PASSWORD = cfg.get("MAIL_PASSWORD")
-    SMTP_SERVER = cfg.get("MAIL_SERVER", "smtp.mail.de")
-    SMTP_PORT = int(cfg.get("MAIL_PORT", 465))  # SSL-Port (z. B. 465)
-    IMAP_SERVER = cfg.get("MAIL_IMAP_SERVER", cfg.get("IMAP_SERVER", "imap.mail.de"))
-
-    if not all([EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER, SMTP_PORT, IMAP_SERVER]):
-        logger.error("Mail-Konfiguration unvollständig, Inquiry-Versand abgebrochen.")
-        raise RuntimeError("Mail-Konfiguration ist unvollständig.")
+    EMAIL_ADDRESS = settings.username
 
     anzahl = len(auftraege)
 
@@ -539,12 +703,6 @@ def send_inquiry_email(
     </p>
     """
 
-    logger.info(
-        "Starte Inquiry-E-Mail-Versand an %s für %s Aufträge",
-        institut.email,
-        anzahl,
-    )
-
     msg = EmailMessage()
     msg["Subject"] = betreff
     msg["From"] = EMAIL_ADDRESS
@@ -553,37 +711,66 @@ def send_inquiry_email(
     # Plaintext + HTML-Alternative
     msg.set_content(text_plain)
     msg.add_alternative(text_html, subtype="html")
+    return msg
+
+def send_inquiry_email(
+    institut: Bestattungsinstitut,
+    auftraege: list[Auftrag],
+    transport: SmtpTransport | None = None,
+    archiver: ImapArchiver | None = None,
+) -> None:
+    """
+    Versendet eine Anfrage an ein Bestattungsinstitut mit einer Tabelle
+    der betroffenen Leichenschauen im Mailtext (HTML).
+    """
+    settings = MailSettings.from_config(current_app.config)
+    msg = build_inquiry_message(institut, auftraege, settings)
+
+    logger.info(
+        "Starte Inquiry-E-Mail-Versand an %s für %s Aufträge",
+        institut.email,
+        len(auftraege),
+    )
 
     # --- SMTP-Versand ---
     try:
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
-            smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            smtp.send_message(msg)
+        _send_via_transport(msg, settings, transport)
     except Exception:
         logger.exception("Fehler beim SMTP-Versand der Inquiry-Mail")
         raise
 
-    # --- IMAP: in 'Leichenschau/Anfragen' ablegen ---
-    try:
-        time.sleep(1)
-        raw_message = msg.as_bytes()
-
-        with imaplib.IMAP4_SSL(IMAP_SERVER) as imap:
-            imap.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            imap.append(
-                '"Leichenschau/Anfragen"',
-                "\\Seen",
-                imaplib.Time2Internaldate(time.localtime()),
-                raw_message,
-            )
+    # --- IMAP: in 'Leichenschau/Anfragen' ablegen (Fehler werden nur geloggt) ---
+    _archive_via_archiver(msg, ANFRAGEN_FOLDER, f"Anfrage Institut {institut.id}", settings, archiver)
+
+def _mark_inquired(groups: list[tuple[Bestattungsinstitut, list[Auftrag]]], wait_due_date: date) -> None:
+    """
+    Nach versendeten Anfragen: alle Aufträge in einem UPDATE auf WAIT mit
+    Frist, Verlaufseinträge in einem INSERT (Commit beim Aufrufer).
+    """
+    ids = [a.id for _, auftraege in groups for a in auftraege]
+    if not ids:
+        return
+
+    db.session.execute(
+        update(Auftrag)
+        .where(Auftrag.id.in_(ids))
+        .values(status=AuftragsStatusEnum.WAIT, wait_due_date=wait_due_date, is_inquired=True)
+    )
 
-        logger.info(
-            "Inquiry-E-Mail im IMAP-Ordner 'Leichenschau/Anfragen' gespeichert (Institut %s).",
-            institut.id,
+    frist = wait_due_date.strftime("%d.%m.%Y")
+    verlauf_rows = []
+    for institut, auftraege in groups:
+        inst_name = (
+            institut.kurzbezeichnung
+            or institut.firmenname
+            or f"Bestattungsinstitut #{institut.id}"
         )
-    except Exception:
-        logger.exception("Fehler beim Speichern der Inquiry-Mail im IMAP-Ordner")
-        # Versand war erfolgreich, Fehler hier nur loggen
+        text = f"Anfrage an {inst_name} gesendet, automatische Frist bis {frist}"
+        verlauf_rows += [
+            {"auftrag_id": a.id, "datum": date.today(), "ereignis": text}
+            for a in auftraege
+        ]
+    db.session.execute(insert(Verlauf), verlauf_rows)
 
 @bp.route("/<int:aid>/create", methods=["GET", "POST"])
 def create(aid):
@@ -608,6 +795,7 @@ def create(aid):
             )
 
             # 2) Betrag über das bestehende ViewModel berechnen
+            ensure_distance(auftrag.auftragsadresse)
             vm = build_rechnung_vm(
                 auftrag=auftrag,
                 cfg=current_app.config,
@@ -772,46 +960,55 @@ def show_pdf(rid: int):
 def rechnung(aid):
     auftrag = Auftrag.query.get_or_404(aid)
 
-    vm = build_rechnung_vm(
-        auftrag=auftrag,
-        cfg=current_app.config,
-        rechnungsdatum=date.today()
-    )
+    # Altbestand ohne Entfernung: Schätzung für die Vorschau, Backfill im Hintergrund
+    ensure_distance(auftrag.auftragsadresse)
+    try:
+        vm = build_rechnung_vm(
+            auftrag=auftrag,
+            cfg=current_app.config,
+            rechnungsdatum=date.today(),
+            rechnungsart="RECHNUNG",
+        )
+    except EntfernungFehlt as exc:
+        flash(str(exc), "warning")
+        return redirect(url_for("patients.detail", pid=auftrag.patient_id))
     return render_template("rechnungen/standard.html", vm=vm)
 
 @bp.get("/<int:aid>/pdf")
 def rechnung_pdf(aid: int):
     auftrag = Auftrag.query.get_or_404(aid)
 
-    vm = build_rechnung_vm(
-        auftrag=auftrag,
-        cfg=current_app.config,
-        rechnungsdatum=date.today()
-    )
-
-    # 1) HTML rendern
-    html_str = render_template("rechnungen/standard.html", vm=vm)
-
-    # 2) Basis-URL setzen, damit /static/... im Template korrekt aufgelöst wird
-    #    request.host_url -> http://localhost:5000/  (funktioniert mit url_for-Pfaden)
-    base_url = request.host_url
-
-    # 3) PDF erzeugen
-    pdf_bytes = HTML(string=html_str, base_url=base_url).write_pdf()
-
-    # 4) Dateinamen & Speicherort bestimmen
+    # Altbestand ohne Entfernung: Schätzung für die Vorschau, Backfill im Hintergrund
+    ensure_distance(auftrag.auftragsadresse)
+    try:
+        vm = build_rechnung_vm(
+            auftrag=auftrag,
+            cfg=current_app.config,
+            rechnungsdatum=date.today(),
+            rechnungsart="RECHNUNG",
+        )
+    except EntfernungFehlt as exc:
+        flash(str(exc), "warning")
+        return redirect(url_for("patients.detail", pid=auftrag.patient_id))
     filename = f"Rechnung_{auftrag.auftragsnummer}.pdf"
-    rechnungsdatum = date.today()
-    year = str(rechnungsdatum.year)
-    month = f"{rechnungsdatum.month:02d}"
 
-    save_dir = Path(current_app.instance_path) / "invoices" / year / month
-    file_path = save_dir / filename
+    # 1) Unverändertes ViewModel -> vorhandenes PDF aus dem Cache,
+    #    sonst einmal rendern und im Cache ablegen
+    file_path = cached_rechnung_pdf(vm)
 
-    # 5) Speichern
-    file_path.write_bytes(pdf_bytes)
+    # 2) Cache abgeschaltet: wie bisher nach instance/invoices/YYYY/MM rendern
+    if file_path is None:
+        rechnungsdatum = date.today()
+        save_dir = (
+            Path(current_app.instance_path) / "invoices"
+            / str(rechnungsdatum.year) / f"{rechnungsdatum.month:02d}"
+        )
+        [result] = render_rechnung_pdfs([PdfJob(vm=vm, out_path=save_dir / filename)], workers=1)
+        if not result.ok:
+            abort(500, description=f"PDF-Erstellung fehlgeschlagen: {result.error}")
+        file_path = result.path
 
-    # 6) Direkt im Browser anzeigen (kein Download-Zwang)
+    # 3) Direkt im Browser anzeigen (kein Download-Zwang)
     return send_file(
         path_or_file=str(file_path),
         mimetype="application/pdf",
@@ -927,6 +1124,24 @@ def send_batch_email():
         flash("Ungültige Auswahl.", "danger")
         return redirect(url_for("rechnungen.send_batch_email"))
 
+    # Mail-Konfiguration gleich prüfen, nicht erst im Hintergrund-Job
+    try:
+        MailSettings.from_config(current_app.config)
+    except RuntimeError as exc:
+        flash(f"Fehler beim Versenden: {exc}", "danger")
+        return redirect(url_for("rechnungen.send_batch_email"))
+
+    job_id = start_job(
+        JOB_SEND_BATCH_EMAIL,
+        total=len(selected_ids),
+        params={"auftrag_ids": selected_ids},
+        runner=partial(_run_send_batch_email, selected_ids),
+        base_url=request.url_root,
+    )
+    return redirect(url_for("rechnungen.batch_job", job_id=job_id))
+
+def _run_send_batch_email(selected_ids: list[int], progress: JobProgress) -> dict:
+    """Hintergrund-Teil von send_batch_email: Rechnungen + PDFs, Mails in die Outbox."""
     # Nur die ausgewählten + weiterhin READY
     auftraege = (
         db.session.query(Auftrag)
@@ -940,9 +1155,6 @@ def send_batch_email():
         .all()
     )
 
-    successes: list[Auftrag] = []
-    failures: list[tuple[Auftrag, str]] = []
-
     # Tracken, falls ausgewählte IDs nicht mehr READY / nicht gefunden sind
     found_ids = {a.id for a in auftraege}
     missing_ids = set(selected_ids) - found_ids
@@ -951,39 +1163,87 @@ def send_batch_email():
             "send_batch_email: Einige ausgewählte Aufträge sind nicht mehr READY oder existieren nicht: %s",
             missing_ids,
         )
+        for aid in sorted(missing_ids):
+            progress.fail(db.session.get(Auftrag, aid), "Nicht mehr READY für den E-Mail-Versand")
 
+    # 1) Rechnungen anlegen (ohne PDF)
+    prepared: list[tuple[Auftrag, Rechnung, str, RecipientModel | None]] = []
     for a in auftraege:
         try:
-            rechnung = create_rechnung_for_auftrag(a)
             recipient, empfaenger_obj = determine_recipient_for_auftrag(a)
 
             if not recipient:
-                failures.append((a, "Keine E-Mail-Adresse gefunden"))
+                progress.fail(a, "Keine E-Mail-Adresse gefunden")
                 continue
 
-            send_invoice_email(rechnung, recipient, empfaenger_obj=empfaenger_obj)
-
-            rechnung.status = RechnungsStatusEnum.SENT
-            rechnung.gesendet_datum = datetime.now()
-            a.status = AuftragsStatusEnum.SENT
-            add_verlauf(a, f"Rechnung Version {rechnung.version} verschickt")
+            rechnung = create_rechnung_for_auftrag(a, render_pdf=False)
+            prepared.append((a, rechnung, recipient, empfaenger_obj))
+            progress.emit(STAGE_CREATED, a, f"Rechnung v{rechnung.version} angelegt")
+        except Exception as exc:
+            logger.exception("Fehler beim Anlegen der Rechnung für Auftrag %s", a.id)
+            progress.fail(a, str(exc))
+
+    # 2) PDFs gesammelt auf allen Kernen rendern
+    def _rendered(rechnung: Rechnung, error: str | None) -> None:
+        if error is None:
+            progress.emit(STAGE_RENDERED, rechnung.auftrag, "PDF erstellt")
+
+    pdf_errors = render_pdfs_for_rechnungen([r for _, r, _, _ in prepared], on_rendered=_rendered)
+
+    # 3) Mails bauen und in die Outbox legen – zugestellt wird im outbox-worker
+    settings = MailSettings.from_config(current_app.config)
+    batch_id = new_batch_id()
+    queued = 0
+    for a, rechnung, recipient, empfaenger_obj in prepared:
+        if rechnung.id in pdf_errors:
+            progress.fail(a, pdf_errors[rechnung.id])
+            continue
 
-            successes.append(a)
+        try:
+            msg = build_invoice_message(rechnung, recipient, empfaenger_obj, settings)
+            enqueue_mail(rechnung, recipient, msg, batch_id)
+            add_verlauf(a, f"Rechnung Version {rechnung.version} zum E-Mail-Versand eingereiht")
+            progress.emit(STAGE_QUEUED, a, f"an {recipient} eingereiht", final=True)
+            queued += 1
         except Exception as exc:
-            logger.exception("Fehler beim Versand für Auftrag %s", a.id)
-            failures.append((a, str(exc)))
+            logger.exception("Fehler beim Einreihen für Auftrag %s", a.id)
+            progress.fail(a, str(exc))
+
+    db.session.commit()
+    logger.info("send_batch_email: %s Mail(s) in Outbox-Batch %s eingereiht", queued, batch_id)
+
+    return {
+        "outbox_batch_id": batch_id,
+        "links": [{
+            "label": "Zustellung/Durchsatz",
+            "url": url_for("rechnungen.send_batch_status", batch_id=batch_id),
+        }] if queued else [],
+    }
+
+@bp.route("/send-batch/<batch_id>", methods=["GET"])
+def send_batch_status(batch_id: str):
+    """Stand eines eingereihten Batch-Versands inkl. Durchsatz."""
+    report = batch_report(batch_id)
+    if report is None:
+        abort(404)
 
-    try:
-        db.session.commit()
-    except SQLAlchemyError as exc:
-        db.session.rollback()
-        logger.exception("Fehler beim Commit im Batch-Versand")
-        flash(f"Fehler beim Speichern des Versandstatus: {exc}", "danger")
-        return redirect(url_for("rechnungen.send_batch_email"))
+    messages = (
+        db.session.query(OutboxMessage)
+        .filter(OutboxMessage.batch_id == batch_id)
+        .order_by(OutboxMessage.id)
+        .all()
+    )
+    queued = [m.rechnung.auftrag for m in messages if m.status in PENDING_STATUSES]
+    failures = [
+        (m.rechnung.auftrag, m.last_error or "unbekannter Fehler")
+        for m in messages if m.status == OutboxStatusEnum.FAILED
+    ]
 
     return render_template(
         "rechnungen/send_batch_result.html",
-        successes=successes,
+        queued=queued,
+        batch_id=batch_id,
+        report=report,
         failures=failures,
     )
 
@@ -1050,28 +1310,7 @@ def send_inquiry():
 
     try:
         send_inquiry_email(institut, auftraege)
-
-        for a in auftraege:
-            institut = a.bestattungsinstitut 
-
-            a.status = AuftragsStatusEnum.WAIT
-            a.wait_due_date = date.today() + timedelta(days=7)
-            a.is_inquired = True
-
-            inst_name = (
-                institut.kurzbezeichnung
-                or institut.firmenname
-                or f"Bestattungsinstitut #{institut.id}"
-            )
-
-            add_verlauf(
-                a,
-                (
-                    f"Anfrage an {inst_name} gesendet, "
-                    f"automatische Frist bis {a.wait_due_date.strftime('%d.%m.%Y')}"
-                )
-            )
-
+        _mark_inquired([(institut, auftraege)], date.today() + timedelta(days=INQUIRY_WAIT_DAYS))
         db.session.commit()
         flash(
             f"Anfrage für {len(auftraege)} Auftrag/Aufträge an {institut.email} gesendet.",
@@ -1086,13 +1325,88 @@ def send_inquiry():
 
     return redirect(url_for("rechnungen.send_inquiry"))
 
+@bp.post("/inquiry/send-all", endpoint="send_inquiry_all")
+def send_inquiry_all():
+    """
+    Alle offenen Anfragen auf einmal: ein Query für alle INQUIRY-Aufträge,
+    gruppiert nach Bestattungsinstitut, eine Mail pro Institut über eine
+    gemeinsame SMTP-Verbindung und IMAP-Sitzung, ein Commit am Ende.
+    """
+    form = DummyCSRFForm()
+    if not form.validate_on_submit():
+        abort(400, description="Ungültiges CSRF-Token")
+
+    try:
+        settings = MailSettings.from_config(current_app.config)
+    except RuntimeError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("rechnungen.send_inquiry"))
+
+    auftraege = (
+        db.session.query(Auftrag)
+        .filter(ready_for_inquiry_filter())
+        .options(
+            selectinload(Auftrag.bestattungsinstitut),
+            selectinload(Auftrag.patient),
+            selectinload(Auftrag.auftragsadresse),
+        )
+        .order_by(Auftrag.bestattungsinstitut_id, Auftrag.auftragsdatum.asc())
+        .all()
+    )
+    if not auftraege:
+        flash("Keine offenen Anfragen.", "info")
+        return redirect(url_for("rechnungen.send_inquiry"))
+
+    # Mails in einem Durchgang bauen (Tabellen via build_inquiry_html_table)
+    groups: list[tuple[Bestattungsinstitut, list[Auftrag]]] = []
+    for _, grp in groupby(auftraege, key=lambda a: a.bestattungsinstitut_id):
+        group = list(grp)
+        groups.append((group[0].bestattungsinstitut, group))
+    messages = [(institut, group, build_inquiry_message(institut, group, settings)) for institut, group in groups]
+
+    wait_due_date = date.today() + timedelta(days=INQUIRY_WAIT_DAYS)
+    sent: list[tuple[Bestattungsinstitut, list[Auftrag]]] = []
+    failures: list[str] = []
+    with SmtpTransport(settings) as transport, ImapArchiver(settings) as archiver:
+        for institut, group, msg in messages:
+            try:
+                transport.send(msg)
+            except Exception as exc:
+                logger.exception("Fehler beim Inquiry-Versand an Bestattungsinstitut_id=%s", institut.id)
+                failures.append(f"{institut.kurzbezeichnung or institut.firmenname or institut.id}: {exc}")
+                continue
+            archiver.add(ANFRAGEN_FOLDER, msg.as_bytes(), f"Anfrage Institut {institut.id}")
+            sent.append((institut, group))
+
+    sent_count = sum(len(group) for _, group in sent)
+    try:
+        _mark_inquired(sent, wait_due_date)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("Inquiry-Sammelversand: Commit fehlgeschlagen")
+        flash("Anfragen wurden versendet, der Status konnte aber nicht gespeichert werden.", "danger")
+        return redirect(url_for("rechnungen.send_inquiry"))
+
+    if sent_count:
+        flash(
+            f"Anfragen für {sent_count} Auftrag/Aufträge an {len(sent)} "
+            f"Bestattungsinstitut(e) gesendet.",
+            "success",
+        )
+    for failure in failures:
+        flash(f"Fehler beim Versenden der Anfrage: {failure}", "danger")
+
+    return redirect(url_for("rechnungen.send_inquiry"))
+
 @bp.route("/send-batch-post", methods=["GET", "POST"])
 def send_batch_post():
     """
     Postversand-Workflow:
     - GET: zeigt READY-Aufträge ohne zustellbare E-Mail (>= 3 Tage alt)
-    - POST: erzeugt pro Auftrag eine neue Rechnung+PDF, setzt Status PRINT,
-            packt PDFs als ZIP und liefert den Download zurück.
+    - POST: startet einen Hintergrund-Job, der pro Auftrag eine neue
+            Rechnung+PDF erzeugt, Status PRINT setzt und das Sammel-PDF
+            baut; Fortschritt und Download auf der Job-Seite.
     """
     form = DummyCSRFForm()
 
@@ -1136,6 +1450,17 @@ def send_batch_post():
         flash("Ungültige Auswahl.", "danger")
         return redirect(url_for("rechnungen.send_batch_post"))
 
+    job_id = start_job(
+        JOB_SEND_BATCH_POST,
+        total=len(selected_ids),
+        params={"auftrag_ids": selected_ids},
+        runner=partial(_run_send_batch_post, selected_ids),
+        base_url=request.url_root,
+    )
+    return redirect(url_for("rechnungen.batch_job", job_id=job_id))
+
+def _run_send_batch_post(selected_ids: list[int], progress: JobProgress) -> dict:
+    """Hintergrund-Teil von send_batch_post: Rechnungen, Sammel-PDF, Status PRINT."""
     # Nur ausgewählte + weiterhin print-ready
     auftraege = (
         db.session.query(Auftrag)
@@ -1157,71 +1482,60 @@ def send_batch_post():
             "send_batch_post: Einige ausgewählte Aufträge sind nicht mehr READY/print-ready oder existieren nicht: %s",
             missing_ids,
         )
+        for aid in sorted(missing_ids):
+            progress.fail(db.session.get(Auftrag, aid), "Nicht mehr READY für den Postversand")
 
-    successes: list[Auftrag] = []
-    failures: list[tuple[Auftrag, str]] = []
-    bundle_parts: list[Path] = []
-
-    try:
-        for a in auftraege:
-            try:
-                rechnung = create_rechnung_for_auftrag(a)
-
-                # Status & Verlauf
-                a.status = AuftragsStatusEnum.PRINT
-                rechnung.status = RechnungsStatusEnum.CREATED
-                add_verlauf(a, f"Rechnung v{rechnung.version} für Postversand erstellt")
-
-                if not rechnung.pdf_path:
-                    raise RuntimeError("pdf_path fehlt nach Rechnungserstellung")
-                invoice_path = Path(rechnung.pdf_path)
-
-                # >>> NEU: Anschreiben bei Angehörigen voranstellen
-                if a.kostenstelle == KostenstelleEnum.ANGEHOERIGE:
-                    empfaenger = pick_angehoeriger_for_auftrag(a)
-                    cover_path = generate_anschreiben_pdf(rechnung)
-                    bundle_parts.append(cover_path)
-
-                bundle_parts.append(invoice_path)
+    bundle_dir = Path(current_app.instance_path) / "exports" / "postversand"
+    bundle_name = f"Postversand_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
 
-                successes.append(a)
+    # 1) Rechnungen anlegen (ohne PDF)
+    prepared: list[tuple[Auftrag, Rechnung]] = []
+    for a in auftraege:
+        try:
+            rechnung = create_rechnung_for_auftrag(a, render_pdf=False)
+            prepared.append((a, rechnung))
+            progress.emit(STAGE_CREATED, a, f"Rechnung v{rechnung.version} angelegt")
+        except Exception as exc:
+            logger.exception("send_batch_post: Fehler bei Auftrag %s", a.id)
+            progress.fail(a, str(exc))
 
-            except Exception as exc:
-                logger.exception("send_batch_post: Fehler bei Auftrag %s", a.id)
-                failures.append((a, str(exc)))
+    # 2) Sammel-PDF + Einzel-PDFs in einem Durchlauf
+    #    (Anschreiben bei Angehörigen jeweils vor der Rechnung)
+    progress.emit(STAGE_INFO, message=f"Sammel-PDF mit {len(prepared)} Rechnung(en) wird erstellt")
+    pdf_errors = render_postversand_bundle(prepared, bundle_dir / bundle_name)
 
-        db.session.commit()
+    successes = 0
+    for a, rechnung in prepared:
+        try:
+            if rechnung.id in pdf_errors:
+                raise RuntimeError(pdf_errors[rechnung.id])
+            if not rechnung.pdf_path:
+                raise RuntimeError("pdf_path fehlt nach Rechnungserstellung")
 
-    except SQLAlchemyError as exc:
-        db.session.rollback()
-        logger.exception("send_batch_post: Fehler beim Commit")
-        flash(f"Fehler beim Speichern des Postversand-Status: {exc}", "danger")
-        return redirect(url_for("rechnungen.send_batch_post"))
+            # Status & Verlauf
+            a.status = AuftragsStatusEnum.PRINT
+            rechnung.status = RechnungsStatusEnum.CREATED
+            add_verlauf(a, f"Rechnung v{rechnung.version} für Postversand erstellt")
 
-    if not bundle_parts and failures:
-        flash("Es konnten keine PDFs erzeugt werden.", "danger")
-        return render_template(
-            "rechnungen/send_batch_post_result.html",
-            successes=successes,
-            failures=failures,
-        )
+            progress.emit(STAGE_RENDERED, a, "im Sammel-PDF", final=True)
+            successes += 1
 
-    bundle_dir = Path(current_app.instance_path) / "exports" / "postversand"
-    bundle_name = f"Postversand_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    merge_pdfs(bundle_parts, bundle_dir / bundle_name)
+        except Exception as exc:
+            logger.exception("send_batch_post: Fehler bei Auftrag %s", a.id)
+            progress.fail(a, str(exc))
 
-    if failures:
-        flash(f"{len(successes)} OK, {len(failures)} Fehler – Sammel-PDF enthält nur erfolgreiche.", "warning")
+    db.session.commit()
 
-    flash("Sammel-PDF erstellt.", "success")
+    if not successes:
+        return {"links": []}
 
-    # Statt direktem Download: Result-Page mit Download-Link
-    return render_template(
-        "rechnungen/send_batch_post_result.html",
-        successes=successes,
-        failures=failures,
-        bundle_name=bundle_name,   # <-- nur Name übergeben
-    )
+    return {
+        "bundle_name": bundle_name,
+        "links": [{
+            "label": f"Sammel-PDF herunterladen ({bundle_name})",
+            "url": url_for("rechnungen.download_postversand_bundle", bundle_name=bundle_name),
+        }],
+    }
 
 @bp.route("/print/batch", methods=["GET", "POST"], endpoint="print_batch")
 def print_batch():
@@ -1255,52 +1569,134 @@ def print_batch():
 
         # Map auftrag_id -> checked aus dem Form
         selected_ids = [
-            item.auftrag_id.data
+            int(item.auftrag_id.data)
             for item in form.items
-            if item.checked.data
+            if item.checked.data and str(item.auftrag_id.data).isdigit()
         ]
 
         if not selected_ids:
             flash("Keine Aufträge ausgewählt.", "warning")
             return redirect(url_for("rechnungen.print_batch"))
 
-        # Aufträge laden (nur die ausgewählten + noch PRINT zur Sicherheit)
-        selected_auftraege = (
-            db.session.query(Auftrag)
-            .filter(Auftrag.id.in_(selected_ids))
-            .filter(Auftrag.status == AuftragsStatusEnum.PRINT)
-            .all()
+        job_id = start_job(
+            JOB_PRINT_BATCH,
+            total=len(selected_ids),
+            params={"auftrag_ids": selected_ids, "versanddatum": versanddatum.isoformat()},
+            runner=partial(_run_print_batch, selected_ids, versanddatum),
+            base_url=request.url_root,
         )
-
-        updated = 0
-        for a in selected_auftraege:
-            # Auftrag -> SENT
-            a.status = AuftragsStatusEnum.SENT
-            updated += 1
-
-            # Zugehörige höchste Rechnung im Status CREATED -> SENT
-            # "höchste" = z.B. max(version) oder max(id) – nimm das, was bei dir stimmt.
-            inv = (
-                db.session.query(Rechnung)
-                .filter(Rechnung.auftrag_id == a.id)
-                .filter(Rechnung.status == RechnungsStatusEnum.CREATED)
-                .order_by(Rechnung.version.desc(), Rechnung.id.desc())  # falls version existiert
-                .first()
-            )
-            if inv:
-                inv.status = RechnungsStatusEnum.SENT
-
-            # Verlauf (empfohlen)
-            add_verlauf(
-                auftrag=a,
-                datum=versanddatum,
-                text="Postalischer Versand",
-            )
-
-        db.session.commit()
-        flash(f"{updated} Auftrag/Aufträge wurden auf SENT gesetzt.", "success")
-        return redirect(url_for("rechnungen.print_batch")) 
+        return redirect(url_for("rechnungen.batch_job", job_id=job_id))
 
     # Form invalid
     flash("Bitte Eingaben prüfen.", "danger")
     return render_template("rechnungen/print_batch.html", form=form, auftraege=auftraege)
+
+def _run_print_batch(selected_ids: list[int], versanddatum: date, progress: JobProgress) -> dict:
+    """Hintergrund-Teil von print_batch: gedruckte Aufträge + Rechnungen auf SENT."""
+    # Aufträge laden (nur die ausgewählten + noch PRINT zur Sicherheit)
+    selected_auftraege = (
+        db.session.query(Auftrag)
+        .filter(Auftrag.id.in_(selected_ids))
+        .filter(Auftrag.status == AuftragsStatusEnum.PRINT)
+        .all()
+    )
+
+    missing_ids = set(selected_ids) - {a.id for a in selected_auftraege}
+    for aid in sorted(missing_ids):
+        progress.fail(db.session.get(Auftrag, aid), "Nicht mehr im Status PRINT")
+
+    for a in selected_auftraege:
+        # Auftrag -> SENT
+        a.status = AuftragsStatusEnum.SENT
+
+        # Zugehörige höchste Rechnung im Status CREATED -> SENT
+        # "höchste" = z.B. max(version) oder max(id) – nimm das, was bei dir stimmt.
+        inv = (
+            db.session.query(Rechnung)
+            .filter(Rechnung.auftrag_id == a.id)
+            .filter(Rechnung.status == RechnungsStatusEnum.CREATED)
+            .order_by(Rechnung.version.desc(), Rechnung.id.desc())  # falls version existiert
+            .first()
+        )
+        if inv:
+            inv.status = RechnungsStatusEnum.SENT
+
+        # Verlauf (empfohlen)
+        add_verlauf(
+            auftrag=a,
+            datum=versanddatum,
+            text="Postalischer Versand",
+        )
+
+        progress.emit(
+            STAGE_SENT, a,
+            f"Rechnung v{inv.version} auf SENT" if inv else "keine offene Rechnung",
+            final=True,
+        )
+
+    db.session.commit()
+    return {}
+
+@bp.get("/jobs/<int:job_id>", endpoint="batch_job")
+def batch_job(job_id: int):
+    """Job-Seite: Einträge des Batches, füllt sich per SSE."""
+    snapshot = job_snapshot(job_id)
+    if snapshot is None:
+        abort(404)
+    summary, events = snapshot
+
+    job = db.session.get(BatchJob, job_id)
+    ids = (job.params or {}).get("auftrag_ids", [])
+    auftraege = (
+        db.session.query(Auftrag)
+        .options(selectinload(Auftrag.patient))
+        .filter(Auftrag.id.in_(ids))
+        .all()
+    )
+    order = {aid: i for i, aid in enumerate(ids)}
+    auftraege.sort(key=lambda a: order.get(a.id, 0))
+
+    return render_template(
+        "rechnungen/batch_job.html",
+        job=job,
+        summary=summary,
+        events=events,
+        auftraege=auftraege,
+        back_url=url_for(JOB_BACK_ENDPOINTS.get(job.kind, "home.index")),
+    )
+
+def _follow_outbox(result: dict):
+    """Nach dem Einreihen: Zustellung der Mails als weitere Events."""
+    batch_id = result.get("outbox_batch_id")
+    if not batch_id:
+        return
+    for item in watch_batch(batch_id):
+        if item is None:
+            yield None
+            continue
+        failed = item["status"] == OutboxStatusEnum.FAILED
+        yield {
+            "stage": STAGE_FAILED if failed else STAGE_SENT,
+            "auftrag_id": item["auftrag_id"],
+            "message": item["error"] if failed else "zugestellt",
+        }
+
+@bp.get("/jobs/<int:job_id>/events", endpoint="batch_job_events")
+def batch_job_events(job_id: int):
+    """Server-Sent Events eines Jobs (Last-Event-ID wird beim Reconnect berücksichtigt)."""
+    snapshot = job_snapshot(job_id)
+    if snapshot is None:
+        abort(404)
+    summary, _ = snapshot
+
+    last_seq = request.headers.get("Last-Event-ID", type=int) or 0
+    follow = _follow_outbox if summary["kind"] == JOB_SEND_BATCH_EMAIL else None
+
+    return Response(
+        stream_with_context(event_stream(job_id, last_seq, follow=follow)),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: nicht puffern
+        },
+    )
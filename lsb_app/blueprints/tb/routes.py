@@ -1,11 +1,12 @@
 # lsb_app/blueprints/tb/routes.py
-from flask import render_template, redirect, url_for, request, jsonify, flash
+from flask import render_template, redirect, url_for, request, jsonify, flash, current_app
 import os
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 from lsb_app.forms import PatientForm, TBPatientForm
-from lsb_app.services.address_validation import check_address_exists
+from lsb_app.services.address_validation import check_address_exists, check_addresses
+from lsb_app.services.distances import resolve_pending
 import enum
 from sqlalchemy.inspection import inspect as sa_inspect
 from sqlalchemy import event, func, cast, Integer
@@ -57,7 +58,9 @@ def api_validate_address():
             "message": "Bitte Straße, Hausnummer, PLZ und Ort vollständig eingeben."
         }), 200
 
-    ok, msg = check_address_exists(strasse, hausnummer, plz, ort)
+    # nicht hinter anderen Nominatim-Anfragen anstellen, während getippt wird
+    ok, msg = check_address_exists(strasse, hausnummer, plz, ort,
+                                   wait=current_app.config["ADDRESS_VALIDATION_WAIT"])
 
     # Live-Check: bei ok is None zeigen wir rot „Dienst nicht erreichbar“
     if ok is None:
@@ -71,6 +74,48 @@ def api_validate_address():
         "message": msg or ("Adresse gültig." if ok else "Adresse ungültig.")
     }), 200
 
+def _neue_adressen(form):
+    """
+    Alle im Formular neu eingegebenen, vollständigen Adressen:
+    Liste (Feld für Fehlermeldung, Bezeichnung, (strasse, hausnummer, plz, ort)).
+    """
+    adressen = []
+    if form.meldeadresse_id.data == -1:
+        addr = (form.new_strasse.data, form.new_hausnummer.data, form.new_plz.data, form.new_ort.data)
+        if all(addr):
+            adressen.append((form.new_strasse, "Meldeadresse", addr))
+
+    if form.auftragsadresse_id.data == -1:
+        addr = (form.auftrag_strasse.data, form.auftrag_hausnummer.data, form.auftrag_plz.data, form.auftrag_ort.data)
+        if all(addr):
+            adressen.append((form.auftrag_strasse, "Auftragsadresse", addr))
+
+    if form.bestattungsinstitut_id.data == -1 and form.bi_adresse_id.data == -1:
+        addr = (form.bi_strasse.data, form.bi_hausnummer.data, form.bi_plz.data, form.bi_ort.data)
+        if all(addr):
+            adressen.append((form.bi_strasse, "Institutsadresse", addr))
+
+    if form.has_relatives.data == "some":
+        for sub in form.angehoerige.entries:
+            f = sub.form
+            if f.adresse_choice.data != -1:
+                continue
+            if not any([f.name.data, f.vorname.data, f.verwandtschaftsgrad.data, f.telefonnummer.data, f.email.data]):
+                continue
+            addr = (f.strasse.data, f.hausnummer.data, f.plz.data, f.ort.data)
+            if all(addr):
+                adressen.append((f.strasse, "Angehörigenadresse", addr))
+
+    for sub in form.behoerden.entries:
+        f = sub.form
+        if f.sel_behoerde_id.data != -1 or f.beh_adresse_id.data != -1:
+            continue
+        addr = (f.beh_strasse.data, f.beh_hausnummer.data, f.beh_plz.data, f.beh_ort.data)
+        if all(addr):
+            adressen.append((f.beh_strasse, "Behördenadresse", addr))
+
+    return adressen
+
 @bp.route("/new", methods=["GET", "POST"])
 def new():
     logger.debug(
@@ -166,6 +211,24 @@ def new():
 
 
     if form.validate_on_submit():
+        # 🔍 Adressvalidierung: alle neuen Adressen gleichzeitig, eine Frist für alle
+        neue_adressen = _neue_adressen(form)
+        ergebnisse = check_addresses(
+            [addr for _, _, addr in neue_adressen],
+            deadline=current_app.config["ADDRESS_VALIDATION_DEADLINE"],
+        )
+        adressfehler = False
+        for (field, label, _), (ok, msg) in zip(neue_adressen, ergebnisse):
+            if ok is False:
+                field.errors.append(msg)
+                flash(f"{label}: {msg}", "warning")
+                adressfehler = True
+            elif ok is None:
+                flash(msg or f"Adressdienst aktuell nicht erreichbar, {label} wurde ohne Prüfung übernommen.", "warning")
+        if adressfehler:
+            logging.debug("TB.new: Render 5")
+            return render_template("tb/new.html", form=form)
+
         # --- Meldeadresse bestimmen (wie bisher) ---
         if form.meldeadresse_id.data != -1:
             adr_melde = Adresse.query.get(form.meldeadresse_id.data)
@@ -182,22 +245,6 @@ def new():
                 logging.debug("TB.new: Render 4")
                 return render_template("tb/new.html", form=form, error="Bitte alle Felder der Meldeadresse ausfüllen.")
             
-            # 🔍 Adressvalidierung (Meldeadresse)
-            ok, msg = check_address_exists(
-                form.new_strasse.data,
-                form.new_hausnummer.data,
-                form.new_plz.data,
-                form.new_ort.data,
-            )
-            if ok is False:
-                form.new_strasse.errors.append(msg)
-                logging.debug("TB.new: Render 5")
-                flash(msg, "warning")
-                return render_template("tb/new.html", form=form)
-            elif ok is None:
-                flash(msg or "Adressdienst aktuell nicht erreichbar, Meldeadresse wurde ohne Prüfung übernommen.", "warning")
-
-            
             adr_melde = Adresse.query.filter_by(
                 strasse=form.new_strasse.data,
                 hausnummer=form.new_hausnummer.data,
@@ -221,21 +268,6 @@ def new():
                 logging.debug("TB.new: Render 6")
                 return render_template("tb/new.html", form=form, error="Bitte alle Felder der Auftragsadresse ausfüllen.")
             
-            # 🔍 Adressvalidierung (Auftragsadresse)
-            ok, msg = check_address_exists(
-                form.auftrag_strasse.data,
-                form.auftrag_hausnummer.data,
-                form.auftrag_plz.data,
-                form.auftrag_ort.data,
-            )
-            if ok is False:
-                form.auftrag_strasse.errors.append(msg)
-                logging.debug("TB.new: Render 7")
-                return render_template("tb/new.html", form=form)
-            elif ok is None:
-                flash(msg or "Adressdienst aktuell nicht erreichbar, Auftragsadresse wurde ohne Prüfung übernommen.", "warning")
-
-            
             adr_auftrag = Adresse.query.filter_by(
                 strasse=form.auftrag_strasse.data,
                 hausnummer=form.auftrag_hausnummer.data,
@@ -293,21 +325,6 @@ def new():
                     logging.debug("TB.new: Render 11")
                     return render_template("tb/new.html", form=form, error="Bitte alle Felder der neuen Institutsadresse ausfüllen.")
                 
-                # 🔍 Adressvalidierung (Bestattungsinstitut)
-                ok, msg = check_address_exists(
-                    form.bi_strasse.data,
-                    form.bi_hausnummer.data,
-                    form.bi_plz.data,
-                    form.bi_ort.data,
-                )
-                if ok is False:
-                    form.bi_strasse.errors.append(msg)
-                    logging.debug("TB.new: Render 12")
-                    return render_template("tb/new.html", form=form)
-                elif ok is None:
-                    flash(msg or "Adressdienst aktuell nicht erreichbar, Institutsadresse wurde ohne Prüfung übernommen.", "warning")
-
-                
                 bi_addr = Adresse.query.filter_by(
                     strasse=form.bi_strasse.data,
                     hausnummer=form.bi_hausnummer.data,
@@ -389,21 +406,6 @@ def new():
                         logging.debug("TB.new: Render 14")
                         return render_template("tb/new.html", form=form, error="Bitte alle Felder der Angehörigenadresse ausfüllen.")
                     
-                    # 🔍 Adressvalidierung (Angehörigenadresse)
-                    ok, msg = check_address_exists(
-                        f.strasse.data,
-                        f.hausnummer.data,
-                        f.plz.data,
-                        f.ort.data,
-                    )
-                    if ok is False:
-                        f.strasse.errors.append(msg)
-                        logging.debug("TB.new: Render 15")
-                        return render_template("tb/new.html", form=form)
-                    elif ok is None:
-                        flash(msg or "Adressdienst aktuell nicht erreichbar, Angehörigenadresse wurde ohne Prüfung übernommen.", "warning")
-
-                    
                     ang_addr = Adresse.query.filter_by(
                         strasse=f.strasse.data,
                         hausnummer=f.hausnummer.data,
@@ -461,21 +463,6 @@ def new():
                     logging.debug("TB.new: Render 18")
                     return render_template("tb/new.html", form=form, error="Bitte alle Felder der neuen Behördenadresse ausfüllen.")
                 
-                # 🔍 Adressvalidierung (Behördenadresse)
-                ok, msg = check_address_exists(
-                    f.beh_strasse.data,
-                    f.beh_hausnummer.data,
-                    f.beh_plz.data,
-                    f.beh_ort.data,
-                )
-                if ok is False:
-                    f.beh_strasse.errors.append(msg)
-                    logging.debug("TB.new: Render 19")
-                    return render_template("tb/new.html", form=form)
-                elif ok is None:
-                    flash(msg or "Adressdienst aktuell nicht erreichbar, Behördenadresse wurde ohne Prüfung übernommen.", "warning")
-
-                
                 beh_addr = Adresse.query.filter_by(
                     strasse=f.beh_strasse.data,
                     hausnummer=f.beh_hausnummer.data,
@@ -508,6 +495,8 @@ def new():
                 len(form.angehoerige.entries),
                 len(form.behoerden.entries),
             )
+            # Entfernungen neuer Adressen: Schätzung sofort, Fahrstrecke nach dem Commit im Hintergrund
+            resolve_pending()
             db.session.commit()
             flash("TB gespeichert.", "success")
             logger.info(
@@ -1,7 +1,7 @@
 # lsb_app/forms/address.py
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, IntegerField
-from wtforms.validators import DataRequired, Length
+from wtforms.validators import DataRequired, Length, NumberRange, Optional
 
 def strip_or_none(v):
     return v.strip() if isinstance(v, str) and v.strip() != "" else None
@@ -11,5 +11,6 @@ class AddressForm(FlaskForm):
     hausnummer = StringField("Nr.",        validators=[DataRequired(), Length(max=20)],  filters=[strip_or_none])
     plz        = StringField("PLZ",        validators=[DataRequired(), Length(max=10)],  filters=[strip_or_none])
     ort        = StringField("Ort",        validators=[DataRequired(), Length(max=120)], filters=[strip_or_none])
-    distanz    = IntegerField("Distanz",   validators=[DataRequired()])
+    # leer = aus der Anschrift berechnen (Schätzung sofort, Fahrstrecke im Hintergrund)
+    distanz    = IntegerField("Distanz",   validators=[Optional(), NumberRange(min=0)])
     submit     = SubmitField("Speichern")
@@ -1,6 +1,7 @@
 # lsb_app/models/__init__.py
 from .enums import (GeschlechtEnum, KostenstelleEnum, AuftragsStatusEnum, RechnungsadressModus,
-                    RechnungsArtEnum, RechnungsStatusEnum)
+                    RechnungsArtEnum, RechnungsStatusEnum, OutboxStatusEnum,
+                    BatchJobStatusEnum)
 from .associations import auftrag_behoerde
 from .patient import Patient
 from .adresse import Adresse
@@ -10,11 +11,17 @@ from .auftrag import Auftrag
 from .angehoeriger import Angehoeriger
 from .rechnung import Rechnung
 from .verlauf import Verlauf
+from .outbox import OutboxMessage
+from .batch_job import BatchJob, BatchJobEvent
+from .geocode_cache import GeocodeCache
+from .plz_zentroid import PlzZentroid
 
 __all__ = [
     "GeschlechtEnum", "KostenstelleEnum", "AuftragsStatusEnum",
-    "RechnungsadressModus", "RechnungsArtEnum", "RechnungsStatusEnum",
+    "RechnungsadressModus", "RechnungsArtEnum", "RechnungsStatusEnum", "OutboxStatusEnum",
+    "BatchJobStatusEnum",
     "auftrag_behoerde",
     "Patient", "Adresse", "Bestattungsinstitut", "Behoerde", "Auftrag", "Angehoeriger",
-    "Rechnung", "Verlauf"
+    "Rechnung", "Verlauf", "OutboxMessage", "BatchJob", "BatchJobEvent",
+    "GeocodeCache", "PlzZentroid"
 ]
@@ -10,6 +10,8 @@ class Adresse(IDMixin, TimestampMixin, db.Model):
     plz       = db.Column(db.String(10), nullable=False)
     ort       = db.Column(db.String(120), nullable=False)
     distanz   = db.Column(db.Integer)
+    # True = Offline-Schätzung (PLZ-Mittelpunkt), wird vom Distanz-Backfill ersetzt
+    distanz_geschaetzt = db.Column(db.Boolean, nullable=False, default=False, server_default="false")
 
     # 1:n: eine Adresse hat viele Patienten (Meldeadresse)
     patienten = db.relationship(
@@ -0,0 +1,59 @@
+# lsb_app/models/batch_job.py
+from sqlalchemy import Enum as SAEnum
+from lsb_app.extensions import db
+from lsb_app.models.base import IDMixin, TimestampMixin
+from lsb_app.models.enums import BatchJobStatusEnum
+
+class BatchJob(IDMixin, TimestampMixin, db.Model):
+    """Ein im Hintergrund laufender Batch (E-Mail-Versand, Postversand, Druck)."""
+    __tablename__ = "batch_job"
+
+    kind = db.Column(db.String(40), nullable=False, index=True)
+    status = db.Column(
+        SAEnum(BatchJobStatusEnum, native_enum=False, validate_strings=True),
+        nullable=False,
+        default=BatchJobStatusEnum.QUEUED,
+        server_default=BatchJobStatusEnum.QUEUED.value,
+    )
+
+    total = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    done_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    failed_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text)
+
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    events = db.relationship(
+        "BatchJobEvent",
+        back_populates="job",
+        order_by="BatchJobEvent.seq",
+        cascade="all, delete-orphan",
+    )
+
+class BatchJobEvent(IDMixin, TimestampMixin, db.Model):
+    """Fortschritt eines Eintrags (gerendert, eingereiht, verschickt, fehlgeschlagen ...)."""
+    __tablename__ = "batch_job_event"
+
+    seq = db.Column(db.Integer, nullable=False)
+    stage = db.Column(db.String(20), nullable=False)
+    label = db.Column(db.String(255))
+    message = db.Column(db.Text)
+
+    # 1:n BatchJob
+    job_id = db.Column(
+        db.Integer,
+        db.ForeignKey("batch_job.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    auftrag_id = db.Column(
+        db.Integer,
+        db.ForeignKey("auftrag.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    job = db.relationship("BatchJob", back_populates="events")
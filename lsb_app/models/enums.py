@@ -36,4 +36,17 @@ class RechnungsStatusEnum(str, enum.Enum):
     CREATED = "CREATED"
     SENT = "SENT"
     CANCELED = "CANCELED"
-    PAID = "PAID"
\ No newline at end of file
+    PAID = "PAID"
+
+class OutboxStatusEnum(str, enum.Enum):
+    QUEUED = "QUEUED"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
+class BatchJobStatusEnum(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
@@ -0,0 +1,20 @@
+# lsb_app/models/geocode_cache.py
+from lsb_app.extensions import db
+from lsb_app.models.base import IDMixin, TimestampMixin
+
+class GeocodeCache(IDMixin, TimestampMixin, db.Model):
+    """Nominatim-Ergebnis pro normalisierter Adresse; lat/lon NULL = nicht gefunden."""
+    __tablename__ = "geocode_cache"
+
+    key = db.Column(db.String(400), nullable=False, unique=True)
+
+    # Adressteile wie angefragt (Anzeige, Auswertung nach PLZ)
+    strasse = db.Column(db.String(160))
+    hausnummer = db.Column(db.String(20))
+    plz = db.Column(db.String(10), index=True)
+    ort = db.Column(db.String(120))
+
+    lat = db.Column(db.Float)
+    lon = db.Column(db.Float)
+    response = db.Column(db.JSON)
+    fetched_at = db.Column(db.DateTime(timezone=True), nullable=False)
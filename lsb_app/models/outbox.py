@@ -0,0 +1,36 @@
+# lsb_app/models/outbox.py
+from sqlalchemy import Enum as SAEnum
+from lsb_app.extensions import db
+from lsb_app.models.base import IDMixin, TimestampMixin
+from lsb_app.models.enums import OutboxStatusEnum
+
+class OutboxMessage(IDMixin, TimestampMixin, db.Model):
+    """Eine zu versendende Mail (fertige MIME-Bytes), zugestellt vom outbox-worker."""
+    __tablename__ = "outbox_message"
+
+    batch_id = db.Column(db.String(36), nullable=False, index=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    mime = db.Column(db.LargeBinary, nullable=False)
+    imap_folder = db.Column(db.String(255), nullable=True)
+
+    status = db.Column(
+        SAEnum(OutboxStatusEnum, native_enum=False, validate_strings=True),
+        nullable=False,
+        default=OutboxStatusEnum.QUEUED,
+        server_default=OutboxStatusEnum.QUEUED.value,
+        index=True,
+    )
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    # n:1 Rechnung
+    rechnung_id = db.Column(
+        db.Integer,
+        db.ForeignKey("rechnung.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    rechnung = db.relationship("Rechnung", lazy="selectin")
@@ -0,0 +1,13 @@
+# lsb_app/models/plz_zentroid.py
+from lsb_app.extensions import db
+from lsb_app.models.base import IDMixin, TimestampMixin
+
+class PlzZentroid(IDMixin, TimestampMixin, db.Model):
+    """Mittelpunkt eines PLZ-Gebiets für die Offline-Entfernungsschätzung."""
+    __tablename__ = "plz_zentroid"
+
+    plz = db.Column(db.String(10), nullable=False, unique=True)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    # Herkunft, z. B. "import" (flask distances import-plz)
+    quelle = db.Column(db.String(20), nullable=False)
@@ -1,52 +1,157 @@
 # services/address_validation.py
-import requests
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
 from flask import current_app
 
+from lsb_app.extensions import db
+from lsb_app.services.geocoding import (GeocodingInvalidResponse, GeocodingRateLimited, GeocodingUnavailable,
+                                        address_key, geocode)
+
+# Prüfergebnisse pro normalisierter Adresse, vor dem Geocode-Cache (DB, für
+# alle Prozesse): Tippen im Formular und der Submit von tb.new kosten so
+# weder Nominatim noch die DB. "Dienst nicht erreichbar" wird nicht gemerkt.
+VALIDATION_CACHE_SIZE = 1024
+VALIDATION_CACHE_TTL = 600  # Sekunden
+
+
+class _ValidationCache:
+    """LRU mit Ablaufzeit, thread-sicher."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: tuple) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _ValidationCache(VALIDATION_CACHE_SIZE, VALIDATION_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
+
+# Parallele Prüfungen (check_addresses); Nominatim selbst bleibt durch den
+# Token-Bucket auf 1/s begrenzt, parallel laufen Cache-Zugriffe und Wartezeiten.
+MAX_PARALLEL_CHECKS = 8
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_CHECKS, thread_name_prefix="address-check")
+        return _executor
+
 def _norm(s: str | None) -> str:
     """Einfache Normalisierung für String-Vergleiche."""
     if not s:
         return ""
     return " ".join(s.strip().lower().split())  # trim + Mehrfachspaces weg
 
-def check_address_exists(strasse, hausnummer, plz, ort):
+def check_address_exists(strasse, hausnummer, plz, ort, wait: float | None = None):
     """
-    Prüft eine Adresse über Nominatim.
+    Prüft eine Adresse über Nominatim (bzw. den Geocode-Cache).
+    wait: höchstens so lange auf einen Nominatim-Slot warten (None = bis einer frei ist).
 
     Rückgabe:
       ok = True   -> alles konsistent, msg = None oder Hinweis
       ok = False  -> Adresse *gar nicht gefunden*, msg = Fehlermeldung (harte Validierung)
       ok = None   -> Dienst nicht erreichbar ODER Abweichungen; Soft-Fail mit Warnung
     """
-    url = current_app.config["NOMINATIM_URL"]
-    ua  = current_app.config["NOMINATIM_USER_AGENT"]
-
-    params = {
-        "q": f"{strasse} {hausnummer} {plz} {ort}",
-        "format": "json",
-        "addressdetails": 1,
-        "limit": 1,
-    }
-    headers = {"User-Agent": ua}
+    key = address_key(strasse, hausnummer, plz, ort)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=5)
-        resp.raise_for_status()
-    except Exception:
+        result = geocode(strasse, hausnummer, plz, ort, wait=wait)
+    except GeocodingRateLimited:
+        return None, "Adressdienst ausgelastet, bitte gleich erneut prüfen."
+    except GeocodingInvalidResponse:
+        # JSON-Fehler o. ä. → ebenfalls Soft-Fail
+        return None, "Adressdienst liefert ungültige Antwort, Adresse wurde ohne Prüfung übernommen."
+    except GeocodingUnavailable:
         # Soft-Fail: Dienst nicht erreichbar
         return None, "Adressdienst aktuell nicht erreichbar, Adresse wurde ohne Prüfung übernommen."
 
-    try:
-        results = resp.json()
-    except ValueError:
-        # JSON-Fehler o. ä. → ebenfalls Soft-Fail
-        return None, "Adressdienst liefert ungültige Antwort, Adresse wurde ohne Prüfung übernommen."
+    verdict = _compare(strasse, hausnummer, plz, ort, result)
+    _cache.put(key, verdict)
+    return verdict
 
+def _check_in_app(app, addr, wait):
+    with app.app_context():
+        try:
+            return check_address_exists(*addr, wait=wait)
+        finally:
+            db.session.remove()
+
+def check_addresses(addresses, deadline: float):
+    """
+    Prüft mehrere Adressen (strasse, hausnummer, plz, ort) gleichzeitig.
+    Nach deadline Sekunden gelten noch offene Prüfungen als Soft-Fail; sie
+    laufen im Hintergrund weiter und füllen die Caches für den nächsten Versuch.
+    Rückgabe: Liste (ok, msg) in der Reihenfolge von addresses.
+    """
+    addresses = list(addresses)
+    if not addresses:
+        return []
+
+    app = current_app._get_current_object()
+    end = time.monotonic() + deadline
+    executor = _get_executor()
+    futures = {}
+    for addr in addresses:
+        key = address_key(*addr)
+        if key not in futures:
+            futures[key] = executor.submit(_check_in_app, app, addr, deadline)
+
+    wait_futures(futures.values(), timeout=max(0.0, end - time.monotonic()))
+
+    results = []
+    for addr in addresses:
+        future = futures[address_key(*addr)]
+        if not future.done():
+            results.append((None, "Adressdienst antwortet nicht rechtzeitig, Adresse wurde ohne Prüfung übernommen."))
+        elif future.exception() is not None:
+            logger.error("Adressprüfung fehlgeschlagen für %r", addr, exc_info=future.exception())
+            results.append((None, "Adressprüfung fehlgeschlagen, Adresse wurde ohne Prüfung übernommen."))
+        else:
+            results.append(future.result())
+    return results
+
+def _compare(strasse, hausnummer, plz, ort, result):
     # -> Harter Fehler: nichts gefunden
-    if not results:
+    if result is None:
         return False, "Adresse nicht gefunden."
 
-    data = results[0]
-    addr = data.get("address", {}) or {}
+    addr = result.address
 
     # Werte aus Nominatim
     osm_strasse = addr.get("road") or addr.get("pedestrian") or addr.get("footway")
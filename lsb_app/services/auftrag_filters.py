@@ -1,5 +1,5 @@
 # lsb_app/services/auftrag_filters.py
-from sqlalchemy import and_, or_, not_
+from sqlalchemy import and_, or_, not_, exists
 from datetime import date, timedelta
 from lsb_app.extensions import db  # falls du es irgendwann brauchst
 from lsb_app.models.auftrag import Auftrag
@@ -7,19 +7,31 @@ from lsb_app.models.patient import Patient
 from lsb_app.models.institut import Bestattungsinstitut
 from lsb_app.models.angehoeriger import Angehoeriger
 from lsb_app.models.behoerde import Behoerde
-from lsb_app.models.enums import KostenstelleEnum, AuftragsStatusEnum
+from lsb_app.models.rechnung import Rechnung
+from lsb_app.models.outbox import OutboxMessage
+from lsb_app.models.enums import KostenstelleEnum, AuftragsStatusEnum, OutboxStatusEnum
+
+def in_outbox_filter():
+    """Aufträge mit einer Rechnungs-Mail, die noch in der Outbox auf Zustellung wartet."""
+    return exists().where(
+        Rechnung.auftrag_id == Auftrag.id,
+        OutboxMessage.rechnung_id == Rechnung.id,
+        OutboxMessage.status.in_([OutboxStatusEnum.QUEUED, OutboxStatusEnum.SENDING]),
+    )
 
 def ready_for_email_filter():
     """
     Aufträge, die:
     - Status READY haben und
-    - abhängig von der Kostenstelle eine zustellbare E-Mail-Adresse besitzen.
+    - abhängig von der Kostenstelle eine zustellbare E-Mail-Adresse besitzen und
+    - nicht bereits in der Outbox auf Zustellung warten.
     """
     cutoff_date = date.today() - timedelta(days=3)
 
     return and_(
         Auftrag.status == AuftragsStatusEnum.READY,
         Auftrag.auftragsdatum <= cutoff_date,
+        not_(in_outbox_filter()),
         or_(
             # 1) Kostenstelle = Bestattungsinstitut + E-Mail im Institut
             and_(
@@ -0,0 +1,326 @@
+# lsb_app/services/batch_jobs.py
+"""
+Batch-Läufe im Hintergrund mit Live-Fortschritt (Server-Sent Events).
+
+Der POST legt einen BatchJob an, übergibt die Arbeit an einen
+Hintergrund-Thread und leitet sofort auf die Job-Seite weiter. Der Runner
+meldet pro Auftrag Fortschritt (angelegt, gerendert, eingereiht, ...) über
+JobProgress.emit(); die Job-Seite abonniert /rechnungen/jobs/<id>/events.
+
+- Laufende Jobs halten ihre Events im Speicher (kein Schreibzugriff neben
+  der offenen Arbeits-Transaktion, SQLite-tauglich). Job-Status und alle
+  Events werden beim Abschluss in batch_job/batch_job_event gespeichert;
+  abgeschlossene Jobs werden von dort wiedergegeben.
+- Jobs laufen nacheinander in einem Thread, damit sich zwei Batches nicht
+  dieselben Aufträge greifen.
+- Live-Events gibt es nur aus dem Prozess, der den Job ausführt; bei
+  mehreren Web-Prozessen sieht ein anderer Prozess den Job erst nach
+  Abschluss.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Iterator
+
+from flask import Flask, current_app
+
+from lsb_app.extensions import db
+from lsb_app.models import Auftrag, BatchJob, BatchJobEvent, BatchJobStatusEnum
+
+logger = logging.getLogger(__name__)
+
+STAGE_INFO = "info"
+STAGE_CREATED = "created"
+STAGE_RENDERED = "rendered"
+STAGE_QUEUED = "queued"
+STAGE_SENT = "sent"
+STAGE_FAILED = "failed"
+
+KEEPALIVE_SECONDS = 15
+MAX_FINISHED_IN_MEMORY = 20
+
+Runner = Callable[["JobProgress"], dict]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def auftrag_label(auftrag: Auftrag) -> str:
+    patient = auftrag.patient
+    name = f"{patient.name}, {patient.vorname}" if patient else "—"
+    return f"Auftrag {auftrag.auftragsnummer or auftrag.id} – {name}"
+
+
+class JobProgress:
+    """Fortschritt eines laufenden Jobs; Events für SSE-Abonnenten."""
+
+    def __init__(self, job_id: int, kind: str, total: int):
+        self.job_id = job_id
+        self.kind = kind
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.status = BatchJobStatusEnum.QUEUED
+        self.result: dict = {}
+        self.error: str | None = None
+        self.events: list[dict] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (BatchJobStatusEnum.DONE, BatchJobStatusEnum.FAILED)
+
+    def emit(self, stage: str, auftrag: Auftrag | None = None, message: str = "", final: bool = False,
+             count: int = 1) -> None:
+        """
+        Meldet einen Schritt. final=True: Auftrag ist für diesen Job fertig
+        (zählt als erledigt bzw. bei STAGE_FAILED als fehlgeschlagen).
+        count: so viele Einträge auf einmal (Jobs ohne Auftrag pro Eintrag).
+        """
+        with self._cond:
+            if stage == STAGE_FAILED:
+                self.failed += count
+            elif final:
+                self.done += count
+            self.events.append({
+                "seq": len(self.events) + 1,
+                "stage": stage,
+                "auftrag_id": auftrag.id if auftrag is not None else None,
+                "label": auftrag_label(auftrag) if auftrag is not None else None,
+                "message": message,
+                "done": self.done,
+                "failed": self.failed,
+                "total": self.total,
+            })
+            self._cond.notify_all()
+
+    def fail(self, auftrag: Auftrag | None, message: str) -> None:
+        self.emit(STAGE_FAILED, auftrag, message, final=True)
+
+    def _set_status(self, status: BatchJobStatusEnum, result: dict | None = None, error: str | None = None) -> None:
+        with self._cond:
+            self.status = status
+            if result is not None:
+                self.result = result
+            self.error = error
+            self._cond.notify_all()
+
+    def events_after(self, seq: int, timeout: float) -> tuple[list[dict], bool]:
+        """Events mit seq > seq (wartet bis zu timeout); dazu, ob der Job fertig ist."""
+        with self._cond:
+            if len(self.events) <= seq and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[seq:], self.finished
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[int, JobProgress]" = OrderedDict()
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-job")
+        return _executor
+
+
+def _register(progress: JobProgress) -> None:
+    with _lock:
+        _jobs[progress.job_id] = progress
+        finished = [jid for jid, p in _jobs.items() if p.finished]
+        for jid in finished[:-MAX_FINISHED_IN_MEMORY]:
+            _jobs.pop(jid, None)
+
+
+def get_progress(job_id: int) -> JobProgress | None:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def start_job(kind: str, total: int, params: dict, runner: Runner, base_url: str) -> int:
+    """Legt den BatchJob an (Commit) und startet runner im Hintergrund."""
+    job = BatchJob(kind=kind, status=BatchJobStatusEnum.QUEUED, total=total, params=params)
+    db.session.add(job)
+    db.session.commit()
+
+    progress = JobProgress(job.id, kind, total)
+    _register(progress)
+
+    app = current_app._get_current_object()
+    _get_executor().submit(_run, app, base_url, progress, runner)
+    logger.info("batch_jobs: Job %s (%s, %s Einträge) eingereiht", job.id, kind, total)
+    return job.id
+
+
+def _run(app: Flask, base_url: str, progress: JobProgress, runner: Runner) -> None:
+    # Request-Kontext für render_template/url_for im Runner
+    with app.test_request_context(base_url=base_url):
+        try:
+            job = db.session.get(BatchJob, progress.job_id)
+            job.status = BatchJobStatusEnum.RUNNING
+            job.started_at = _utcnow()
+            db.session.commit()
+            progress._set_status(BatchJobStatusEnum.RUNNING)
+
+            result = runner(progress) or {}
+        except Exception as exc:
+            db.session.rollback()
+            logger.exception("batch_jobs: Job %s (%s) fehlgeschlagen", progress.job_id, progress.kind)
+            _finish(progress, BatchJobStatusEnum.FAILED, {}, str(exc) or exc.__class__.__name__)
+        else:
+            _finish(progress, BatchJobStatusEnum.DONE, result, None)
+        finally:
+            db.session.remove()
+
+
+def _finish(progress: JobProgress, status: BatchJobStatusEnum, result: dict, error: str | None) -> None:
+    """Status und Events speichern, dann erst Abonnenten das Ende melden."""
+    try:
+        job = db.session.get(BatchJob, progress.job_id)
+        job.status = status
+        job.result = result
+        job.error = error
+        job.done_count = progress.done
+        job.failed_count = progress.failed
+        job.finished_at = _utcnow()
+        db.session.add_all(
+            BatchJobEvent(
+                job_id=job.id,
+                seq=ev["seq"],
+                stage=ev["stage"],
+                auftrag_id=ev["auftrag_id"],
+                label=ev["label"],
+                message=ev["message"],
+            )
+            for ev in list(progress.events)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("batch_jobs: Job %s konnte nicht gespeichert werden", progress.job_id)
+
+    progress._set_status(status, result, error)
+    logger.info("batch_jobs: Job %s %s – %s ok, %s Fehler", progress.job_id, status.value,
+                progress.done, progress.failed)
+
+
+def wait_for_job(job_id: int, timeout: float | None = None) -> dict | None:
+    """Blockiert, bis der Job fertig ist (Benchmarks, CLI); gibt die Zusammenfassung zurück."""
+    progress = get_progress(job_id)
+    if progress is None:
+        snapshot = job_snapshot(job_id)
+        return snapshot[0] if snapshot else None
+    with progress._cond:
+        progress._cond.wait_for(lambda: progress.finished, timeout)
+        return progress.summary()
+
+
+# --- Wiedergabe ---
+
+def job_snapshot(job_id: int) -> tuple[dict, list[dict]] | None:
+    """(Zusammenfassung, bisherige Events) aus dem Speicher oder der DB."""
+    progress = get_progress(job_id)
+    if progress is not None:
+        with progress._cond:
+            return progress.summary(), list(progress.events)
+
+    job = db.session.get(BatchJob, job_id)
+    if job is None:
+        return None
+    return _summary_from_db(job), [_event_from_db(ev, job) for ev in job.events]
+
+
+def _summary_from_db(job: BatchJob) -> dict:
+    status, error = job.status, job.error
+    if status in (BatchJobStatusEnum.QUEUED, BatchJobStatusEnum.RUNNING):
+        # nicht (mehr) im Speicher: Prozess wurde während des Laufs beendet
+        status, error = BatchJobStatusEnum.FAILED, error or "Job wurde abgebrochen (Neustart des Servers?)"
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": status.value,
+        "total": job.total,
+        "done": job.done_count,
+        "failed": job.failed_count,
+        "result": job.result or {},
+        "error": error,
+    }
+
+
+def _event_from_db(ev: BatchJobEvent, job: BatchJob) -> dict:
+    return {
+        "seq": ev.seq,
+        "stage": ev.stage,
+        "auftrag_id": ev.auftrag_id,
+        "label": ev.label,
+        "message": ev.message or "",
+        "total": job.total,
+    }
+
+
+def _sse(data: Any, event: str, event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def event_stream(
+    job_id: int,
+    last_seq: int = 0,
+    follow: Callable[[dict], Iterable[dict | None]] | None = None,
+) -> Iterator[str]:
+    """
+    SSE-Stream eines Jobs: "progress"-Events ab last_seq, am Ende "done".
+    follow(result) kann nach erfolgreichem Abschluss weitere Events liefern
+    (z. B. die Zustellung der eingereihten Mails), None = Lebenszeichen.
+    """
+    progress = get_progress(job_id)
+    if progress is not None:
+        while True:
+            events, finished = progress.events_after(last_seq, timeout=KEEPALIVE_SECONDS)
+            for ev in events:
+                last_seq = ev["seq"]
+                yield _sse(ev, "progress", ev["seq"])
+            if finished and len(progress.events) <= last_seq:
+                break
+            if not events:
+                yield ": keepalive\n\n"
+        summary = progress.summary()
+    else:
+        snapshot = job_snapshot(job_id)
+        if snapshot is None:
+            return
+        summary, events = snapshot
+        for ev in events:
+            if ev["seq"] > last_seq:
+                yield _sse(ev, "progress", ev["seq"])
+
+    if follow is not None and summary["status"] == BatchJobStatusEnum.DONE.value:
+        for ev in follow(summary["result"]):
+            # None = nichts Neues, nur Lebenszeichen für Proxy/Browser
+            yield _sse(ev, "progress") if ev is not None else ": keepalive\n\n"
+
+    yield _sse(summary, "done")
@@ -0,0 +1,446 @@
+# lsb_app/services/dashboard.py
+"""
+Zähler der Startseite (home.index).
+
+Abfrage: ein SELECT über alle Aufträge mit je einem COUNT(*) FILTER
+(WHERE …) pro Kachel (PostgreSQL und SQLite ab 3.30 verstehen FILTER). Die
+jeweils neueste Rechnung eines Auftrags kommt aus einer gemeinsamen CTE
+(max(version) pro Auftrag) und wird einmal per LEFT JOIN angehängt. Die
+Bedingungen sind dieselben wie in auftrag_filters.py, damit Kacheln und
+Listen/Batch-Aktionen übereinstimmen.
+
+Zähler-Cache (DASHBOARD_COUNTER_CACHE=1): pro Prozess wird gemerkt, in
+welchen Kacheln jeder offene Auftrag steckt; die Startseite liest nur noch
+die Summen.
+- after_flush merkt sich, welche Aufträge sich geändert haben können
+  (Auftrag, Rechnung, Outbox-Mail, Patient, Angehöriger, Behörde,
+  Bestattungsinstitut) – nach dem Commit landen sie in der Warteliste,
+  ohne SQL im Commit-Pfad.
+- Der nächste Lesezugriff fragt nur diese Aufträge neu ab (ein Statement)
+  und korrigiert die Summen um die Differenz.
+- Die datumsabhängigen Kacheln (3-Tage-Frist, 30 Tage überfällig,
+  WAIT-Frist) hängen am Tag: beim ersten Zugriff eines neuen Tages wird
+  komplett neu gezählt. "Überfällig" gilt deshalb ab Tagesbeginn.
+- Bulk-UPDATE/DELETE über die Session und Änderungen anderer Prozesse
+  (z. B. Outbox-Worker) sieht der Cache nicht einzeln: Bulk-Statements
+  lösen einen kompletten Neuaufbau aus, und spätestens nach
+  DASHBOARD_RECONCILE_SECONDS gleicht ein Hintergrund-Lauf den Cache mit
+  der DB ab (Abweichungen werden geloggt).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time as _time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.orm import Session
+
+from lsb_app.extensions import db
+from lsb_app.models import (Angehoeriger, Auftrag, AuftragsStatusEnum, Behoerde, Bestattungsinstitut,
+                            OutboxMessage, Patient, Rechnung, RechnungsStatusEnum, auftrag_behoerde)
+from lsb_app.services.auftrag_filters import (ready_for_email_filter, ready_for_inquiry_filter,
+                                              ready_for_post_filter)
+
+logger = logging.getLogger(__name__)
+
+# versendete Rechnungen gelten nach so vielen Tagen ohne Zahlung als überfällig
+OVERDUE_DAYS = 30
+DEFAULT_RECONCILE_SECONDS = 300
+# mehr geänderte Objekte auf der Warteliste -> komplett neu zählen statt langer IN-Listen
+MAX_INCREMENTAL = 1000
+
+_SESSION_KEY = "dashboard_pending"
+_EXTENSION_KEY = "dashboard_counters"
+
+
+@dataclass(frozen=True)
+class DashboardCounts:
+    ready_email_count: int = 0
+    ready_post_count: int = 0
+    print_count: int = 0
+    todo_count: int = 0
+    inquiry_count: int = 0
+    wait_overdue_count: int = 0
+    overdue_count: int = 0
+    sent_count: int = 0
+
+
+BUCKETS = tuple(f.name for f in fields(DashboardCounts))
+
+
+def latest_rechnung_cte(auftrag_filter=None):
+    """Neueste Rechnung (höchste Version) je Auftrag: auftrag_id, status, gesendet_datum."""
+    # max(version) + Join ist auf SQLite deutlich schneller als row_number() OVER (...)
+    max_version = select(Rechnung.auftrag_id, func.max(Rechnung.version).label("max_version"))
+    if auftrag_filter is not None:
+        max_version = max_version.where(Rechnung.auftrag_id.in_(select(Auftrag.id).where(auftrag_filter)))
+    max_version = max_version.group_by(Rechnung.auftrag_id).subquery("max_version")
+    return (
+        select(Rechnung.auftrag_id, Rechnung.status, Rechnung.gesendet_datum)
+        .join(max_version, and_(
+            max_version.c.auftrag_id == Rechnung.auftrag_id,
+            max_version.c.max_version == Rechnung.version,
+        ))
+        .cte("latest_rechnung")
+    )
+
+
+def bucket_conditions(latest, today: date, cutoff: datetime) -> dict:
+    """Kachel -> Bedingung pro Auftrag (latest = latest_rechnung_cte())."""
+    return {
+        "ready_email_count": ready_for_email_filter(),
+        "ready_post_count": ready_for_post_filter(),
+        "print_count": Auftrag.status == AuftragsStatusEnum.PRINT,
+        "todo_count": Auftrag.status == AuftragsStatusEnum.TODO,
+        "inquiry_count": ready_for_inquiry_filter(),
+        "wait_overdue_count": and_(
+            Auftrag.status == AuftragsStatusEnum.WAIT,
+            Auftrag.wait_due_date.isnot(None),
+            Auftrag.wait_due_date < today,
+        ),
+        "overdue_count": and_(
+            Auftrag.status == AuftragsStatusEnum.SENT,
+            latest.c.gesendet_datum.isnot(None),
+            latest.c.gesendet_datum <= cutoff,
+        ),
+        "sent_count": and_(
+            Auftrag.status != AuftragsStatusEnum.DONE,
+            latest.c.status == RechnungsStatusEnum.SENT,
+        ),
+    }
+
+
+def dashboard_counts_query(today: date | None = None, now: datetime | None = None):
+    """Das SELECT hinter count_dashboard() (z. B. für EXPLAIN)."""
+    today = today or date.today()
+    cutoff = (now or datetime.now()) - timedelta(days=OVERDUE_DAYS)
+    latest = latest_rechnung_cte()
+    conditions = bucket_conditions(latest, today, cutoff)
+    return (
+        select(*(func.count().filter(cond).label(name) for name, cond in conditions.items()))
+        .select_from(Auftrag)
+        .outerjoin(latest, latest.c.auftrag_id == Auftrag.id)
+        # keine Kachel zählt erledigte Aufträge – und die sind der Großteil der Tabelle
+        .where(Auftrag.status != AuftragsStatusEnum.DONE)
+    )
+
+
+def count_dashboard(today: date | None = None, now: datetime | None = None) -> DashboardCounts:
+    """Alle Zähler der Startseite mit einem Statement."""
+    row = db.session.execute(dashboard_counts_query(today, now)).one()
+    return DashboardCounts(**{key: int(value or 0) for key, value in row._mapping.items()})
+
+
+def membership_query(today: date, cutoff: datetime, auftrag_filter=None):
+    """
+    (auftrag_id, 0/1 je Kachel). Ohne Filter alle offenen Aufträge; mit
+    Filter genau die passenden – auch erledigte, damit sie aus dem Cache fallen.
+    """
+    latest = latest_rechnung_cte(auftrag_filter)
+    conditions = bucket_conditions(latest, today, cutoff)
+    query = (
+        select(Auftrag.id, *(case((cond, 1), else_=0).label(name) for name, cond in conditions.items()))
+        .select_from(Auftrag)
+        .outerjoin(latest, latest.c.auftrag_id == Auftrag.id)
+    )
+    if auftrag_filter is None:
+        return query.where(Auftrag.status != AuftragsStatusEnum.DONE)
+    return query.where(auftrag_filter)
+
+
+# --- Zähler-Cache ---
+
+@dataclass
+class Pending:
+    """Seit dem letzten Lesen geänderte Objekte, aus denen sich die betroffenen Aufträge ergeben."""
+    auftrag_ids: set[int]
+    patient_ids: set[int]
+    rechnung_ids: set[int]
+    behoerde_ids: set[int]
+    institut_ids: set[int]
+    full: bool = False
+
+    @classmethod
+    def empty(cls) -> "Pending":
+        return cls(set(), set(), set(), set(), set())
+
+    def __bool__(self) -> bool:
+        return self.full or len(self) > 0
+
+    def __len__(self) -> int:
+        return (len(self.auftrag_ids) + len(self.patient_ids) + len(self.rechnung_ids)
+                + len(self.behoerde_ids) + len(self.institut_ids))
+
+    def update(self, other: "Pending") -> None:
+        self.auftrag_ids |= other.auftrag_ids
+        self.patient_ids |= other.patient_ids
+        self.rechnung_ids |= other.rechnung_ids
+        self.behoerde_ids |= other.behoerde_ids
+        self.institut_ids |= other.institut_ids
+        self.full = self.full or other.full
+
+    def auftrag_filter(self):
+        conds = []
+        if self.auftrag_ids:
+            conds.append(Auftrag.id.in_(self.auftrag_ids))
+        if self.patient_ids:
+            conds.append(Auftrag.patient_id.in_(self.patient_ids))
+        if self.institut_ids:
+            conds.append(Auftrag.bestattungsinstitut_id.in_(self.institut_ids))
+        if self.rechnung_ids:
+            conds.append(Auftrag.id.in_(select(Rechnung.auftrag_id).where(Rechnung.id.in_(self.rechnung_ids))))
+        if self.behoerde_ids:
+            conds.append(Auftrag.id.in_(
+                select(auftrag_behoerde.c.auftrag_id).where(auftrag_behoerde.c.behoerde_id.in_(self.behoerde_ids))
+            ))
+        return or_(*conds)
+
+
+def _day_cutoff(day: date) -> datetime:
+    # ein Stichtag pro Tag, damit sich die Kachel nur beim Tageswechsel verschiebt
+    return datetime.combine(day, time.min) - timedelta(days=OVERDUE_DAYS)
+
+
+class DashboardCounters:
+    """Kachel-Zugehörigkeit aller offenen Aufträge und die Summen daraus (ein Objekt pro App)."""
+
+    def __init__(self, reconcile_seconds: float = DEFAULT_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self._lock = threading.Lock()           # Zustand
+        self._refresh_lock = threading.Lock()   # höchstens eine Abfrage gleichzeitig
+        self._day: date | None = None
+        self._members: dict[int, frozenset[str]] = {}
+        self._totals: Counter = Counter()
+        self._pending = Pending.empty()
+        self._built_at = 0.0
+
+    # --- Schreiben (aus den Session-Events) ---
+
+    def mark(self, pending: Pending) -> None:
+        with self._lock:
+            self._pending.update(pending)
+
+    # --- Lesen ---
+
+    def counts(self) -> DashboardCounts:
+        """Aktuelle Summen; neu zählen nur, wenn nötig (Tageswechsel, Warteliste)."""
+        with self._lock:
+            fresh = self._day == date.today() and not self._pending
+            if fresh:
+                return self._snapshot()
+        self.refresh()
+        with self._lock:
+            return self._snapshot()
+
+    def stale(self) -> bool:
+        return _time.monotonic() - self._built_at > self.reconcile_seconds
+
+    def _snapshot(self) -> DashboardCounts:
+        return DashboardCounts(**{name: self._totals[name] for name in BUCKETS})
+
+    # --- Abfragen ---
+
+    def refresh(self) -> None:
+        """Warteliste abarbeiten; beim Tageswechsel/ersten Zugriff komplett neu zählen."""
+        with self._refresh_lock:
+            today = date.today()
+            with self._lock:
+                pending, self._pending = self._pending, Pending.empty()
+                full = pending.full or self._day != today or len(pending) > MAX_INCREMENTAL
+            if full:
+                self._rebuild(today)
+                return
+            if not pending:
+                return
+            rows = db.session.execute(membership_query(today, _day_cutoff(today), pending.auftrag_filter())).all()
+            with self._lock:
+                seen = set()
+                for row in rows:
+                    seen.add(row.id)
+                    self._set(row.id, _buckets(row))
+                for aid in pending.auftrag_ids - seen:
+                    # gelöscht
+                    self._set(aid, frozenset())
+
+    def rebuild(self) -> dict[str, int]:
+        """Komplett neu zählen; Abweichung gegenüber dem bisherigen Stand je Kachel."""
+        with self._refresh_lock:
+            with self._lock:
+                self._pending = Pending.empty()
+            return self._rebuild(date.today())
+
+    def _rebuild(self, today: date) -> dict[str, int]:
+        rows = db.session.execute(membership_query(today, _day_cutoff(today))).all()
+        members = {row.id: buckets for row in rows if (buckets := _buckets(row))}
+        totals = Counter(name for buckets in members.values() for name in buckets)
+        with self._lock:
+            drift = {
+                name: totals[name] - self._totals[name]
+                for name in BUCKETS if self._day == today and totals[name] != self._totals[name]
+            }
+            self._members, self._totals, self._day = members, totals, today
+            self._built_at = _time.monotonic()
+        return drift
+
+    def _set(self, auftrag_id: int, buckets: frozenset[str]) -> None:
+        old = self._members.get(auftrag_id, frozenset())
+        if old == buckets:
+            return
+        self._totals.subtract(old - buckets)
+        self._totals.update(buckets - old)
+        if buckets:
+            self._members[auftrag_id] = buckets
+        else:
+            self._members.pop(auftrag_id, None)
+
+
+def _buckets(row) -> frozenset[str]:
+    mapping = row._mapping
+    return frozenset(name for name in BUCKETS if mapping[name])
+
+
+def get_counters() -> DashboardCounters | None:
+    return current_app.extensions.get(_EXTENSION_KEY)
+
+
+def dashboard_counts() -> DashboardCounts:
+    """Zähler für die Startseite: aus dem Cache, sonst direkt aus der DB."""
+    counters = get_counters()
+    if counters is None:
+        return count_dashboard()
+    counts = counters.counts()
+    if counters.stale():
+        schedule_reconcile()
+    return counts
+
+
+def reconcile() -> dict[str, int]:
+    """Cache gegen die DB abgleichen; gibt die Abweichung je Kachel zurück (leer = stimmte)."""
+    counters = get_counters()
+    if counters is None:
+        return {}
+    drift = counters.rebuild()
+    if drift:
+        logger.warning("Dashboard-Zähler korrigiert: %s", drift)
+    return drift
+
+
+# --- Abgleich im Hintergrund ---
+
+_lock = threading.Lock()
+_scheduled = False
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dashboard-reconcile")
+        return _executor
+
+
+def schedule_reconcile() -> None:
+    """Abgleich im Hintergrund anstoßen; ist schon einer eingereiht, passiert nichts."""
+    global _scheduled
+    if not has_app_context():
+        return
+    with _lock:
+        if _scheduled:
+            return
+        _scheduled = True
+    app = current_app._get_current_object()
+    _get_executor().submit(_run_reconcile, app)
+
+
+def _run_reconcile(app) -> None:
+    global _scheduled
+    with app.app_context():
+        try:
+            reconcile()
+        except Exception:
+            logger.exception("Dashboard-Zähler: Abgleich fehlgeschlagen")
+        finally:
+            with _lock:
+                _scheduled = False
+            db.session.remove()
+
+
+# --- Session-Events ---
+
+def _collect(objs) -> Pending:
+    pending = Pending.empty()
+    for obj in objs:
+        if isinstance(obj, Auftrag):
+            if obj.id is not None:
+                pending.auftrag_ids.add(obj.id)
+        elif isinstance(obj, Rechnung):
+            if obj.auftrag_id is not None:
+                pending.auftrag_ids.add(obj.auftrag_id)
+        elif isinstance(obj, OutboxMessage):
+            if obj.rechnung_id is not None:
+                pending.rechnung_ids.add(obj.rechnung_id)
+        elif isinstance(obj, Patient):
+            pending.patient_ids.add(obj.id)
+        elif isinstance(obj, Angehoeriger):
+            pending.patient_ids.add(obj.patient_id)
+        elif isinstance(obj, Behoerde):
+            pending.behoerde_ids.add(obj.id)
+        elif isinstance(obj, Bestattungsinstitut):
+            pending.institut_ids.add(obj.id)
+    return pending
+
+
+_TRACKED = (Auftrag, Rechnung, OutboxMessage, Patient, Angehoeriger, Behoerde, Bestattungsinstitut)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = _collect((*session.new, *session.dirty, *session.deleted))
+    if pending:
+        session.info.setdefault(_SESSION_KEY, Pending.empty()).update(pending)
+
+
+def _do_orm_execute(state) -> None:
+    # Bulk-UPDATE/DELETE an den Objekten vorbei: lieber komplett neu zählen
+    if not (state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, _TRACKED):
+        state.session.info.setdefault(_SESSION_KEY, Pending.empty()).full = True
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_SESSION_KEY, None)
+    if not pending or not has_app_context():
+        return
+    counters = get_counters()
+    if counters is not None:
+        counters.mark(pending)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+_listening = False
+
+
+def init_app(app) -> None:
+    global _listening
+    if not app.config.get("DASHBOARD_COUNTER_CACHE"):
+        return
+    if not _listening:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _listening = True
+    app.extensions[_EXTENSION_KEY] = DashboardCounters(
+        reconcile_seconds=float(app.config.get("DASHBOARD_RECONCILE_SECONDS", DEFAULT_RECONCILE_SECONDS))
+    )
@@ -0,0 +1,237 @@
+# lsb_app/services/distance_estimate.py
+"""
+Offline-Schätzung der Entfernung, wenn ORS/Nominatim nicht verfügbar sind.
+
+Luftlinie (geodätisch) von der Startadresse zum Mittelpunkt des PLZ-Gebiets
+mal Umwegfaktor. Der Umwegfaktor wird gegen die bereits berechneten
+Entfernungen (Adresse.distanz, nicht geschätzt) kalibriert: Median von
+Fahrstrecke / Luftlinie, solange genug Stichproben da sind.
+
+PLZ-Mittelpunkte, spätere Quellen überschreiben frühere:
+- Grundbestand lsb_app/data/plz_centroids.csv (mitgeliefert, siehe
+  lsb_app/data/README; Einträge dürfen PLZ-Präfixe sein),
+- Mittelwert aller Treffer im Geocode-Cache je PLZ,
+- Tabelle plz_zentroid, befüllt mit `flask distances import-plz DATEI`.
+Fehlt eine PLZ, zählt der Mittelwert der bekannten PLZ mit denselben drei
+ersten Ziffern, sonst der Eintrag des Präfixes (Leitregion).
+
+Die Startkoordinaten kommen aus STARTKOORDINATEN oder dem Geocode-Cache der
+Startadresse – nie aus dem Netz, die Schätzung ist für Nominatim-Ausfälle da.
+
+Der Schätzer wird einmal pro Prozess geladen (app.extensions) und danach
+nur noch im Speicher gefragt – kein Netz, keine DB. Geschätzte Werte
+werden als Adresse.distanz_geschaetzt markiert und vom Distanz-Backfill
+(siehe distances.py) später durch die Fahrstrecke ersetzt.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from flask import current_app
+from geopy.distance import geodesic
+from sqlalchemy import func, select
+
+from lsb_app.extensions import db
+from lsb_app.models import Adresse, GeocodeCache, PlzZentroid
+from lsb_app.services.entfernungsrechner import get_routing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROAD_FACTOR = 1.3
+ROAD_FACTOR_MIN = 1.0
+ROAD_FACTOR_MAX = 2.5
+MIN_SAMPLES = 10
+# Ziele näher als das streuen zu stark (PLZ-Mittelpunkt vs. Hausnummer)
+MIN_SAMPLE_KM = 2.0
+# nach einem Fehlschlag (Startadresse nicht ermittelbar) so lange nicht neu laden
+RETRY_SECONDS = 60
+
+_EXTENSION_KEY = "distance_estimator"
+
+BUNDLED_CENTROIDS = Path(__file__).resolve().parent.parent / "data" / "plz_centroids.csv"
+# Präfixlängen für PLZ ohne eigenen Eintrag, genaueste zuerst
+PREFIX_LENGTHS = (3, 2)
+
+
+@dataclass(frozen=True)
+class DistanceEstimator:
+    start: tuple[float, float]              # (lat, lon)
+    centroids: dict[str, tuple[float, float]]  # PLZ oder PLZ-Präfix -> (lat, lon)
+    road_factor: float
+    samples: int
+    # PLZ -> geschätzte km; geodesic kostet ~0,1 ms, ein Dict-Zugriff nicht
+    _cache: dict[str, int | None] = field(default_factory=dict, compare=False, repr=False)
+
+    def centroid(self, plz: str | None) -> tuple[float, float] | None:
+        key = (plz or "").strip()
+        for candidate in (key, *(key[:n] for n in PREFIX_LENGTHS if len(key) > n)):
+            centroid = self.centroids.get(candidate)
+            if centroid is not None:
+                return centroid
+        return None
+
+    def luftlinie_km(self, plz: str | None) -> float | None:
+        centroid = self.centroid(plz)
+        if centroid is None:
+            return None
+        return geodesic(self.start, centroid).km
+
+    def estimate_km(self, plz: str | None) -> int | None:
+        """Geschätzte Fahrstrecke in km; None, wenn die PLZ unbekannt ist."""
+        key = (plz or "").strip()
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        km = self.luftlinie_km(key)
+        estimate = max(1, round(km * self.road_factor)) if km is not None else None
+        self._cache[key] = estimate
+        return estimate
+
+
+def read_centroid_csv(path: Path) -> dict[str, tuple[float, float]]:
+    """CSV mit Spalten plz, lat, lon (Trennzeichen , ; oder Tab) -> {plz: (lat, lon)}."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        dialect = csv.Sniffer().sniff(fh.read(4096), delimiters=",;\t")
+        fh.seek(0)
+        rows: dict[str, tuple[float, float]] = {}
+        for row in csv.DictReader(fh, dialect=dialect):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            if not row.get("plz"):
+                continue
+            try:
+                rows[row["plz"]] = (float(row["lat"]), float(row["lon"]))
+            except (KeyError, ValueError):
+                logger.warning("PLZ-Datei %s: Zeile übersprungen: %r", path.name, row)
+    return rows
+
+
+def load_centroids() -> dict[str, tuple[float, float]]:
+    """
+    PLZ -> (lat, lon): Grundbestand, darüber Geocode-Cache, darüber
+    plz_zentroid; dazu Mittelwerte je 3-stelligem Präfix aus den bekannten PLZ.
+    """
+    centroids = read_centroid_csv(BUNDLED_CENTROIDS)
+    cached = db.session.execute(
+        select(GeocodeCache.plz, func.avg(GeocodeCache.lat), func.avg(GeocodeCache.lon))
+        .where(GeocodeCache.plz.is_not(None), GeocodeCache.lat.is_not(None))
+        .group_by(GeocodeCache.plz)
+    )
+    centroids.update((plz.strip(), (float(lat), float(lon))) for plz, lat, lon in cached)
+    centroids.update(
+        (plz, (lat, lon))
+        for plz, lat, lon in db.session.execute(select(PlzZentroid.plz, PlzZentroid.lat, PlzZentroid.lon))
+    )
+
+    regions: dict[str, list[tuple[float, float]]] = {}
+    for plz, coords in centroids.items():
+        if len(plz) == 5:
+            regions.setdefault(plz[:3], []).append(coords)
+    for prefix, points in regions.items():
+        centroids.setdefault(prefix, (
+            statistics.fmean(lat for lat, _ in points),
+            statistics.fmean(lon for _, lon in points),
+        ))
+    return centroids
+
+
+def fit_road_factor(start: tuple[float, float], centroids: dict[str, tuple[float, float]]) -> tuple[float, int]:
+    """(Umwegfaktor, Anzahl Stichproben) aus den berechneten Entfernungen."""
+    rows = db.session.execute(
+        select(Adresse.plz, Adresse.distanz)
+        .where(Adresse.distanz.is_not(None), Adresse.distanz_geschaetzt.is_(False))
+    )
+    ratios = []
+    for plz, distanz in rows:
+        centroid = centroids.get((plz or "").strip())
+        if centroid is None:
+            continue
+        luftlinie = geodesic(start, centroid).km
+        if luftlinie >= MIN_SAMPLE_KM:
+            ratios.append(distanz / luftlinie)
+
+    if len(ratios) < MIN_SAMPLES:
+        return DEFAULT_ROAD_FACTOR, len(ratios)
+    factor = min(max(statistics.median(ratios), ROAD_FACTOR_MIN), ROAD_FACTOR_MAX)
+    return factor, len(ratios)
+
+
+def build_estimator() -> DistanceEstimator:
+    """Lädt PLZ-Mittelpunkte und kalibriert; Exception, wenn die Startkoordinaten unbekannt sind."""
+    coords = get_routing().known_start_coords()
+    if coords is None:
+        raise Exception("Startkoordinaten unbekannt (STARTKOORDINATEN setzen oder Startadresse einmal geokodieren)")
+    lon, lat = coords
+    start = (lat, lon)
+    centroids = load_centroids()
+    factor, samples = fit_road_factor(start, centroids)
+    logger.info("Entfernungsschätzung: %s PLZ-Mittelpunkte, Umwegfaktor %.3f (%s Stichproben)",
+                len(centroids), factor, samples)
+    return DistanceEstimator(start=start, centroids=centroids, road_factor=factor, samples=samples)
+
+
+_lock = threading.Lock()
+
+
+def get_estimator() -> DistanceEstimator | None:
+    """Schätzer dieses Prozesses (einmal geladen); None, wenn nicht ladbar."""
+    ext = current_app.extensions
+    estimator = ext.get(_EXTENSION_KEY)
+    if isinstance(estimator, DistanceEstimator):
+        return estimator
+
+    with _lock:
+        estimator = ext.get(_EXTENSION_KEY)
+        if isinstance(estimator, DistanceEstimator):
+            return estimator
+        # float = Zeitpunkt des letzten Fehlschlags
+        if isinstance(estimator, float) and time.monotonic() - estimator < RETRY_SECONDS:
+            return None
+        try:
+            estimator = build_estimator()
+        except Exception:
+            logger.exception("Entfernungsschätzung nicht verfügbar")
+            ext[_EXTENSION_KEY] = time.monotonic()
+            return None
+        ext[_EXTENSION_KEY] = estimator
+        return estimator
+
+
+def reload_estimator() -> None:
+    """Beim nächsten Zugriff neu laden (nach Import oder Backfill)."""
+    current_app.extensions.pop(_EXTENSION_KEY, None)
+
+
+def estimate_km(plz: str | None) -> int | None:
+    estimator = get_estimator()
+    return estimator.estimate_km(plz) if estimator is not None else None
+
+
+# --- Import ---
+
+def import_centroids(path: Path) -> tuple[int, int]:
+    """
+    CSV (Spalten plz, lat, lon; Trennzeichen , oder ;) nach plz_zentroid,
+    als Vorrang vor Grundbestand und Geocode-Cache. Vorhandene PLZ werden
+    überschrieben. Gibt (neu, aktualisiert) zurück.
+    """
+    rows = read_centroid_csv(path)
+    existing = {z.plz: z for z in db.session.execute(select(PlzZentroid)).scalars()}
+    created = updated = 0
+    for plz, (lat, lon) in rows.items():
+        zentroid = existing.get(plz)
+        if zentroid is None:
+            db.session.add(PlzZentroid(plz=plz, lat=lat, lon=lon, quelle="import"))
+            created += 1
+        else:
+            zentroid.lat, zentroid.lon, zentroid.quelle = lat, lon, "import"
+            updated += 1
+    db.session.commit()
+    reload_estimator()
+    return created, updated
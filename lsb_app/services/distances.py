@@ -0,0 +1,338 @@
+# lsb_app/services/distances.py
+"""
+Nachberechnen fehlender Entfernungen (Adresse.distanz).
+
+Alle Adressen mit distanz IS NULL werden geokodiert (Geocode-Cache, sonst
+Nominatim) und in Chunks über die openrouteservice-Matrix berechnet: ein
+Aufruf pro Chunk, Startadresse → bis zu chunk_size Ziele. Gleiche
+Anschriften werden nur einmal abgefragt. Geschrieben wird am Ende mit
+einem einzigen UPDATE (executemany), nur für Adressen, die dann immer noch
+keine Entfernung haben.
+
+Die Rechnungserstellung ruft ORS nicht mehr selbst auf und schätzt auch
+nicht: build_rechnung_vm liest nur Adresse.distanz. Aufgelöst wird die
+Entfernung beim Anlegen/Bearbeiten der Adresse (tb.new, addresses.edit):
+- resolve_pending() vor dem Commit trägt sofort die Offline-Schätzung ein,
+- der Backfill ersetzt sie danach im Hintergrund durch die Fahrstrecke.
+
+Der Backfill läuft:
+- automatisch im Hintergrund nach jedem Commit, der eine Adresse ohne oder
+  mit geschätzter Entfernung anlegt oder ändert (DISTANCE_BACKFILL=1),
+- als Batch-Job (POST /addresses/distances/backfill),
+- von der Kommandozeile: `flask distances backfill`.
+
+Adressen, die nicht geokodiert oder nicht geroutet werden können, bekommen
+die Offline-Schätzung (distance_estimate.py, distanz_geschaetzt=True) oder
+bleiben NULL. Beides wird beim nächsten Lauf erneut versucht (Nominatim
+dank Negativ-Cache nicht jedes Mal).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, event, or_, select, update
+from sqlalchemy.orm import Session
+
+from lsb_app.extensions import db
+from lsb_app.models import Adresse, Auftrag
+from lsb_app.services import rechnung_drafts
+from lsb_app.services.distance_estimate import get_estimator, reload_estimator
+from lsb_app.services.entfernungsrechner import get_routing
+from lsb_app.services.geocoding import GeocodingUnavailable, address_key, fresh_keys, geocode
+
+logger = logging.getLogger(__name__)
+
+# ORS-Matrix (öffentliche API): höchstens 3500 Elemente pro Aufruf
+DEFAULT_CHUNK_SIZE = 50
+
+_SESSION_KEY = "distances_pending"
+
+
+@dataclass
+class BackfillStats:
+    total: int = 0        # Adressen ohne (oder mit geschätzter) Entfernung
+    unique: int = 0       # davon verschiedene Anschriften
+    updated: int = 0      # Adressen mit neuer Entfernung (inkl. Schätzungen)
+    estimated: int = 0    # davon nur geschätzt
+    not_found: int = 0    # Anschriften ohne Koordinaten
+    no_route: int = 0     # Anschriften ohne Route
+    errors: int = 0       # Anschriften mit Nominatim-/ORS-Fehler
+    matrix_calls: int = 0
+
+
+def pending_addresses(limit: int | None = None) -> list[tuple]:
+    """(id, strasse, hausnummer, plz, ort) aller Adressen ohne oder mit geschätzter Entfernung."""
+    query = (
+        select(Adresse.id, Adresse.strasse, Adresse.hausnummer, Adresse.plz, Adresse.ort)
+        .where(or_(Adresse.distanz.is_(None), Adresse.distanz_geschaetzt.is_(True)))
+        .order_by(Adresse.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return [tuple(row) for row in db.session.execute(query)]
+
+
+_run_lock = threading.Lock()
+
+
+def backfill(
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    delay: float = 1.0,
+    limit: int | None = None,
+    on_progress: Callable[[BackfillStats, int], None] | None = None,
+) -> BackfillStats:
+    """
+    Berechnet alle fehlenden Entfernungen. delay: Pause zwischen
+    Nominatim-Anfragen (nur für Anschriften, die nicht im Cache sind).
+    on_progress(stats, n) nach jedem Chunk mit n = Anzahl Adressen im Chunk.
+    Pro Prozess läuft immer nur ein Backfill gleichzeitig.
+    """
+    with _run_lock:
+        rows = pending_addresses(limit)
+        stats = BackfillStats(total=len(rows))
+        if not rows:
+            return stats
+
+        # gleiche Anschrift -> eine Abfrage, alle zugehörigen Adress-IDs
+        groups: dict[str, list[int]] = {}
+        parts: dict[str, tuple] = {}
+        for aid, *addr in rows:
+            key = address_key(*addr)
+            groups.setdefault(key, []).append(aid)
+            parts.setdefault(key, tuple(addr))
+        keys = list(groups)
+        stats.unique = len(keys)
+
+        routing = get_routing()
+        routing.start_coords()  # Exception, wenn die Startadresse nicht ermittelbar ist
+
+        cached = fresh_keys(keys)
+        results: dict[int, tuple[int, bool]] = {}
+        failed: list[str] = []
+        fetched = False
+
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+
+            ziele: list[tuple[str, tuple[float, float]]] = []
+            for key in chunk:
+                if key not in cached:
+                    if fetched and delay:
+                        time.sleep(delay)
+                    fetched = True
+                try:
+                    loc = geocode(*parts[key])
+                except GeocodingUnavailable:
+                    logger.warning("Distanz-Backfill: Nominatim-Fehler für %r", key, exc_info=True)
+                    stats.errors += 1
+                    failed.append(key)
+                    continue
+                if loc is None:
+                    stats.not_found += 1
+                    failed.append(key)
+                else:
+                    ziele.append((key, loc.coords))
+
+            if ziele:
+                try:
+                    km = routing.fahrstrecken_km([coords for _, coords in ziele])
+                    stats.matrix_calls += 1
+                except Exception:
+                    logger.exception("Distanz-Backfill: ORS-Matrix fehlgeschlagen (%s Ziele)", len(ziele))
+                    stats.errors += len(ziele)
+                    failed.extend(key for key, _ in ziele)
+                else:
+                    for (key, _), dist in zip(ziele, km):
+                        if dist is None:
+                            stats.no_route += 1
+                            failed.append(key)
+                            continue
+                        for aid in groups[key]:
+                            results[aid] = (dist, False)
+
+            if on_progress is not None:
+                on_progress(stats, sum(len(groups[key]) for key in chunk))
+
+        routed = bool(results)
+        estimator = get_estimator() if failed else None
+        if estimator is not None:
+            for key in failed:
+                km = estimator.estimate_km(parts[key][2])
+                if km is None:
+                    continue
+                for aid in groups[key]:
+                    results[aid] = (km, True)
+                    stats.estimated += 1
+
+        stats.updated = _write(results)
+        if routed:
+            # mehr Stichproben für den Umwegfaktor
+            reload_estimator()
+        logger.info(
+            "Distanz-Backfill: %s Adresse(n) aktualisiert, davon %s geschätzt (%s Anschriften, "
+            "%s Matrix-Aufrufe, %s nicht gefunden, %s ohne Route, %s Fehler)",
+            stats.updated, stats.estimated, stats.unique, stats.matrix_calls, stats.not_found, stats.no_route,
+            stats.errors,
+        )
+        return stats
+
+
+def _write(results: dict[int, tuple[int, bool]]) -> int:
+    """
+    Ein UPDATE für alle Ergebnisse (Adress-ID -> (km, geschätzt)); manuell
+    eingetragene oder inzwischen berechnete Entfernungen bleiben.
+    """
+    if not results:
+        return 0
+    table = Adresse.__table__
+    stmt = (
+        update(table)
+        .where(
+            table.c.id == bindparam("b_id"),
+            or_(table.c.distanz.is_(None), table.c.distanz_geschaetzt.is_(True)),
+        )
+        .values(distanz=bindparam("b_distanz"), distanz_geschaetzt=bindparam("b_geschaetzt"))
+    )
+    result = db.session.execute(stmt, [
+        {"b_id": aid, "b_distanz": km, "b_geschaetzt": geschaetzt}
+        for aid, (km, geschaetzt) in results.items()
+    ])
+    db.session.commit()
+    _refresh_drafts(list(results))
+    return result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(results)
+
+
+def _refresh_drafts(adresse_ids: list[int]) -> None:
+    """Rechnungsentwürfe der betroffenen Aufträge neu bauen (das Core-UPDATE löst keine ORM-Events aus)."""
+    ids: set[int] = set()
+    for start in range(0, len(adresse_ids), 500):
+        chunk = adresse_ids[start:start + 500]
+        ids.update(db.session.execute(
+            select(Auftrag.id).where(Auftrag.auftragsadresse_id.in_(chunk))
+        ).scalars())
+    if ids:
+        rechnung_drafts.invalidate(ids)
+        rechnung_drafts.schedule_prerender(sorted(ids))
+
+
+# --- Beim Anlegen/Bearbeiten einer Adresse ---
+
+def resolve_pending(session: Session | None = None) -> int:
+    """
+    Vor dem Commit aufrufen: Adressen der Session ohne Entfernung bekommen
+    sofort die Offline-Schätzung (distanz_geschaetzt=True), damit Vorschau
+    und Rechnung nicht auf den Backfill warten. Kein Netzaufruf außer beim
+    ersten Laden des Schätzers im Prozess. Gibt die Anzahl geschätzter
+    Adressen zurück; die Fahrstrecke berechnet der Backfill nach dem Commit.
+    """
+    session = session or db.session
+    offen = [
+        obj for obj in (*session.new, *session.identity_map.values())
+        if isinstance(obj, Adresse) and obj.distanz is None
+    ]
+    if not offen:
+        return 0
+    estimator = get_estimator()
+    if estimator is None:
+        return 0
+    geschaetzt = 0
+    for adresse in offen:
+        km = estimator.estimate_km(adresse.plz)
+        if km is not None:
+            adresse.distanz, adresse.distanz_geschaetzt = km, True
+            geschaetzt += 1
+    return geschaetzt
+
+
+def ensure_distance(adresse: Adresse | None) -> None:
+    """
+    Vor dem Bauen einer Rechnung: Altbestand ohne Entfernung (aus der Zeit,
+    als sie erst bei der Rechnung berechnet wurde) bekommt sofort die
+    Offline-Schätzung, und der Backfill wird angestoßen. Committet nicht.
+    """
+    if adresse is None or adresse.distanz is not None:
+        return
+    schedule_backfill()
+    estimator = get_estimator()
+    km = estimator.estimate_km(adresse.plz) if estimator is not None else None
+    if km is not None:
+        adresse.distanz, adresse.distanz_geschaetzt = km, True
+        logger.warning("Entfernung fehlte, geschätzt (%s km, PLZ %s) – adresse_id=%s", km, adresse.plz, adresse.id)
+
+
+# --- Automatisch nach dem Commit ---
+
+_lock = threading.Lock()
+_scheduled = False
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="distance-backfill")
+        return _executor
+
+
+def schedule_backfill() -> None:
+    """Backfill im Hintergrund anstoßen; ist schon einer eingereiht, passiert nichts."""
+    global _scheduled
+    if not has_app_context() or not current_app.config.get("DISTANCE_BACKFILL"):
+        return
+    with _lock:
+        if _scheduled:
+            return
+        _scheduled = True
+    app = current_app._get_current_object()
+    _get_executor().submit(_auto_backfill, app)
+
+
+def _auto_backfill(app) -> None:
+    global _scheduled
+    with app.app_context():
+        # Commits während des Laufs stoßen den nächsten Lauf an
+        with _lock:
+            _scheduled = False
+        try:
+            backfill()
+        except Exception:
+            logger.exception("Distanz-Backfill im Hintergrund fehlgeschlagen")
+        finally:
+            db.session.remove()
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    if any(
+        isinstance(obj, Adresse) and (obj.distanz is None or obj.distanz_geschaetzt)
+        for obj in (*session.new, *session.dirty)
+    ):
+        session.info[_SESSION_KEY] = True
+
+
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_KEY, None):
+        schedule_backfill()
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+_listening = False
+
+
+def init_app(app) -> None:
+    global _listening
+    if not _listening:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _listening = True
+    app.extensions["distances"] = True
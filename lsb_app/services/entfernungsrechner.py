@@ -5,68 +5,102 @@ from flask import current_app
 # import os
 # import pyodbc
 import openrouteservice
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-import time
 # from PyQt6.QtWidgets import QMessageBox
 # from config.settings import STARTADRESSE
 import logging
+import threading
+from lsb_app.services.geocoding import cached_text, geocode_text
 
 logger = logging.getLogger(__name__)
 
-def berechne_entfernung(strasse, plz, ort):
-    logger.info(f"Starte Entfernungsermittlung für: {strasse}, {plz} {ort}")
-
-    # ➤ Konstanten
-    # STARTADRESSE = "Steinsdorfstraße 15, 80538 München"
-    # ORS_API_KEY = "5b3ce3597851110001cf6248368578c7b7934ccbb367202accb3655d"
-    # ORS_API_KEY = os.getenv("ORS_API_KEY")
-    ORS_API_KEY = current_app.config["ORS_API_KEY"]
-    STARTADRESSE = current_app.config["STARTADRESSE"]
-   
-    fahrstrecke_km = None
-
-
-    # ➤ Geocoder und ORS-Client
-    geolocator = Nominatim(user_agent="routing-script")
-    client = openrouteservice.Client(key=ORS_API_KEY)
-
-    # ➤ Startadresse einmalig geokodieren
-    start_loc = geolocator.geocode(STARTADRESSE)
-    if not start_loc:
-        logger.error("Startadresse konnte nicht geokodiert werden.")
-        raise Exception("Startadresse konnte nicht geokodiert werden")
-    coords_start = (start_loc.longitude, start_loc.latitude)
-
-    logger.debug(f"Startadresse: {STARTADRESSE} → Koordinaten: {coords_start}")
-
-    zieladresse = f"{strasse}, {plz} {ort}"
-    try:
-        ziel_loc = geolocator.geocode(zieladresse)
-        if not ziel_loc:
-            logger.error(f"Zieladresse nicht gefunden: {zieladresse}")
-            # QMessageBox.information(parent, "Fehler", f"⚠️ Zieladresse nicht gefunden ({zieladresse})")
-            print(f"⚠️ Fehler: Zieladresse nicht gefunden ({zieladresse})")
-        else:
-            coords_ziel = (ziel_loc.longitude, ziel_loc.latitude)
-            logger.debug(f"Zieladresse: {zieladresse} → Koordinaten: {coords_ziel}")
-
-            # ➤ Fahrstrecke mit ORS berechnen
-            route = client.directions(
-                coordinates=[coords_start, coords_ziel],
-                profile='driving-car',
-                format='geojson',
-                preference='shortest'
-            )
-            fahrstrecke_km = round(route['features'][0]['properties']['segments'][0]['distance'] / 1000)
-            logger.info(f"Fahrstrecke berechnet: {fahrstrecke_km} km von Start zu {zieladresse}")
-
-    except Exception as e:
-        logger.error(f"Fehler bei der Entfernungsermittlung für {zieladresse}: {e}")
-        # QMessageBox.warning(parent, "Fehler", f"❌ Fehler: {e}")
-        print(f"❌ Fehler: {e}")
-    
-    return fahrstrecke_km
+
+def parse_koordinaten(value: str) -> tuple[float, float] | None:
+    """Wandelt "lat,lon" (z. B. "48.1374, 11.5755") in (lon, lat) wie bei openrouteservice; leer -> None."""
+    if not value or not value.strip():
+        return None
+    lat_str, lon_str = value.replace(";", ",").split(",")
+    return (float(lon_str), float(lat_str))
+
+
+class RoutingContext:
+    """
+    Einmal pro Prozess (app.extensions["routing"]): ORS-Client mit
+    wiederverwendeter HTTP-Session und die Koordinaten der Startadresse.
+    Die Startkoordinaten kommen aus STARTKOORDINATEN oder werden beim ersten
+    Bedarf einmal geokodiert (Geocode-Cache) und dann im Speicher gehalten.
+    """
+
+    def __init__(self, ors_api_key: str, startadresse: str, start_coords: tuple[float, float] | None = None):
+        self.startadresse = startadresse
+        self.client = openrouteservice.Client(key=ors_api_key)
+        self._start_coords = start_coords
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg) -> "RoutingContext":
+        try:
+            start_coords = parse_koordinaten(cfg.get("STARTKOORDINATEN", ""))
+        except ValueError:
+            logger.error("STARTKOORDINATEN ungültig (erwartet 'lat,lon'), Startadresse wird geokodiert.")
+            start_coords = None
+        return cls(cfg.get("ORS_API_KEY", ""), cfg.get("STARTADRESSE", ""), start_coords)
+
+    def start_coords(self) -> tuple[float, float]:
+        if self._start_coords is None:
+            with self._lock:
+                if self._start_coords is None:
+                    start_loc = geocode_text(self.startadresse) if self.startadresse else None
+                    if not start_loc:
+                        logger.error("Startadresse konnte nicht geokodiert werden.")
+                        raise Exception("Startadresse konnte nicht geokodiert werden")
+                    self._start_coords = start_loc.coords
+                    logger.debug(f"Startadresse: {self.startadresse} → Koordinaten: {self._start_coords}")
+        return self._start_coords
+
+    def known_start_coords(self) -> tuple[float, float] | None:
+        """Startkoordinaten ohne Netz: STARTKOORDINATEN, schon ermittelt oder Geocode-Cache."""
+        if self._start_coords is not None:
+            return self._start_coords
+        cached = cached_text(self.startadresse) if self.startadresse else None
+        return cached.coords if cached else None
+
+    def fahrstrecke_km(self, coords_ziel: tuple[float, float]) -> int:
+        """Kürzeste Fahrstrecke Start → Ziel in km (ein ORS-Aufruf)."""
+        route = self.client.directions(
+            coordinates=[self.start_coords(), coords_ziel],
+            profile='driving-car',
+            format='geojson',
+            preference='shortest'
+        )
+        return round(route['features'][0]['properties']['segments'][0]['distance'] / 1000)
+
+    def fahrstrecken_km(self, ziele: list[tuple[float, float]]) -> list[int | None]:
+        """
+        Fahrstrecken Start → viele Ziele in km, ein Matrix-Aufruf (eine Zeile).
+        None, wenn ORS für ein Ziel keine Route findet. Die Matrix rechnet
+        immer mit der schnellsten Route, nicht mit der kürzesten wie
+        fahrstrecke_km().
+        """
+        if not ziele:
+            return []
+        matrix = self.client.distance_matrix(
+            locations=[self.start_coords(), *ziele],
+            profile='driving-car',
+            sources=[0],
+            destinations=list(range(1, len(ziele) + 1)),
+            metrics=['distance'],
+            units='km',
+        )
+        return [round(d) if d is not None else None for d in matrix['distances'][0]]
+
+
+def init_app(app) -> None:
+    app.extensions["routing"] = RoutingContext.from_config(app.config)
+
+
+def get_routing() -> RoutingContext:
+    return current_app.extensions["routing"]
+
 
 # def pruefe_zieladresse(parent, strasse, plz, ort):
 #     logger.info(f"Starte Adressprüfung für: {strasse}, {plz} {ort}")
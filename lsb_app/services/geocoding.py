@@ -0,0 +1,320 @@
+# lsb_app/services/geocoding.py
+"""
+Geokodierung über Nominatim mit persistentem Cache (Tabelle geocode_cache).
+
+Schlüssel ist die normalisierte Adresse (Straße + Hausnummer, PLZ, Ort;
+Groß-/Kleinschreibung, Leerzeichen, "Straße"/"Str." vereinheitlicht).
+Vor jedem Netzaufruf wird der Cache gefragt; Treffer gelten
+GEOCODE_CACHE_TTL_DAYS, "nicht gefunden" nur GEOCODE_CACHE_NEGATIVE_TTL_DAYS.
+Gespeichert werden Koordinaten und das komplette Nominatim-Ergebnis
+(inkl. addressdetails), damit auch die Adressprüfung daraus bedient wird.
+
+Cache-Schreibzugriffe laufen in einer eigenen Transaktion, unabhängig von
+der Session des Requests; schlägt das Schreiben fehl, wird nur geloggt.
+
+Nominatim-Aufrufe laufen durch einen Token-Bucket, den sich alle Prozesse
+der Instanz teilen (NOMINATIM_RATE_PER_MINUTE, Standard 60 = 1/s laut
+Nutzungsbedingungen). Mit wait=... wartet ein Aufrufer höchstens so lange
+auf einen Slot, sonst GeocodingRateLimited. Gleichzeitige Abfragen derselben
+Adresse im Prozess warten auf die erste statt selbst anzufragen.
+
+Vorbefüllen für alle bekannten Adressen: `flask geocode prefill`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable
+
+import requests
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from lsb_app.extensions import db
+from lsb_app.models import GeocodeCache
+from lsb_app.services.rate_limit import SharedTokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_DAYS = 180
+DEFAULT_NEGATIVE_TTL_DAYS = 7
+REQUEST_TIMEOUT = 5
+
+_STREET_RE = re.compile(r"str(asse|\.)")
+_PUNCT_RE = re.compile(r"[,;]+")
+
+
+class GeocodingUnavailable(Exception):
+    """Nominatim nicht erreichbar."""
+
+
+class GeocodingInvalidResponse(GeocodingUnavailable):
+    """Nominatim hat keine gültige JSON-Antwort geliefert."""
+
+
+class GeocodingRateLimited(GeocodingUnavailable):
+    """Innerhalb der Wartezeit kein Nominatim-Slot frei."""
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    lat: float
+    lon: float
+    raw: dict
+    cached: bool = False
+
+    @property
+    def coords(self) -> tuple[float, float]:
+        """(lon, lat) – Reihenfolge wie bei openrouteservice."""
+        return (self.lon, self.lat)
+
+    @property
+    def address(self) -> dict:
+        return self.raw.get("address") or {}
+
+
+def normalize(value: str | None) -> str:
+    if not value:
+        return ""
+    s = value.casefold()  # "ß" -> "ss"
+    s = _STREET_RE.sub("str", s)
+    s = _PUNCT_RE.sub(" ", s)
+    return " ".join(s.split())
+
+
+def address_key(strasse: str | None, hausnummer: str | None, plz: str | None, ort: str | None) -> str:
+    street = normalize(f"{strasse or ''} {hausnummer or ''}")
+    return f"{street}|{normalize(plz)}|{normalize(ort)}"
+
+
+def text_key(query: str) -> str:
+    """Schlüssel für Freitext-Adressen (z. B. STARTADRESSE)."""
+    return "q:" + normalize(query)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # SQLite liefert naive Zeitstempel
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _is_fresh(row: GeocodeCache, now: datetime) -> bool:
+    cfg = current_app.config
+    if row.lat is not None:
+        ttl = timedelta(days=int(cfg.get("GEOCODE_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS)))
+    else:
+        ttl = timedelta(days=int(cfg.get("GEOCODE_CACHE_NEGATIVE_TTL_DAYS", DEFAULT_NEGATIVE_TTL_DAYS)))
+    return _as_utc(row.fetched_at) + ttl > now
+
+
+def _result(row: GeocodeCache) -> GeocodeResult | None:
+    if row.lat is None or row.lon is None:
+        return None
+    return GeocodeResult(lat=row.lat, lon=row.lon, raw=row.response or {}, cached=True)
+
+
+def _http() -> requests.Session:
+    """Eine HTTP-Session pro App (Keep-Alive zu Nominatim)."""
+    session = current_app.extensions.get("nominatim_session")
+    if session is None:
+        session = current_app.extensions.setdefault("nominatim_session", requests.Session())
+    return session
+
+
+def _bucket() -> SharedTokenBucket:
+    """Nominatim-Limit; Zustand in instance/, gemeinsam für alle Worker-Prozesse."""
+    bucket = current_app.extensions.get("nominatim_bucket")
+    if bucket is None:
+        path = os.path.join(current_app.instance_path, "nominatim.bucket")
+        rate = float(current_app.config.get("NOMINATIM_RATE_PER_MINUTE", 60))
+        bucket = current_app.extensions.setdefault("nominatim_bucket", SharedTokenBucket(path, rate, capacity=1))
+    return bucket
+
+
+def _fetch(query: str, wait: float | None = None) -> dict | None:
+    """Eine Nominatim-Suche; erstes Ergebnis oder None (nicht gefunden)."""
+    cfg = current_app.config
+    if not _bucket().acquire(timeout=wait):
+        raise GeocodingRateLimited(f"kein Nominatim-Slot innerhalb von {wait} s")
+    params = {
+        "q": query,
+        "format": "json",
+        "addressdetails": 1,
+        "limit": 1,
+    }
+    headers = {"User-Agent": cfg["NOMINATIM_USER_AGENT"]}
+
+    try:
+        resp = _http().get(cfg["NOMINATIM_URL"], params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+    except Exception as exc:
+        raise GeocodingUnavailable(str(exc)) from exc
+
+    try:
+        results = resp.json()
+    except ValueError as exc:
+        raise GeocodingInvalidResponse(str(exc)) from exc
+
+    return results[0] if results else None
+
+
+def _store(key: str, parts: dict, data: dict | None) -> None:
+    values = {
+        **parts,
+        "lat": float(data["lat"]) if data else None,
+        "lon": float(data["lon"]) if data else None,
+        "response": data,
+        "fetched_at": _utcnow(),
+    }
+    table = GeocodeCache.__table__
+    try:
+        with db.engine.begin() as conn:
+            updated = conn.execute(update(table).where(table.c.key == key).values(**values))
+            if updated.rowcount == 0:
+                conn.execute(insert(table).values(key=key, **values))
+    except SQLAlchemyError:
+        # z. B. paralleler Insert desselben Schlüssels – der Cache ist nur eine Abkürzung
+        logger.warning("Geocode-Cache: Eintrag %r konnte nicht gespeichert werden", key, exc_info=True)
+
+
+# laufende Nominatim-Abfragen dieses Prozesses: Schlüssel -> Ergebnis
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _geocode(key: str, parts: dict, query: str, refresh: bool, wait: float | None) -> GeocodeResult | None:
+    if not refresh:
+        row = db.session.execute(select(GeocodeCache).where(GeocodeCache.key == key)).scalar_one_or_none()
+        if row is not None and _is_fresh(row, _utcnow()):
+            logger.debug("Geocode-Cache: Treffer für %r", key)
+            return _result(row)
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = Future()
+
+    if not leader:
+        logger.debug("Geocoding: warte auf laufende Abfrage für %r", key)
+        try:
+            return flight.result(timeout=None if wait is None else wait + REQUEST_TIMEOUT)
+        except FutureTimeoutError as exc:
+            raise GeocodingRateLimited(f"laufende Abfrage für {key!r} nicht rechtzeitig fertig") from exc
+
+    try:
+        data = _fetch(query, wait)
+        _store(key, parts, data)
+        if data is None:
+            logger.info("Geocoding: nichts gefunden für %r", query)
+            result = None
+        else:
+            result = GeocodeResult(lat=float(data["lat"]), lon=float(data["lon"]), raw=data)
+    except BaseException as exc:
+        flight.set_exception(exc)
+        raise
+    else:
+        flight.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def geocode(strasse: str | None, hausnummer: str | None, plz: str | None, ort: str | None,
+            refresh: bool = False, wait: float | None = None) -> GeocodeResult | None:
+    """
+    Koordinaten einer Adresse (Cache, sonst Nominatim).
+    None = nicht gefunden; GeocodingUnavailable, wenn Nominatim nicht antwortet
+    (GeocodingRateLimited, wenn nach wait Sekunden kein Slot frei war).
+    """
+    parts = {"strasse": strasse, "hausnummer": hausnummer, "plz": plz, "ort": ort}
+    query = " ".join(p for p in (strasse, hausnummer, plz, ort) if p)
+    return _geocode(address_key(strasse, hausnummer, plz, ort), parts, query, refresh, wait)
+
+
+def geocode_text(query: str, refresh: bool = False, wait: float | None = None) -> GeocodeResult | None:
+    """Wie geocode(), für eine Adresse als Freitext."""
+    parts = {"strasse": query[:160], "hausnummer": None, "plz": None, "ort": None}
+    return _geocode(text_key(query), parts, query, refresh, wait)
+
+
+def cached_text(query: str) -> GeocodeResult | None:
+    """Nur Cache, kein Netz, auch abgelaufene Einträge; None = nichts bekannt."""
+    row = db.session.execute(select(GeocodeCache).where(GeocodeCache.key == text_key(query))).scalar_one_or_none()
+    return _result(row) if row is not None else None
+
+
+# --- Vorbefüllen ---
+
+@dataclass
+class PrefillStats:
+    total: int = 0
+    cached: int = 0
+    found: int = 0
+    not_found: int = 0
+    errors: int = 0
+
+
+def fresh_keys(keys: Iterable[str], chunk_size: int = 500) -> set[str]:
+    """Welche der Schlüssel einen noch gültigen Cache-Eintrag haben (ein Query pro Chunk)."""
+    keys = list(keys)
+    now = _utcnow()
+    fresh: set[str] = set()
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        rows = db.session.execute(select(GeocodeCache).where(GeocodeCache.key.in_(chunk))).scalars()
+        fresh.update(row.key for row in rows if _is_fresh(row, now))
+    return fresh
+
+
+def prefill(
+    addresses: Iterable[tuple[str, str, str, str]],
+    refresh: bool = False,
+    delay: float = 1.0,
+    on_progress: Callable[[PrefillStats], None] | None = None,
+) -> PrefillStats:
+    """
+    Geokodiert alle Adressen (strasse, hausnummer, plz, ort), die nicht
+    (mehr) im Cache sind. delay: Pause zwischen Nominatim-Anfragen
+    (Nutzungsbedingungen: höchstens 1 Anfrage pro Sekunde).
+    """
+    unique: dict[str, tuple[str, str, str, str]] = {}
+    for addr in addresses:
+        unique.setdefault(address_key(*addr), addr)
+
+    stats = PrefillStats(total=len(unique))
+    skip = set() if refresh else fresh_keys(unique)
+    stats.cached = len(skip)
+
+    first = True
+    for key, addr in unique.items():
+        if key in skip:
+            continue
+        if not first and delay:
+            time.sleep(delay)
+        first = False
+
+        try:
+            result = geocode(*addr, refresh=True)
+        except GeocodingUnavailable:
+            logger.warning("Geocode-Prefill: Nominatim-Fehler für %r", key, exc_info=True)
+            stats.errors += 1
+        else:
+            if result is None:
+                stats.not_found += 1
+            else:
+                stats.found += 1
+        if on_progress is not None:
+            on_progress(stats)
+    return stats
@@ -0,0 +1,147 @@
+# lsb_app/services/invoice_archive.py
+"""
+ZIP-Export der Rechnungs-PDFs (instance/invoices/YYYY/MM) als Stream.
+
+Die Rechnungen kommen per Query (yield_per) aus der DB, das ZIP wird
+währenddessen in einen nicht-seekbaren Puffer geschrieben und stückweise
+ausgegeben – keine Temp-Datei, konstanter Speicher. PDFs sind bereits
+komprimiert und werden daher unkomprimiert (ZIP_STORED) abgelegt.
+"""
+from __future__ import annotations
+
+import logging
+import zipfile
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from sqlalchemy import extract, select
+
+from lsb_app.extensions import db
+from lsb_app.models import Auftrag, Rechnung, RechnungsStatusEnum
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 200
+
+
+@dataclass(frozen=True)
+class ArchiveFilter:
+    year: int | None = None
+    month: int | None = None
+    institut_id: int | None = None
+    status: RechnungsStatusEnum | None = None
+
+    def __post_init__(self):
+        if self.month is not None and self.year is None:
+            raise ValueError("Monat nur zusammen mit Jahr angeben.")
+        if self.month is not None and not 1 <= self.month <= 12:
+            raise ValueError(f"Ungültiger Monat: {self.month}")
+
+    @property
+    def zip_name(self) -> str:
+        parts = ["Rechnungen"]
+        if self.year:
+            parts.append(f"{self.year}" + (f"-{self.month:02d}" if self.month else ""))
+        if self.institut_id:
+            parts.append(f"BI{self.institut_id}")
+        if self.status:
+            parts.append(self.status.value)
+        if len(parts) == 1:
+            parts.append(date.today().isoformat())
+        return "_".join(parts) + ".zip"
+
+
+def archive_query(f: ArchiveFilter):
+    stmt = (
+        select(Rechnung.pdf_path, Rechnung.rechnungsdatum)
+        .join(Auftrag, Rechnung.auftrag_id == Auftrag.id)
+        .where(Rechnung.pdf_path.is_not(None))
+        .order_by(Rechnung.rechnungsdatum, Rechnung.id)
+    )
+    if f.year is not None:
+        stmt = stmt.where(extract("year", Rechnung.rechnungsdatum) == f.year)
+    if f.month is not None:
+        stmt = stmt.where(extract("month", Rechnung.rechnungsdatum) == f.month)
+    if f.institut_id is not None:
+        stmt = stmt.where(Auftrag.bestattungsinstitut_id == f.institut_id)
+    if f.status is not None:
+        stmt = stmt.where(Rechnung.status == f.status)
+    return stmt
+
+
+def iter_archive_files(f: ArchiveFilter, invoices_dir: Path) -> Iterator[tuple[Path, str]]:
+    """(Datei, Name im ZIP) je Rechnung; nur existierende Dateien unter invoices_dir."""
+    root = invoices_dir.resolve()
+    rows = db.session.execute(
+        archive_query(f).execution_options(yield_per=YIELD_PER)
+    )
+    for pdf_path, rechnungsdatum in rows:
+        path = Path(pdf_path).resolve()
+        if not path.is_relative_to(root):
+            logger.warning("invoice_archive: pdf_path außerhalb von %s übersprungen: %s", root, path)
+            continue
+        if not path.is_file():
+            logger.warning("invoice_archive: PDF fehlt: %s", path)
+            continue
+        yield path, f"{rechnungsdatum.year}/{rechnungsdatum.month:02d}/{path.name}"
+
+
+class _StreamBuffer:
+    """Nicht-seekbares Schreibziel für ZipFile; drain() gibt das Geschriebene ab."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._chunks)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[tuple[Path, str]]) -> Iterator[bytes]:
+    """ZIP (ZIP_STORED) aus (Datei, Name im ZIP) als Byte-Stream."""
+    buf = _StreamBuffer()
+    count = 0
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for path, arcname in files:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            zinfo.compress_type = zipfile.ZIP_STORED
+            with path.open("rb") as src, zf.open(zinfo, "w") as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    dst.write(chunk)
+                    if buf.pending:
+                        yield buf.drain()
+            count += 1
+            yield buf.drain()
+    # Central Directory
+    yield buf.drain()
+    logger.info("invoice_archive: ZIP mit %s Dateien gestreamt", count)
+
+
+def write_zip(files: Iterable[tuple[Path, str]], out: BinaryIO) -> int:
+    """Schreibt das ZIP in ein Dateiobjekt, gibt die Bytes zurück."""
+    total = 0
+    for chunk in stream_zip(files):
+        if chunk:
+            out.write(chunk)
+            total += len(chunk)
+    return total
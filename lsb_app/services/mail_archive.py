@@ -0,0 +1,138 @@
+# lsb_app/services/mail_archive.py
+"""
+Ablage versendeter Mails im IMAP-Postfach.
+
+Statt nach jeder Mail eine eigene IMAP-Sitzung zu öffnen, sammelt der
+ImapArchiver die Rohnachrichten eines Versandlaufs und legt sie nach der
+SMTP-Phase über eine angemeldete Sitzung ab. Unterstützt der Server
+MULTIAPPEND (RFC 3502), gehen mehrere Nachrichten in einem APPEND-Befehl
+raus; sonst (oder wenn MULTIAPPEND abgelehnt wird) einzeln per APPEND.
+Fehler werden nur geloggt – der Versand selbst war ja erfolgreich.
+"""
+from __future__ import annotations
+
+import imaplib
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from lsb_app.services.mail_transport import MailSettings
+
+logger = logging.getLogger(__name__)
+
+RECHNUNGEN_FOLDER = '"Leichenschau/Rechnungen"'
+ANFRAGEN_FOLDER = '"Leichenschau/Anfragen"'
+
+SEEN_FLAG = "(\\Seen)"
+MULTIAPPEND_BATCH = 20
+
+
+@dataclass(frozen=True)
+class _PendingMessage:
+    raw: bytes
+    label: str
+    date: str
+
+
+def _multiappend(imap: imaplib.IMAP4, mailbox: str, messages: list[_PendingMessage]) -> None:
+    """
+    Ein APPEND mit mehreren Literalen (MULTIAPPEND). imaplib kann pro Befehl
+    nur ein Literal, daher werden die Continuations hier selbst bedient.
+    """
+    tag = imap._new_tag()
+    imap.tagged_commands[tag] = None
+
+    def _literal_header(m: _PendingMessage) -> bytes:
+        return f' {SEEN_FLAG} {m.date} {{{len(m.raw)}}}'.encode("ascii") + imaplib.CRLF
+
+    imap.send(tag + b" APPEND " + mailbox.encode("utf-8") + _literal_header(messages[0]))
+    for i, m in enumerate(messages):
+        # auf "+ ..." vom Server warten; tagged NO/BAD bricht ab
+        while imap._get_response():
+            if imap.tagged_commands[tag]:
+                typ, data = imap.tagged_commands.pop(tag)
+                raise imap.error(f"MULTIAPPEND abgelehnt: {typ} {data}")
+        tail = _literal_header(messages[i + 1]) if i + 1 < len(messages) else imaplib.CRLF
+        imap.send(m.raw + tail)
+
+    typ, data = imap._command_complete("APPEND", tag)
+    if typ != "OK":
+        raise imap.error(f"MULTIAPPEND fehlgeschlagen: {typ} {data}")
+
+
+class ImapArchiver:
+    def __init__(self, settings: MailSettings):
+        self.settings = settings
+        self._pending: dict[str, list[_PendingMessage]] = defaultdict(list)
+
+    def add(self, mailbox: str, raw_message: bytes, label: str = "") -> None:
+        self._pending[mailbox].append(_PendingMessage(
+            raw=raw_message,
+            label=label,
+            date=imaplib.Time2Internaldate(time.localtime()),
+        ))
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._pending.values())
+
+    def flush(self) -> int:
+        """Legt alle gesammelten Nachrichten ab; gibt die Anzahl abgelegter zurück."""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, defaultdict(list)
+        total = sum(len(v) for v in pending.values())
+        stored = 0
+        t0 = time.perf_counter()
+
+        try:
+            imap_cls = imaplib.IMAP4_SSL if self.settings.use_ssl else imaplib.IMAP4
+            with imap_cls(self.settings.imap_server, self.settings.imap_port,
+                          timeout=self.settings.timeout) as imap:
+                if self.settings.starttls:
+                    imap.starttls()
+                imap.login(self.settings.username, self.settings.password)
+                multi = "MULTIAPPEND" in imap.capabilities
+
+                for mailbox, messages in pending.items():
+                    stored += self._store(imap, mailbox, messages, multi)
+        except Exception:
+            logger.exception("ImapArchiver: IMAP-Sitzung fehlgeschlagen, %s von %s Mails abgelegt",
+                             stored, total)
+            return stored
+
+        logger.info("ImapArchiver: %s/%s Mail(s) in einer IMAP-Sitzung abgelegt (%.2fs)",
+                    stored, total, time.perf_counter() - t0)
+        return stored
+
+    def _store(self, imap: imaplib.IMAP4, mailbox: str, messages: list[_PendingMessage], multi: bool) -> int:
+        stored = 0
+        if multi and len(messages) > 1:
+            rest = []
+            for start in range(0, len(messages), MULTIAPPEND_BATCH):
+                chunk = messages[start:start + MULTIAPPEND_BATCH]
+                try:
+                    _multiappend(imap, mailbox, chunk)
+                    stored += len(chunk)
+                except imap.error as exc:
+                    # MULTIAPPEND ist atomar: nichts abgelegt -> einzeln nachholen
+                    logger.warning("ImapArchiver: MULTIAPPEND nach %s fehlgeschlagen (%s), einzeln", mailbox, exc)
+                    rest += chunk
+            messages = rest
+
+        for m in messages:
+            try:
+                typ, data = imap.append(mailbox, "\\Seen", m.date, m.raw)
+                if typ != "OK":
+                    raise imap.error(f"{typ} {data}")
+                stored += 1
+            except imap.error:
+                logger.exception("ImapArchiver: Ablage in %s fehlgeschlagen (%s)", mailbox, m.label)
+        return stored
+
+    def __enter__(self) -> "ImapArchiver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
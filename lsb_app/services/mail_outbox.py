@@ -0,0 +1,406 @@
+# lsb_app/services/mail_outbox.py
+"""
+Persistente Mail-Outbox.
+
+Der Batch-Versand legt pro Rechnung eine OutboxMessage (fertige MIME-Bytes)
+an und kehrt sofort zurück. Der Worker (`flask outbox-worker`) holt fällige
+Nachrichten, stellt sie per SMTP zu, legt sie per IMAP ab
+und setzt Rechnung/Auftrag erst nach bestätigter Zustellung auf SENT.
+
+Fehlgeschlagene Zustellungen werden mit exponentiellem Backoff erneut
+versucht; dauerhafte Fehler (5xx, Empfänger abgelehnt) oder zu viele
+Versuche enden in FAILED – der Auftrag taucht dann wieder in der
+READY-Liste auf.
+
+Zugestellt wird über OUTBOX_CONCURRENCY parallele SMTP-Verbindungen
+(Threads mit eigener App-Context/Session); ein gemeinsamer Token-Bucket
+hält MAIL_RATE_PER_MINUTE über alle Verbindungen ein.
+
+Zustände: QUEUED -> SENDING -> SENT | QUEUED (Retry) | FAILED.
+SENDING trägt in next_attempt_at eine Lease; stirbt der Worker mitten im
+Versand, wird die Nachricht nach Ablauf wieder QUEUED (at-least-once).
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import random
+import smtplib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import Iterator, Mapping
+
+from flask import Flask, current_app
+from sqlalchemy import func, select, update
+
+from lsb_app.extensions import db
+from lsb_app.models import (AuftragsStatusEnum, OutboxMessage, OutboxStatusEnum, Rechnung,
+                            RechnungsStatusEnum)
+from lsb_app.services.mail_archive import RECHNUNGEN_FOLDER, ImapArchiver
+from lsb_app.services.mail_transport import MailSettings, SmtpTransport
+from lsb_app.services.rate_limit import TokenBucket
+from lsb_app.services.verlauf import add_verlauf
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = (OutboxStatusEnum.QUEUED, OutboxStatusEnum.SENDING)
+
+
+@dataclass(frozen=True)
+class OutboxSettings:
+    max_attempts: int = 6
+    retry_base_seconds: int = 60
+    retry_max_seconds: int = 3600
+    poll_seconds: int = 5
+    batch_size: int = 50
+    lease_seconds: int = 600
+    concurrency: int = 3
+    rate_per_minute: float = 0  # 0 = unbegrenzt
+
+    @classmethod
+    def from_config(cls, cfg: Mapping) -> "OutboxSettings":
+        return cls(
+            max_attempts=int(cfg.get("OUTBOX_MAX_ATTEMPTS", cls.max_attempts)),
+            retry_base_seconds=int(cfg.get("OUTBOX_RETRY_BASE_SECONDS", cls.retry_base_seconds)),
+            retry_max_seconds=int(cfg.get("OUTBOX_RETRY_MAX_SECONDS", cls.retry_max_seconds)),
+            poll_seconds=int(cfg.get("OUTBOX_POLL_SECONDS", cls.poll_seconds)),
+            batch_size=int(cfg.get("OUTBOX_BATCH_SIZE", cls.batch_size)),
+            concurrency=max(1, int(cfg.get("OUTBOX_CONCURRENCY", cls.concurrency))),
+            rate_per_minute=float(cfg.get("MAIL_RATE_PER_MINUTE", cls.rate_per_minute)),
+        )
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_batch_id() -> str:
+    return str(uuid.uuid4())
+
+
+# --- Einreihen (Request-Seite) ---
+
+def enqueue(
+    rechnung: Rechnung,
+    recipient: str,
+    msg: EmailMessage,
+    batch_id: str,
+    imap_folder: str | None = RECHNUNGEN_FOLDER,
+) -> OutboxMessage:
+    """Legt die Nachricht in die Outbox (ohne Commit)."""
+    item = OutboxMessage(
+        batch_id=batch_id,
+        rechnung=rechnung,
+        recipient=recipient,
+        mime=msg.as_bytes(),
+        imap_folder=imap_folder,
+        status=OutboxStatusEnum.QUEUED,
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    )
+    db.session.add(item)
+    return item
+
+
+# --- Auswertung ---
+
+@dataclass
+class BatchReport:
+    batch_id: str
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    pending: int = 0
+    created_at: datetime | None = None
+    first_sent_at: datetime | None = None
+    last_sent_at: datetime | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.pending == 0
+
+    @property
+    def send_seconds(self) -> float | None:
+        """Zeitspanne zwischen erster und letzter Zustellung."""
+        if self.first_sent_at is None or self.last_sent_at is None:
+            return None
+        return (self.last_sent_at - self.first_sent_at).total_seconds()
+
+    @property
+    def wall_seconds(self) -> float | None:
+        """Vom Einreihen bis zur letzten Zustellung."""
+        if self.created_at is None or self.last_sent_at is None:
+            return None
+        return (self.last_sent_at - self.created_at).total_seconds()
+
+    @property
+    def messages_per_second(self) -> float | None:
+        span = self.send_seconds
+        if self.sent < 2 or not span:
+            return None
+        return (self.sent - 1) / span
+
+
+def batch_report(batch_id: str) -> BatchReport | None:
+    """Zählt die Nachrichten eines Batches nach Status, dazu Zeitstempel für den Durchsatz."""
+    rows = db.session.execute(
+        select(
+            OutboxMessage.status,
+            func.count(),
+            func.min(OutboxMessage.created_at),
+            func.min(OutboxMessage.sent_at),
+            func.max(OutboxMessage.sent_at),
+        )
+        .where(OutboxMessage.batch_id == batch_id)
+        .group_by(OutboxMessage.status)
+    ).all()
+    if not rows:
+        return None
+
+    report = BatchReport(batch_id=batch_id)
+    for status, count, created_at, first_sent, last_sent in rows:
+        report.total += count
+        report.created_at = min(filter(None, [report.created_at, created_at]), default=None)
+        if status == OutboxStatusEnum.SENT:
+            report.sent = count
+            report.first_sent_at, report.last_sent_at = first_sent, last_sent
+        elif status == OutboxStatusEnum.FAILED:
+            report.failed = count
+        else:
+            report.pending += count
+    return report
+
+
+def watch_batch(batch_id: str, poll_seconds: float = 2.0, idle_timeout: float = 600.0) -> Iterator[dict | None]:
+    """
+    Verfolgt die Zustellung eines Batches: liefert je zugestellter oder
+    endgültig fehlgeschlagener Nachricht ein dict, zwischendurch None als
+    Lebenszeichen. Endet, wenn nichts mehr wartet oder sich idle_timeout
+    Sekunden nichts getan hat (z. B. kein Worker aktiv).
+    """
+    seen: set[int] = set()
+    last_change = time.monotonic()
+    while True:
+        rows = db.session.execute(
+            select(OutboxMessage.id, OutboxMessage.status, OutboxMessage.last_error, Rechnung.auftrag_id)
+            .join(Rechnung, OutboxMessage.rechnung_id == Rechnung.id)
+            .where(OutboxMessage.batch_id == batch_id)
+        ).all()
+        db.session.rollback()  # Snapshot beenden, beim nächsten Mal frische Daten
+
+        pending = 0
+        for message_id, status, last_error, auftrag_id in rows:
+            if status in PENDING_STATUSES:
+                pending += 1
+                continue
+            if message_id in seen:
+                continue
+            seen.add(message_id)
+            last_change = time.monotonic()
+            yield {"auftrag_id": auftrag_id, "status": status, "error": last_error}
+
+        if not pending or time.monotonic() - last_change > idle_timeout:
+            return
+        yield None
+        time.sleep(poll_seconds)
+
+
+# --- Zustellung (Worker-Seite) ---
+
+def retry_delay(attempts: int, settings: OutboxSettings) -> timedelta:
+    """Exponentieller Backoff mit etwas Jitter, gedeckelt auf retry_max_seconds."""
+    seconds = min(settings.retry_base_seconds * 2 ** max(0, attempts - 1), settings.retry_max_seconds)
+    return timedelta(seconds=seconds * random.uniform(0.9, 1.1))
+
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        # Konfigurationsproblem, betrifft alle Mails -> weiter versuchen
+        return False
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 500 <= exc.smtp_code < 600
+    return False
+
+
+def requeue_stale() -> int:
+    """SENDING-Nachrichten mit abgelaufener Lease (Worker abgestürzt) wieder einreihen."""
+    result = db.session.execute(
+        update(OutboxMessage)
+        .where(
+            OutboxMessage.status == OutboxStatusEnum.SENDING,
+            OutboxMessage.next_attempt_at <= _utcnow(),
+        )
+        .values(status=OutboxStatusEnum.QUEUED)
+    )
+    db.session.commit()
+    if result.rowcount:
+        logger.warning("Outbox: %s hängende Nachricht(en) wieder eingereiht", result.rowcount)
+    return result.rowcount
+
+
+def claim_due(settings: OutboxSettings) -> list[OutboxMessage]:
+    """Fällige Nachrichten auf SENDING setzen (mit Lease) und zurückgeben."""
+    now = _utcnow()
+    stmt = (
+        select(OutboxMessage)
+        .where(
+            OutboxMessage.status == OutboxStatusEnum.QUEUED,
+            OutboxMessage.next_attempt_at <= now,
+        )
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(settings.batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    messages = list(db.session.scalars(stmt))
+    for m in messages:
+        m.status = OutboxStatusEnum.SENDING
+        m.next_attempt_at = now + timedelta(seconds=settings.lease_seconds)
+    db.session.commit()
+    return messages
+
+
+def _mark_sent(m: OutboxMessage) -> None:
+    m.status = OutboxStatusEnum.SENT
+    m.sent_at = _utcnow()
+    m.last_error = None
+
+    rechnung = m.rechnung
+    rechnung.status = RechnungsStatusEnum.SENT
+    rechnung.gesendet_datum = datetime.now()
+    rechnung.auftrag.status = AuftragsStatusEnum.SENT
+    add_verlauf(rechnung.auftrag, f"Rechnung Version {rechnung.version} verschickt")
+
+
+def _mark_failed(m: OutboxMessage, error: str, permanent: bool, settings: OutboxSettings) -> None:
+    m.last_error = error
+    if permanent or m.attempts >= settings.max_attempts:
+        m.status = OutboxStatusEnum.FAILED
+        add_verlauf(
+            m.rechnung.auftrag,
+            f"E-Mail-Versand der Rechnung Version {m.rechnung.version} an {m.recipient} fehlgeschlagen: {error}",
+        )
+        logger.error("Outbox: Nachricht %s endgültig fehlgeschlagen nach %s Versuch(en): %s",
+                     m.id, m.attempts, error)
+        return
+
+    delay = retry_delay(m.attempts, settings)
+    m.status = OutboxStatusEnum.QUEUED
+    m.next_attempt_at = _utcnow() + delay
+    logger.warning("Outbox: Nachricht %s Versuch %s fehlgeschlagen (%s), nächster in %.0fs",
+                   m.id, m.attempts, error, delay.total_seconds())
+
+
+def _deliver_one(m: OutboxMessage, transport: SmtpTransport, bucket: TokenBucket,
+                 settings: OutboxSettings) -> bool:
+    m.attempts += 1
+    if m.rechnung.status == RechnungsStatusEnum.CANCELED:
+        _mark_failed(m, "Rechnung wurde storniert", True, settings)
+        return False
+
+    bucket.acquire()
+    try:
+        transport.send(message_from_bytes(m.mime, _class=EmailMessage, policy=policy.default))
+    except Exception as exc:
+        logger.exception("Outbox: Zustellung von Nachricht %s an %s fehlgeschlagen", m.id, m.recipient)
+        _mark_failed(m, str(exc) or exc.__class__.__name__, _is_permanent(exc), settings)
+        return False
+
+    _mark_sent(m)
+    return True
+
+
+def _delivery_lane(app: Flask, ids: "queue.SimpleQueue[int]", mail_settings: MailSettings,
+                   settings: OutboxSettings, bucket: TokenBucket) -> list[tuple[str, bytes, str]]:
+    """
+    Eine SMTP-Verbindung, arbeitet Nachrichten aus der gemeinsamen Queue ab.
+    Gibt (Ordner, MIME, Label) der zugestellten Mails für die IMAP-Ablage zurück.
+    """
+    delivered: list[tuple[str, bytes, str]] = []
+    with app.app_context(), SmtpTransport(mail_settings) as transport:
+        try:
+            while True:
+                try:
+                    message_id = ids.get_nowait()
+                except queue.Empty:
+                    break
+
+                m = db.session.get(OutboxMessage, message_id)
+                if m is None or m.status != OutboxStatusEnum.SENDING:
+                    continue
+
+                ok = _deliver_one(m, transport, bucket, settings)
+                db.session.commit()
+                if ok and m.imap_folder:
+                    delivered.append((m.imap_folder, m.mime, f"Outbox {m.id}"))
+        finally:
+            db.session.remove()
+    return delivered
+
+
+def deliver_due(mail_settings: MailSettings, settings: OutboxSettings, bucket: TokenBucket | None = None) -> int:
+    """Einen Schwung fälliger Nachrichten zustellen; gibt die Anzahl bearbeiteter zurück."""
+    messages = claim_due(settings)
+    if not messages:
+        return 0
+
+    bucket = bucket or TokenBucket(settings.rate_per_minute)
+    ids: "queue.SimpleQueue[int]" = queue.SimpleQueue()
+    for m in messages:
+        ids.put(m.id)
+    lanes = min(settings.concurrency, len(messages))
+
+    app = current_app._get_current_object()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=lanes, thread_name_prefix="outbox") as pool:
+        futures = [pool.submit(_delivery_lane, app, ids, mail_settings, settings, bucket) for _ in range(lanes)]
+        delivered = []
+        for fut in futures:
+            try:
+                delivered += fut.result()
+            except Exception:
+                # z. B. Login fehlgeschlagen: Nachrichten bleiben SENDING, die Lease reiht sie wieder ein
+                logger.exception("Outbox: Versand-Lane abgebrochen")
+    seconds = time.perf_counter() - t0
+
+    archiver = ImapArchiver(mail_settings)
+    for folder, raw, label in delivered:
+        archiver.add(folder, raw, label)
+    archiver.flush()
+
+    logger.info(
+        "Outbox: %s von %s Nachricht(en) zugestellt über %s Verbindung(en) in %.2fs (%.2f Mails/s)",
+        len(delivered), len(messages), lanes, seconds, len(delivered) / seconds if seconds else 0.0,
+    )
+    return len(messages)
+
+
+def run_worker(mail_settings: MailSettings, settings: OutboxSettings, once: bool = False) -> None:
+    """Arbeitet die Outbox ab; mit once=True nur bis nichts mehr fällig ist."""
+    logger.info("Outbox-Worker gestartet (once=%s, Intervall %ss, %s Verbindung(en), %s Mails/min)",
+                once, settings.poll_seconds, settings.concurrency, settings.rate_per_minute or "unbegrenzt")
+    bucket = TokenBucket(settings.rate_per_minute)
+    while True:
+        try:
+            requeue_stale()
+            processed = deliver_due(mail_settings, settings, bucket)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Outbox-Worker: Fehler im Durchlauf")
+            processed = 0
+            if once:
+                raise
+        finally:
+            db.session.remove()
+
+        if processed:
+            continue
+        if once:
+            return
+        time.sleep(settings.poll_seconds)
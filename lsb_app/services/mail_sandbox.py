@@ -0,0 +1,311 @@
+# lsb_app/services/mail_sandbox.py
+"""
+Lokaler Ersatz für SMTP- und IMAP-Server (Entwicklung, Benchmarks, Tests).
+
+MailSandbox startet zwei kleine Server in Hintergrund-Threads:
+
+- SMTP-Sink: nimmt jede Mail an (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA)
+  und zählt bzw. speichert sie; zugestellt wird nichts.
+- IMAP-Server nur für die Ablage: CAPABILITY, LOGIN, APPEND inkl.
+  MULTIAPPEND, NOOP, LOGOUT. Genau das, was ImapArchiver braucht.
+
+Beide sprechen Klartext (kein TLS); die App muss mit MAIL_USE_SSL=0 und
+MAIL_USE_TLS=0 darauf zeigen, siehe config(). Zugangsdaten werden nicht
+geprüft.
+
+    with MailSandbox() as sandbox:
+        app.config.update(sandbox.config())
+        ...
+        sandbox.smtp.messages, sandbox.imap.messages
+
+Start von der Kommandozeile: `flask mail-sandbox`.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+HOSTNAME = "lsb-sandbox"
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\+?\}\r?\n?$")
+
+
+@dataclass
+class SandboxStats:
+    """Zähler pro Protokoll; seconds = Summe der Sitzungsdauern."""
+    sessions: int = 0
+    messages: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    by_mailbox: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_message(self, size: int, mailbox: str | None = None) -> None:
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+            if mailbox is not None:
+                self.by_mailbox[mailbox] = self.by_mailbox.get(mailbox, 0) + 1
+
+    def add_session(self, seconds: float) -> None:
+        with self._lock:
+            self.sessions += 1
+            self.seconds += seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": self.sessions,
+                "messages": self.messages,
+                "bytes": self.bytes,
+                "seconds": round(self.seconds, 4),
+                "by_mailbox": dict(self.by_mailbox),
+            }
+
+
+class _SandboxServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, stats: SandboxStats, store_dir: Path | None, delay: float):
+        super().__init__(address, handler)
+        self.stats = stats
+        self.store_dir = store_dir
+        self.delay = delay
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+
+    def store(self, raw: bytes, subdir: str) -> None:
+        if self.store_dir is None:
+            return
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+        target = self.store_dir / subdir
+        target.mkdir(parents=True, exist_ok=True)
+        (target / f"{seq:06d}.eml").write_bytes(raw)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: _SandboxServer
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode("utf-8") + b"\r\n")
+
+    def handle(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            self.session()
+        except (ConnectionError, TimeoutError):
+            pass
+        finally:
+            self.server.stats.add_session(time.perf_counter() - t0)
+
+    def session(self) -> None:
+        raise NotImplementedError
+
+
+class _SmtpHandler(_Handler):
+    def session(self) -> None:
+        self.reply(f"220 {HOSTNAME} ESMTP Sandbox")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb, _, arg = line.decode("utf-8", "replace").strip().partition(" ")
+            verb = verb.upper()
+
+            if verb == "EHLO":
+                for ext in (HOSTNAME, "8BITMIME", "SMTPUTF8", "PIPELINING"):
+                    self.reply(f"250-{ext}")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self.reply(f"250 {HOSTNAME}")
+            elif verb == "AUTH":
+                self._auth(arg)
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self._data()
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def _auth(self, arg: str) -> None:
+        mechanism, _, initial = arg.partition(" ")
+        mechanism = mechanism.upper()
+        if mechanism == "PLAIN":
+            if not initial:
+                self.reply("334 ")
+                self.rfile.readline()
+        elif mechanism == "LOGIN":
+            if not initial:
+                self.reply("334 VXNlcm5hbWU6")  # "Username:"
+                self.rfile.readline()
+            self.reply("334 UGFzc3dvcmQ6")  # "Password:"
+            self.rfile.readline()
+        else:
+            self.reply("504 Unrecognized authentication type")
+            return
+        self.reply("235 Authentication successful")
+
+    def _data(self) -> None:
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            # Dot-Stuffing rückgängig machen
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        raw = b"".join(lines)
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.stats.add_message(len(raw))
+        self.server.store(raw, "smtp")
+        self.reply("250 OK queued")
+
+
+def _mailbox_name(args: bytes) -> str:
+    """Erstes Argument nach APPEND: "quoted" oder Atom."""
+    args = args.lstrip()
+    if args.startswith(b'"'):
+        end = args.index(b'"', 1)
+        return args[1:end].decode("utf-8", "replace")
+    return args.split(b" ", 1)[0].decode("utf-8", "replace")
+
+
+class _ImapHandler(_Handler):
+    CAPABILITIES = "IMAP4rev1 MULTIAPPEND AUTH=PLAIN"
+
+    def session(self) -> None:
+        self.reply(f"* OK [CAPABILITY {self.CAPABILITIES}] {HOSTNAME} IMAP Sandbox")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.rstrip(b"\r\n").partition(b" ")
+            command, _, args = rest.partition(b" ")
+            tag = tag.decode("ascii", "replace")
+            command = command.upper().decode("ascii", "replace")
+
+            if command == "CAPABILITY":
+                self.reply(f"* CAPABILITY {self.CAPABILITIES}")
+                self.reply(f"{tag} OK CAPABILITY completed")
+            elif command in ("LOGIN", "NOOP", "CREATE", "SUBSCRIBE"):
+                self.reply(f"{tag} OK {command} completed")
+            elif command == "SELECT":
+                self.reply("* 0 EXISTS")
+                self.reply(f"{tag} OK [READ-WRITE] SELECT completed")
+            elif command == "APPEND":
+                self._append(tag, args)
+            elif command == "LOGOUT":
+                self.reply("* BYE Logging out")
+                self.reply(f"{tag} OK LOGOUT completed")
+                return
+            else:
+                self.reply(f"{tag} BAD Command not supported")
+
+    def _append(self, tag: str, args: bytes) -> None:
+        """APPEND mit einem oder mehreren Literalen (MULTIAPPEND, RFC 3502)."""
+        mailbox = _mailbox_name(args)
+        current = args
+        count = 0
+        while True:
+            m = _LITERAL_RE.search(current)
+            if not m:
+                break
+            self.reply("+ Ready for literal data")
+            raw = self.rfile.read(int(m.group(1)))
+            if self.server.delay:
+                time.sleep(self.server.delay)
+            self.server.stats.add_message(len(raw), mailbox)
+            self.server.store(raw, "imap/" + re.sub(r"[^\w.-]+", "_", mailbox))
+            count += 1
+            # Rest der Zeile: leer = Ende, sonst Flags/Datum/Literal der nächsten Nachricht
+            current = self.rfile.readline().rstrip(b"\r\n")
+            if not current:
+                break
+
+        if count:
+            self.reply(f"{tag} OK APPEND completed ({count})")
+        else:
+            self.reply(f"{tag} BAD APPEND without literal")
+
+
+class MailSandbox:
+    """
+    SMTP-Sink und IMAP-Ablage auf localhost. Port 0 = freien Port wählen.
+    delay simuliert Serverlatenz pro Nachricht (Sekunden).
+    store_dir: angenommene Mails zusätzlich als .eml ablegen.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", smtp_port: int = 0, imap_port: int = 0,
+                 delay: float = 0.0, store_dir: Path | None = None):
+        self.host = host
+        self.smtp = SandboxStats()
+        self.imap = SandboxStats()
+        self._servers = [
+            _SandboxServer((host, smtp_port), _SmtpHandler, self.smtp, store_dir, delay),
+            _SandboxServer((host, imap_port), _ImapHandler, self.imap, store_dir, delay),
+        ]
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def smtp_port(self) -> int:
+        return self._servers[0].server_address[1]
+
+    @property
+    def imap_port(self) -> int:
+        return self._servers[1].server_address[1]
+
+    def config(self) -> dict:
+        """App-Konfiguration, die auf die Sandbox zeigt."""
+        return {
+            "MAIL_SERVER": self.host,
+            "MAIL_PORT": self.smtp_port,
+            "MAIL_IMAP_SERVER": self.host,
+            "MAIL_IMAP_PORT": self.imap_port,
+            "MAIL_USE_SSL": False,
+            "MAIL_USE_TLS": False,
+            "MAIL_USERNAME": "sandbox@localhost",
+            "MAIL_PASSWORD": "sandbox",
+            "MAIL_DEFAULT_SENDER": "sandbox@localhost",
+        }
+
+    def stats(self) -> dict:
+        return {"smtp": self.smtp.as_dict(), "imap": self.imap.as_dict()}
+
+    def start(self) -> "MailSandbox":
+        for server in self._servers:
+            t = threading.Thread(target=server.serve_forever, name=f"mail-sandbox-{server.server_address[1]}",
+                                 daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info("MailSandbox: SMTP %s:%s, IMAP %s:%s", self.host, self.smtp_port, self.host, self.imap_port)
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            if self._threads:
+                server.shutdown()
+            server.server_close()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads.clear()
+
+    def __enter__(self) -> "MailSandbox":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,171 @@
+# lsb_app/services/mail_transport.py
+"""
+SMTP-Transport mit wiederverwendeter Verbindung.
+
+Eine SmtpTransport-Instanz hält eine angemeldete SMTP-Verbindung für
+einen ganzen Versandlauf offen (ein TLS-Handshake, ein AUTH), baut sie nach
+MAIL_MAX_MESSAGES_PER_CONNECTION Nachrichten neu auf und verbindet sich bei
+Verbindungsabbrüchen bzw. temporären 4xx-Fehlern einmal neu und versucht
+die Nachricht erneut.
+
+MAIL_USE_SSL=1 (Standard): implizites TLS (SMTP_SSL/IMAP4_SSL, Port 465/993).
+MAIL_USE_SSL=0: Klartext-Verbindung, mit MAIL_USE_TLS=1 per STARTTLS
+verschlüsselt (z. B. Port 587), sonst unverschlüsselt (nur für die lokale
+Mail-Sandbox).
+
+    with SmtpTransport(MailSettings.from_config(current_app.config)) as smtp:
+        for msg in nachrichten:
+            smtp.send(msg)
+"""
+from __future__ import annotations
+
+import logging
+import smtplib
+import socket
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Mapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MESSAGES_PER_CONNECTION = 50
+DEFAULT_TIMEOUT = 30
+
+# Fehler, nach denen sich ein neuer Verbindungsversuch lohnt. Kein OSError:
+# smtplib.SMTPException erbt davon, dauerhafte SMTP-Fehler (z. B.
+# SMTPNotSupportedError) würden sonst als Verbindungsabbruch wiederholt.
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, socket.timeout)
+
+
+@dataclass(frozen=True)
+class MailSettings:
+    username: str
+    password: str
+    smtp_server: str
+    smtp_port: int
+    imap_server: str
+    imap_port: int = 993
+    max_messages_per_connection: int = DEFAULT_MAX_MESSAGES_PER_CONNECTION
+    timeout: int = DEFAULT_TIMEOUT
+    use_ssl: bool = True
+    starttls: bool = False
+
+    @classmethod
+    def from_config(cls, cfg: Mapping) -> "MailSettings":
+        settings = cls(
+            username=cfg.get("MAIL_USERNAME") or "",
+            password=cfg.get("MAIL_PASSWORD") or "",
+            smtp_server=cfg.get("MAIL_SERVER", "smtp.mail.de") or "",
+            smtp_port=int(cfg.get("MAIL_PORT", 465)),  # SSL-Port (z. B. 465)
+            imap_server=cfg.get("MAIL_IMAP_SERVER", cfg.get("IMAP_SERVER", "imap.mail.de")) or "",
+            imap_port=int(cfg.get("MAIL_IMAP_PORT", 993)),
+            max_messages_per_connection=int(
+                cfg.get("MAIL_MAX_MESSAGES_PER_CONNECTION", DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+            ),
+            timeout=int(cfg.get("MAIL_TIMEOUT", DEFAULT_TIMEOUT)),
+            use_ssl=bool(cfg.get("MAIL_USE_SSL", True)),
+            starttls=not cfg.get("MAIL_USE_SSL", True) and bool(cfg.get("MAIL_USE_TLS", False)),
+        )
+        if not all([settings.username, settings.password, settings.smtp_server,
+                    settings.smtp_port, settings.imap_server]):
+            logger.error("Mail-Konfiguration unvollständig, Versand abgebrochen.")
+            raise RuntimeError("Mail-Konfiguration ist unvollständig.")
+        return settings
+
+
+def _is_temporary(exc: smtplib.SMTPResponseException) -> bool:
+    """4xx = temporär (z. B. 421 'too many messages', 451)."""
+    return 400 <= getattr(exc, "smtp_code", 0) < 500
+
+
+class SmtpTransport:
+    def __init__(self, settings: MailSettings):
+        self.settings = settings
+        self._smtp: smtplib.SMTP | None = None
+        self._sent_on_connection = 0
+
+        # Statistik für Logs
+        self.connections = 0
+        self.messages = 0
+        self.connect_seconds = 0.0
+
+    # --- Verbindung ---
+
+    def _connect(self) -> smtplib.SMTP:
+        t0 = time.perf_counter()
+        smtp_cls = smtplib.SMTP_SSL if self.settings.use_ssl else smtplib.SMTP
+        smtp = smtp_cls(self.settings.smtp_server, self.settings.smtp_port,
+                        timeout=self.settings.timeout)
+        try:
+            if self.settings.starttls:
+                smtp.starttls()
+            smtp.login(self.settings.username, self.settings.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connect_seconds += time.perf_counter() - t0
+        self.connections += 1
+        self._sent_on_connection = 0
+        logger.debug("SmtpTransport: Verbindung %s zu %s aufgebaut", self.connections, self.settings.smtp_server)
+        return smtp
+
+    def _disconnect(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _connection(self) -> smtplib.SMTP:
+        limit = self.settings.max_messages_per_connection
+        if self._smtp is not None and limit > 0 and self._sent_on_connection >= limit:
+            logger.debug("SmtpTransport: Nachrichtenlimit pro Verbindung (%s) erreicht, neu verbinden", limit)
+            self._disconnect()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    # --- Versand ---
+
+    def send(self, msg: EmailMessage) -> None:
+        """Sendet msg; bei Verbindungsfehler/4xx einmal neu verbinden und wiederholen."""
+        for attempt in (1, 2):
+            smtp = self._connection()
+            try:
+                smtp.send_message(msg)
+            except smtplib.SMTPResponseException as exc:
+                self._disconnect()
+                if attempt == 1 and _is_temporary(exc):
+                    logger.warning("SmtpTransport: temporärer Fehler %s (%s), neuer Versuch",
+                                   exc.smtp_code, exc.smtp_error)
+                    continue
+                raise
+            except smtplib.SMTPRecipientsRefused:
+                # Verbindung ist weiter nutzbar, nur dieser Empfänger nicht
+                raise
+            except _RECONNECT_ERRORS as exc:
+                self._disconnect()
+                if attempt == 1:
+                    logger.warning("SmtpTransport: Verbindung verloren (%s), neuer Versuch", exc)
+                    continue
+                raise
+            self._sent_on_connection += 1
+            self.messages += 1
+            return
+
+    def close(self) -> None:
+        self._disconnect()
+        if self.messages or self.connections:
+            logger.info(
+                "SmtpTransport: %s Nachricht(en) über %s Verbindung(en), Verbindungsaufbau %.2fs",
+                self.messages, self.connections, self.connect_seconds,
+            )
+
+    def __enter__(self) -> "SmtpTransport":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
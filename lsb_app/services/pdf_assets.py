@@ -0,0 +1,144 @@
+# lsb_app/services/pdf_assets.py
+"""
+Lokaler url_fetcher für WeasyPrint.
+
+Statt /static/... per HTTP von der eigenen App zu holen (Loopback-Request,
+Deadlock-Gefahr bei single-threaded Server), werden App-Static-Dateien und
+Instance-Assets direkt von der Platte gelesen und in einem prozessweiten
+LRU-Byte-Cache gehalten. Funktioniert ohne Request-Kontext (CLI, Worker).
+"""
+from __future__ import annotations
+
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from flask import current_app
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+logger = logging.getLogger(__name__)
+
+# Basis-URL für alle PDF-Renderings. Der Host wird nie aufgelöst,
+# er markiert nur Ressourcen, die lokal bedient werden.
+PDF_ASSET_HOST = "lsb-app.local"
+PDF_BASE_URL = f"http://{PDF_ASSET_HOST}/"
+
+STATIC_PREFIX = "/static/"
+ASSETS_PREFIX = "/assets/"  # -> instance/assets/
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class _ByteLRU:
+    """Threadsicherer LRU-Cache, begrenzt über die Gesamtgröße in Bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[tuple[str, int], bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, int]) -> bytes | None:
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+            return data
+
+    def put(self, key: tuple[str, int], data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_byte_cache = _ByteLRU(DEFAULT_CACHE_BYTES)
+
+
+def _read_bytes(path: Path) -> bytes:
+    # mtime im Key: geänderte Dateien werden automatisch neu gelesen
+    key = (str(path), path.stat().st_mtime_ns)
+    data = _byte_cache.get(key)
+    if data is None:
+        data = path.read_bytes()
+        _byte_cache.put(key, data)
+    return data
+
+
+class LocalAssetFetcher(URLFetcher):
+    """
+    Bedient http://lsb-app.local/static/... aus static_dir und
+    http://lsb-app.local/assets/... aus assets_dir (instance/assets).
+    Alle anderen URLs gehen an den Standard-Fetcher von WeasyPrint.
+    """
+
+    def __init__(self, static_dir: str, assets_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.static_dir = Path(static_dir).resolve()
+        self.assets_dir = Path(assets_dir).resolve()
+
+    def resolve(self, url: str) -> Path | None:
+        parts = urlsplit(url)
+        if parts.netloc != PDF_ASSET_HOST:
+            return None
+
+        path = unquote(parts.path)
+        if path.startswith(STATIC_PREFIX):
+            root, rel = self.static_dir, path[len(STATIC_PREFIX):]
+        elif path.startswith(ASSETS_PREFIX):
+            root, rel = self.assets_dir, path[len(ASSETS_PREFIX):]
+        else:
+            return None
+
+        candidate = (root / rel).resolve()
+        # kein Ausbrechen per ../
+        if not candidate.is_relative_to(root):
+            logger.warning("LocalAssetFetcher: Pfad außerhalb von %s abgelehnt: %s", root, url)
+            return None
+        return candidate
+
+    def fetch(self, url, headers=None):
+        path = self.resolve(url)
+        if path is None:
+            if urlsplit(url).netloc == PDF_ASSET_HOST:
+                raise ValueError(f"Unbekannte lokale Ressource: {url}")
+            return super().fetch(url, headers)
+
+        if not path.is_file():
+            raise FileNotFoundError(f"Lokale Ressource nicht gefunden: {path}")
+
+        mime_type, _ = mimetypes.guess_type(path.name)
+        return URLFetcherResponse(
+            url,
+            body=_read_bytes(path),
+            headers={"Content-Type": mime_type or "application/octet-stream"},
+        )
+
+
+@lru_cache(maxsize=8)
+def get_asset_fetcher(static_dir: str, assets_dir: str) -> LocalAssetFetcher:
+    """Ein Fetcher pro Prozess und Verzeichnispaar (auch in Render-Workern)."""
+    return LocalAssetFetcher(static_dir, assets_dir)
+
+
+def asset_dirs() -> tuple[str, str]:
+    """(static_dir, assets_dir) der laufenden App – picklebar für Worker-Prozesse."""
+    return (
+        current_app.static_folder,
+        str(Path(current_app.instance_path) / "assets"),
+    )
+
+
+def app_asset_fetcher() -> LocalAssetFetcher:
+    return get_asset_fetcher(*asset_dirs())
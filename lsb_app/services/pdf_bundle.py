@@ -0,0 +1,155 @@
+# lsb_app/services/pdf_bundle.py
+"""
+Sammeldruck in einem Durchlauf.
+
+Alle Dokumente eines Postversands (Anschreiben + Rechnungen) werden zu einem
+HTML zusammengesetzt – jedes Dokument als <article id="doc-N"> mit
+Seitenumbruch davor – und von WeasyPrint einmal gelayoutet. Das Sammel-PDF
+wird aus allen Seiten geschrieben, die Einzel-PDFs fürs Archiv aus den
+Seitenbereichen der Dokumente (Document.copy), ohne erneutes Layout. Die
+Einzel-PDFs bekommen dabei den Titel ihres eigenen Dokuments statt
+"Postversand" – sie landen im pdf_cache und müssen dort einem einzeln
+gerenderten PDF entsprechen.
+"""
+from __future__ import annotations
+
+import copy
+import html
+import logging
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from weasyprint import HTML
+
+from lsb_app.services.pdf_assets import PDF_BASE_URL, app_asset_fetcher
+from lsb_app.services.pdf_cache import get_pdf_cache
+from lsb_app.services.pdf_styles import RECHNUNG_CSS, get_font_config, get_stylesheet
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_CSS = "bundle"
+
+DOC_RECHNUNG = "rechnung"
+DOC_ANSCHREIBEN = "anschreiben"
+
+_BODY_RE = re.compile(r"<body[^>]*>(.*)</body>", re.S | re.I)
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.S | re.I)
+
+
+@dataclass(frozen=True)
+class BundleDoc:
+    """Ein Dokument im Sammeldruck (HTML aus dem Template mit pdf=True)."""
+    kind: str
+    html: str
+    out_path: Path | None = None   # Einzel-PDF fürs Archiv
+    cache_key: str | None = None   # nur Rechnungen: Schlüssel im pdf_cache
+
+
+@dataclass(frozen=True)
+class BundleResult:
+    path: Path
+    # (erste Seite, Seitenzahl) je Dokument, gleiche Reihenfolge wie docs
+    page_ranges: list[tuple[int, int]]
+    seconds: float
+
+    @property
+    def page_count(self) -> int:
+        return sum(n for _, n in self.page_ranges)
+
+
+def _body(html_str: str) -> str:
+    m = _BODY_RE.search(html_str)
+    return m.group(1) if m else html_str
+
+
+def _title(html_str: str) -> str | None:
+    m = _TITLE_RE.search(html_str)
+    return html.unescape(m.group(1).strip()) if m else None
+
+
+def _slice(document, doc: BundleDoc, start: int, count: int):
+    """Seiten eines Dokuments als eigenes Document, mit dessen Titel."""
+    part = document.copy(document.pages[start:start + count])
+    # copy() teilt die Metadaten des Sammel-PDFs
+    part.metadata = copy.copy(document.metadata)
+    part.metadata.title = _title(doc.html)
+    return part
+
+
+def combine_html(docs: Sequence[BundleDoc]) -> str:
+    articles = "\n".join(
+        f'<article class="pdf-dokument pdf-{doc.kind}" id="doc-{i}">{_body(doc.html)}</article>'
+        for i, doc in enumerate(docs)
+    )
+    return (
+        '<!DOCTYPE html><html lang="de"><head><meta charset="UTF-8">'
+        f"<title>Postversand</title></head><body>\n{articles}\n</body></html>"
+    )
+
+
+def _page_ranges(pages, n_docs: int) -> list[tuple[int, int]]:
+    """Startseite je Dokument über die Anker doc-N, Ende = Start des nächsten."""
+    starts: dict[int, int] = {}
+    for page_no, page in enumerate(pages):
+        for anchor in page.anchors:
+            if anchor.startswith("doc-"):
+                starts.setdefault(int(anchor[4:]), page_no)
+
+    missing = [i for i in range(n_docs) if i not in starts]
+    if missing:
+        raise RuntimeError(f"Sammeldruck: Dokumente ohne Seitenanker: {missing}")
+
+    ranges = []
+    for i in range(n_docs):
+        end = starts[i + 1] if i + 1 < n_docs else len(pages)
+        ranges.append((starts[i], end - starts[i]))
+    return ranges
+
+
+def render_bundle(docs: Sequence[BundleDoc], bundle_path: Path) -> BundleResult:
+    """
+    Layoutet alle docs in einem Durchlauf, schreibt das Sammel-PDF nach
+    bundle_path und jedes Dokument mit out_path als Einzel-PDF.
+    Neu gerenderte Rechnungen landen zusätzlich im pdf_cache.
+    """
+    if not docs:
+        raise ValueError("render_bundle: keine Dokumente")
+
+    t0 = time.perf_counter()
+    font_config = get_font_config()
+    document = HTML(
+        string=combine_html(docs),
+        base_url=PDF_BASE_URL,
+        url_fetcher=app_asset_fetcher(),
+    ).render(
+        stylesheets=[get_stylesheet(RECHNUNG_CSS), get_stylesheet(BUNDLE_CSS)],
+        font_config=font_config,
+    )
+    ranges = _page_ranges(document.pages, len(docs))
+
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+    document.write_pdf(str(bundle_path))
+
+    cache = get_pdf_cache()
+    per_doc_seconds = (time.perf_counter() - t0) / len(docs)
+
+    for doc, (start, count) in zip(docs, ranges):
+        if doc.out_path is None:
+            continue
+        doc.out_path.parent.mkdir(parents=True, exist_ok=True)
+        _slice(document, doc, start, count).write_pdf(str(doc.out_path))
+        if cache is not None and doc.cache_key:
+            try:
+                cache.put_file(doc.cache_key, doc.out_path, render_seconds=per_doc_seconds)
+            except OSError:
+                logger.exception("render_bundle: Cache-Ablage fehlgeschlagen für %s", doc.out_path)
+
+    seconds = time.perf_counter() - t0
+    logger.info(
+        "render_bundle: %s Dokumente, %s Seiten in %.2fs -> %s",
+        len(docs), len(document.pages), seconds, bundle_path,
+    )
+    return BundleResult(path=bundle_path, page_ranges=ranges, seconds=seconds)
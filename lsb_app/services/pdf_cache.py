@@ -0,0 +1,183 @@
+# lsb_app/services/pdf_cache.py
+"""
+Inhaltsadressierter Cache für Rechnungs-PDFs.
+
+Schlüssel = sha256(Template-Version + kanonisches JSON des RechnungVM).
+Gleiches ViewModel + gleiches Template/CSS -> gleiches PDF, es wird nicht neu
+gerendert. Jede Änderung an einem Rechnungsfeld (Anschrift, Leistungen,
+Datum, Firmendaten, ...) ergibt einen neuen Schlüssel.
+
+Ablage: instance/pdf_cache/<ab>/<schlüssel>.pdf
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from pathlib import Path
+
+from flask import current_app
+
+from lsb_app.services.pdf_styles import PDF_CSS_DIR, RECHNUNG_CSS
+from lsb_app.viewmodels.rechnung_vm import RechnungVM
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+# Dateien, deren Inhalt das Rechnungs-PDF beeinflusst
+RECHNUNG_TEMPLATE_FILES = (
+    TEMPLATES_DIR / "rechnungen" / "standard.html",
+    PDF_CSS_DIR / f"{RECHNUNG_CSS}.css",
+)
+
+# Wird erhöht, wenn sich das Schlüsselformat ändert
+CACHE_KEY_VERSION = "1"
+
+
+def _json_default(val):
+    if isinstance(val, Enum):
+        return val.value
+    if isinstance(val, (date, datetime, time)):
+        return val.isoformat()
+    if isinstance(val, Decimal):
+        return str(val)
+    raise TypeError(f"Nicht serialisierbar: {type(val).__name__}")
+
+
+def canonical_vm_json(vm: RechnungVM) -> str:
+    """Stabile JSON-Darstellung (sortierte Keys, Enums/Daten als Strings)."""
+    data = dataclasses.asdict(vm)
+    data["config"] = dict(vm.config)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+_template_version_lock = threading.Lock()
+_template_version_cache: dict[tuple, str] = {}
+
+
+def template_version(files=RECHNUNG_TEMPLATE_FILES) -> str:
+    """
+    Hash über Template + CSS. Pro (Pfad, mtime) nur einmal gelesen,
+    geänderte Dateien ergeben automatisch eine neue Version.
+    """
+    stamp = tuple((str(p), p.stat().st_mtime_ns) for p in files)
+    with _template_version_lock:
+        version = _template_version_cache.get(stamp)
+        if version is None:
+            h = hashlib.sha256()
+            for p in files:
+                h.update(p.name.encode())
+                h.update(p.read_bytes())
+            version = h.hexdigest()[:16]
+            _template_version_cache.clear()
+            _template_version_cache[stamp] = version
+    return version
+
+
+def rechnung_cache_key(vm: RechnungVM) -> str:
+    h = hashlib.sha256()
+    h.update(CACHE_KEY_VERSION.encode())
+    h.update(template_version().encode())
+    h.update(canonical_vm_json(vm).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _CacheStats:
+    """Prozessweite Zähler (Treffer, Fehlschläge, eingesparte Renderzeit)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.render_seconds = 0.0
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def stored(self, render_seconds: float) -> None:
+        with self._lock:
+            self.stores += 1
+            self.render_seconds += render_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.render_seconds / self.stores if self.stores else 0.0
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "avg_render_ms": round(avg * 1000, 1),
+                # Schätzung: jeder Treffer spart ein durchschnittliches Rendering
+                "saved_render_s": round(self.hits * avg, 2),
+            }
+
+
+stats = _CacheStats()
+
+
+class PdfCache:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pdf"
+
+    def get(self, key: str) -> Path | None:
+        path = self.path_for(key)
+        if path.is_file():
+            stats.hit()
+            logger.debug("pdf_cache: Treffer %s", key[:12])
+            return path
+        stats.miss()
+        return None
+
+    def put_file(self, key: str, src: Path, render_seconds: float = 0.0) -> Path:
+        """Kopiert ein fertiges PDF atomar in den Cache (tmp + os.replace)."""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, path)
+        except Exception:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        stats.stored(render_seconds)
+        return path
+
+    def copy_to(self, key: str, out_path: Path) -> Path | None:
+        """Cache-Treffer an out_path ablegen; None bei Fehlschlag."""
+        cached = self.get(key)
+        if cached is None:
+            return None
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        return out_path
+
+
+def get_pdf_cache() -> PdfCache | None:
+    """Cache der laufenden App, None wenn per PDF_CACHE_ENABLED abgeschaltet."""
+    if not current_app.config.get("PDF_CACHE_ENABLED", True):
+        return None
+    return PdfCache(Path(current_app.instance_path) / "pdf_cache")
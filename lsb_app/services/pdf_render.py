@@ -0,0 +1,201 @@
+# lsb_app/services/pdf_render.py
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Callable, Sequence
+
+from flask import current_app, render_template
+from weasyprint import HTML
+
+from lsb_app.services.pdf_assets import PDF_BASE_URL, asset_dirs, get_asset_fetcher
+from lsb_app.services.pdf_cache import get_pdf_cache, rechnung_cache_key, stats as cache_stats
+from lsb_app.services.pdf_styles import RECHNUNG_CSS, pdf_style_kwargs
+from lsb_app.viewmodels.rechnung_vm import RechnungVM
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PdfJob:
+    """Ein Rechnungs-PDF, das gerendert und unter out_path gespeichert werden soll."""
+    vm: RechnungVM
+    out_path: Path
+
+
+@dataclass(frozen=True)
+class PdfResult:
+    job: PdfJob
+    path: Path | None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def rechnung_pdf_path(auftragsnummer: int, version: int, rechnungsdatum: date | None) -> Path:
+    """Ablageort instance/invoices/YYYY/MM/Rechnung_<nr>_v<version>.pdf"""
+    rechnungsdatum = rechnungsdatum or date.today()
+    save_dir = (
+        Path(current_app.instance_path)
+        / "invoices"
+        / str(rechnungsdatum.year)
+        / f"{rechnungsdatum.month:02d}"
+    )
+    return save_dir / f"Rechnung_{auftragsnummer}_v{version}.pdf"
+
+
+def _render_to_file(html_str: str, dirs: tuple[str, str], out_path: str) -> tuple[str, float]:
+    """
+    Läuft im Worker-Prozess: HTML -> PDF -> Datei. Kein App-Kontext nötig.
+    Gibt (out_path, Renderdauer in Sekunden) zurück.
+    """
+    t0 = time.perf_counter()
+    pdf_bytes = HTML(
+        string=html_str,
+        base_url=PDF_BASE_URL,
+        url_fetcher=get_asset_fetcher(*dirs),
+    ).write_pdf(**pdf_style_kwargs(RECHNUNG_CSS))
+
+    path = Path(out_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(pdf_bytes)
+    return out_path, time.perf_counter() - t0
+
+
+def render_worker_count(n_jobs: int) -> int:
+    """PDF_RENDER_WORKERS aus der Config, 0 = alle Kerne. Nie mehr Worker als Jobs."""
+    configured = int(current_app.config.get("PDF_RENDER_WORKERS") or 0)
+    workers = configured if configured > 0 else (os.cpu_count() or 1)
+    return max(1, min(workers, n_jobs))
+
+
+def render_rechnung_pdfs(
+    jobs: Sequence[PdfJob],
+    workers: int | None = None,
+    on_result: Callable[[PdfResult], None] | None = None,
+) -> list[PdfResult]:
+    """
+    Rendert mehrere Rechnungs-PDFs parallel in einem Process-Pool.
+
+    - Das HTML wird im aufrufenden Prozess gerendert (Jinja + App-Kontext),
+      nur das teure write_pdf() läuft in den Worker-Prozessen.
+    - Bereits gerenderte ViewModels kommen aus dem pdf_cache und werden nur
+      nach out_path kopiert; neu gerenderte PDFs landen danach im Cache.
+    - Rückgabe in derselben Reihenfolge wie jobs; Fehler einzelner PDFs
+      landen in PdfResult.error, der Rest läuft weiter.
+    - on_result wird für jedes fertige PDF sofort aufgerufen (Fortschritt).
+    """
+    if not jobs:
+        return []
+
+    results: list[PdfResult | None] = [None] * len(jobs)
+
+    def _set(i: int, result: PdfResult) -> None:
+        results[i] = result
+        if on_result is not None:
+            try:
+                on_result(result)
+            except Exception:
+                logger.exception("render_rechnung_pdfs: on_result fehlgeschlagen")
+
+    # Cache-Treffer direkt kopieren, nur der Rest wird gerendert
+    cache = get_pdf_cache()
+    keys: list[str | None] = [None] * len(jobs)
+    todo: list[int] = []
+    for i, job in enumerate(jobs):
+        if cache is not None:
+            keys[i] = rechnung_cache_key(job.vm)
+            try:
+                if cache.copy_to(keys[i], job.out_path) is not None:
+                    _set(i, PdfResult(job=job, path=job.out_path))
+                    continue
+            except OSError:
+                logger.exception("render_rechnung_pdfs: Cache-Kopie fehlgeschlagen für %s", job.out_path)
+        todo.append(i)
+
+    if not todo:
+        logger.info("render_rechnung_pdfs: alle %s PDFs aus dem Cache", len(jobs))
+        return results
+
+    dirs = asset_dirs()
+    html_strs = {i: render_template("rechnungen/standard.html", vm=jobs[i].vm, pdf=True) for i in todo}
+
+    n_workers = workers if workers is not None else render_worker_count(len(todo))
+
+    logger.info(
+        "render_rechnung_pdfs: %s PDFs (%s aus dem Cache) mit %s Worker(n)",
+        len(todo), len(jobs) - len(todo), n_workers,
+    )
+
+    def _done(i: int, out_path: str, seconds: float) -> None:
+        job = jobs[i]
+        if cache is not None:
+            try:
+                cache.put_file(keys[i], job.out_path, render_seconds=seconds)
+            except OSError:
+                logger.exception("render_rechnung_pdfs: Cache-Ablage fehlgeschlagen für %s", job.out_path)
+        _set(i, PdfResult(job=job, path=Path(out_path)))
+
+    # Einzelnes PDF oder 1 Worker: kein Pool-Overhead
+    if n_workers <= 1:
+        for i in todo:
+            job = jobs[i]
+            try:
+                _done(i, *_render_to_file(html_strs[i], dirs, str(job.out_path)))
+            except Exception as exc:
+                logger.exception("render_rechnung_pdfs: Fehler bei %s", job.out_path)
+                _set(i, PdfResult(job=job, path=None, error=str(exc)))
+        logger.info("render_rechnung_pdfs: pdf_cache %s", cache_stats.snapshot())
+        return results
+
+    mp_context = multiprocessing.get_context(
+        current_app.config.get("PDF_RENDER_START_METHOD", "spawn")
+    )
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as pool:
+        futures = {
+            pool.submit(_render_to_file, html_strs[i], dirs, str(jobs[i].out_path)): i
+            for i in todo
+        }
+        for fut in as_completed(futures):
+            i = futures[fut]
+            job = jobs[i]
+            try:
+                _done(i, *fut.result())
+            except Exception as exc:
+                logger.exception("render_rechnung_pdfs: Fehler bei %s", job.out_path)
+                _set(i, PdfResult(job=job, path=None, error=str(exc)))
+
+    logger.info("render_rechnung_pdfs: pdf_cache %s", cache_stats.snapshot())
+    return results
+
+
+def cached_rechnung_pdf(vm: RechnungVM) -> Path | None:
+    """
+    Pfad des Rechnungs-PDFs im pdf_cache; gerendert wird nur bei einem
+    Fehlschlag, direkt in den Cache. None, wenn der Cache abgeschaltet ist.
+    """
+    cache = get_pdf_cache()
+    if cache is None:
+        return None
+
+    key = rechnung_cache_key(vm)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    html_str = render_template("rechnungen/standard.html", vm=vm, pdf=True)
+    tmp_path = cache.path_for(key).with_suffix(f".{os.getpid()}.render")
+    try:
+        _, seconds = _render_to_file(html_str, asset_dirs(), str(tmp_path))
+        return cache.put_file(key, tmp_path, render_seconds=seconds)
+    finally:
+        tmp_path.unlink(missing_ok=True)
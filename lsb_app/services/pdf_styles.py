@@ -0,0 +1,38 @@
+# lsb_app/services/pdf_styles.py
+"""
+Vorkompilierte Stylesheets für Rechnung und Anschreiben.
+
+Das CSS liegt in static/css/pdf/ und wird pro Prozess genau einmal zu
+weasyprint.CSS kompiliert. Eine gemeinsame FontConfiguration sorgt dafür,
+dass die Schriftsuche (fontconfig) nicht bei jedem PDF neu läuft.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+
+from weasyprint import CSS
+from weasyprint.text.fonts import FontConfiguration
+
+PDF_CSS_DIR = Path(__file__).resolve().parent.parent / "static" / "css" / "pdf"
+
+RECHNUNG_CSS = "rechnung"
+ANSCHREIBEN_CSS = "anschreiben"
+
+
+@lru_cache(maxsize=1)
+def get_font_config() -> FontConfiguration:
+    return FontConfiguration()
+
+
+@lru_cache(maxsize=None)
+def get_stylesheet(name: str) -> CSS:
+    return CSS(filename=str(PDF_CSS_DIR / f"{name}.css"), font_config=get_font_config())
+
+
+def pdf_style_kwargs(name: str) -> dict:
+    """Keyword-Argumente für write_pdf(): kompiliertes Stylesheet + geteilte Fonts."""
+    return {
+        "stylesheets": [get_stylesheet(name)],
+        "font_config": get_font_config(),
+    }
@@ -0,0 +1,110 @@
+# lsb_app/services/rate_limit.py
+"""
+Token-Bucket für Provider-Limits (z. B. Mails pro Minute).
+
+Thread-sicher; acquire() blockiert, bis ein Token frei ist. Ein Bucket mit
+rate_per_minute <= 0 ist unbegrenzt.
+
+SharedTokenBucket hält den Zustand in einer Datei (flock) und gilt damit
+für alle Prozesse auf dem Rechner, z. B. mehrere Gunicorn-Worker, die sich
+das Nominatim-Limit teilen.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: nur prozesslokal
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0  # Tokens pro Sekunde
+        # Standard: höchstens ~1 Sekunde Burst, mindestens 1 Token
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _take(self, tokens: float) -> float:
+        """Nimmt die Tokens (0.0) oder liefert die Wartezeit, bis genug da sind."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        """Wartet auf `tokens` Tokens; False, wenn timeout vorher abläuft."""
+        if self.unlimited:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket, dessen Füllstand in `path` liegt ("tokens zeitpunkt")."""
+
+    def __init__(self, path: str | Path, rate_per_minute: float, capacity: float | None = None):
+        super().__init__(rate_per_minute, capacity)
+        self.path = Path(path)
+        if fcntl is None:
+            logger.warning("SharedTokenBucket: kein fcntl, Limit %s gilt nur pro Prozess", self.path)
+
+    def _take(self, tokens: float) -> float:
+        if fcntl is None:
+            return super()._take(tokens)
+
+        with self._lock, open(self.path, "a+", encoding="ascii") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                fh.seek(0)
+                # Wanduhr statt monotonic: muss über Prozesse hinweg vergleichbar sein
+                now = time.time()
+                try:
+                    available, last = (float(x) for x in fh.read().split())
+                except ValueError:
+                    available, last = self.capacity, now
+                available = min(self.capacity, available + max(0.0, now - last) * self.rate)
+
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - available) / self.rate
+
+                fh.seek(0)
+                fh.truncate()
+                fh.write(f"{available!r} {now!r}\n")
+                fh.flush()
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+        return wait
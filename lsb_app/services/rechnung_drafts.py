@@ -0,0 +1,239 @@
+# lsb_app/services/rechnung_drafts.py
+"""
+Vorab-Rendering von Rechnungsentwürfen.
+
+Sobald ein Auftrag (nach Commit) im Status READY ist, baut ein
+Hintergrund-Thread das RechnungVM und rendert
+das PDF in den pdf_cache. Beim Batch-Versand muss dann nur noch die Version
+vergeben und das PDF aus dem Cache kopiert werden.
+
+Invalidierung:
+- SQLAlchemy-Events merken sich beim Flush alle Aufträge, deren Daten
+  (Auftrag, Patient, Adressen, Angehörige, Behörden, Bestattungsinstitut)
+  sich geändert haben; nach dem Commit wird der Entwurf verworfen und
+  neu angestoßen.
+- Ein Entwurf gilt nur für das Rechnungsdatum, an dem er gebaut wurde.
+- Das PDF selbst ist inhaltsadressiert: ein geändertes ViewModel trifft
+  nie ein altes PDF.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session
+
+from lsb_app.extensions import db
+from lsb_app.models import (Adresse, Angehoeriger, Auftrag, AuftragsStatusEnum, Behoerde,
+                            Bestattungsinstitut, Patient, auftrag_behoerde)
+from lsb_app.services.rechnung_vm_factory import EntfernungFehlt, build_rechnung_vm
+from lsb_app.viewmodels.rechnung_vm import RechnungVM
+
+logger = logging.getLogger(__name__)
+
+# Titel, mit dem Erstrechnungen gedruckt werden (siehe build_pdf_vm_for_rechnung)
+DRAFT_RECHNUNGSART = "RECHNUNG"
+
+_SESSION_KEY = "rechnung_drafts_dirty"
+_WORKER_KEY = "rechnung_drafts_worker"
+
+
+@dataclass(frozen=True)
+class Draft:
+    auftrag_id: int
+    rechnungsdatum: date
+    generation: int
+    vm: RechnungVM
+
+
+_lock = threading.Lock()
+_drafts: dict[int, Draft] = {}
+# wird bei jeder Änderung hochgezählt; ein Entwurf aus älterer Generation ist ungültig
+_generations: dict[int, int] = {}
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rechnung-draft")
+        return _executor
+
+
+def invalidate(auftrag_ids) -> None:
+    with _lock:
+        for aid in auftrag_ids:
+            _generations[aid] = _generations.get(aid, 0) + 1
+            _drafts.pop(aid, None)
+
+
+def get_draft_vm(auftrag: Auftrag, rechnungsdatum: date, rechnungsart: str) -> RechnungVM | None:
+    """Gültiger Entwurf für genau diesen Auftrag/Tag/Titel, sonst None."""
+    with _lock:
+        draft = _drafts.get(auftrag.id)
+        if draft is None or draft.generation != _generations.get(auftrag.id, 0):
+            return None
+    if draft.rechnungsdatum != rechnungsdatum or rechnungsart != DRAFT_RECHNUNGSART:
+        return None
+    return draft.vm
+
+
+def get_rechnung_vm(auftrag: Auftrag, rechnungsdatum: date, rechnungsart: str) -> RechnungVM:
+    """Entwurf verwenden, wenn vorhanden – sonst wie bisher build_rechnung_vm."""
+    vm = get_draft_vm(auftrag, rechnungsdatum, rechnungsart)
+    if vm is not None:
+        logger.debug("rechnung_drafts: Entwurf verwendet – auftrag_id=%s", auftrag.id)
+        return vm
+    return build_rechnung_vm(
+        auftrag=auftrag,
+        cfg=current_app.config,
+        rechnungsdatum=rechnungsdatum,
+        rechnungsart=rechnungsart,
+    )
+
+
+def schedule_prerender(auftrag_ids) -> None:
+    """Entwürfe für die Aufträge im Hintergrund (neu) bauen."""
+    if not has_app_context() or not current_app.config.get("RECHNUNG_PRERENDER"):
+        return
+    app = current_app._get_current_object()
+    executor = _get_executor()
+    for aid in auftrag_ids:
+        with _lock:
+            generation = _generations.get(aid, 0)
+        executor.submit(_prerender, app, aid, generation)
+
+
+def _prerender(app, auftrag_id: int, generation: int) -> None:
+    # lokaler Import: pdf_render importiert weasyprint erst, wenn gerendert wird
+    from lsb_app.services.pdf_render import cached_rechnung_pdf
+
+    with app.app_context():
+        # eigene Flushes sollen den Entwurf nicht invalidieren
+        db.session.info[_WORKER_KEY] = True
+        try:
+            auftrag = db.session.get(Auftrag, auftrag_id)
+            if auftrag is None or auftrag.status != AuftragsStatusEnum.READY:
+                return
+
+            rechnungsdatum = date.today()
+            vm = build_rechnung_vm(
+                auftrag=auftrag,
+                cfg=app.config,
+                rechnungsdatum=rechnungsdatum,
+                rechnungsart=DRAFT_RECHNUNGSART,
+            )
+            cached_rechnung_pdf(vm)
+
+            with _lock:
+                if _generations.get(auftrag_id, 0) != generation:
+                    logger.debug("rechnung_drafts: Entwurf veraltet, verworfen – auftrag_id=%s", auftrag_id)
+                    return
+                _drafts[auftrag_id] = Draft(auftrag_id, rechnungsdatum, generation, vm)
+            logger.info("rechnung_drafts: Entwurf vorbereitet – auftrag_id=%s", auftrag_id)
+        except EntfernungFehlt:
+            # lokaler Import: distances importiert dieses Modul; der Backfill
+            # stößt den Entwurf danach erneut an
+            from lsb_app.services.distances import schedule_backfill
+            schedule_backfill()
+            logger.debug("rechnung_drafts: Entfernung fehlt noch – auftrag_id=%s", auftrag_id)
+        except Exception:
+            logger.exception("rechnung_drafts: Vorab-Rendering fehlgeschlagen – auftrag_id=%s", auftrag_id)
+        finally:
+            db.session.info.pop(_WORKER_KEY, None)
+
+
+def _affected_auftrag_ids(session: Session, objs) -> set[int]:
+    """Aufträge, deren Rechnung von den geänderten Objekten abhängt."""
+    ids: set[int] = set()
+    adresse_ids, patient_ids, behoerde_ids, institut_ids = set(), set(), set(), set()
+
+    for obj in objs:
+        if isinstance(obj, Auftrag):
+            if obj.id is not None:
+                ids.add(obj.id)
+        elif isinstance(obj, Patient):
+            patient_ids.add(obj.id)
+        elif isinstance(obj, Angehoeriger):
+            patient_ids.add(obj.patient_id)
+        elif isinstance(obj, Adresse):
+            adresse_ids.add(obj.id)
+        elif isinstance(obj, Behoerde):
+            behoerde_ids.add(obj.id)
+        elif isinstance(obj, Bestattungsinstitut):
+            institut_ids.add(obj.id)
+
+    conds = []
+    if patient_ids:
+        conds.append(Auftrag.patient_id.in_(patient_ids))
+    if institut_ids:
+        conds.append(Auftrag.bestattungsinstitut_id.in_(institut_ids))
+    if adresse_ids:
+        conds += [
+            Auftrag.auftragsadresse_id.in_(adresse_ids),
+            Auftrag.patient_id.in_(
+                select(Angehoeriger.patient_id).where(Angehoeriger.adresse_id.in_(adresse_ids))
+            ),
+            Auftrag.bestattungsinstitut_id.in_(
+                select(Bestattungsinstitut.id).where(Bestattungsinstitut.adresse_id.in_(adresse_ids))
+            ),
+        ]
+        behoerde_ids |= set(session.connection().execute(
+            select(Behoerde.id).where(Behoerde.adresse_id.in_(adresse_ids))
+        ).scalars())
+    if behoerde_ids:
+        conds.append(Auftrag.id.in_(
+            select(auftrag_behoerde.c.auftrag_id).where(auftrag_behoerde.c.behoerde_id.in_(behoerde_ids))
+        ))
+
+    if conds:
+        # connection() statt session.execute: kein Autoflush innerhalb des Flushs
+        ids |= set(session.connection().execute(select(Auftrag.id).where(or_(*conds))).scalars())
+    return ids
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    if session.info.get(_WORKER_KEY):
+        return
+    changed = [*session.new, *session.dirty, *session.deleted]
+    if not changed:
+        return
+    try:
+        ids = _affected_auftrag_ids(session, changed)
+    except Exception:
+        logger.exception("rechnung_drafts: betroffene Aufträge nicht ermittelbar")
+        return
+    if ids:
+        session.info.setdefault(_SESSION_KEY, set()).update(ids)
+
+
+def _after_commit(session: Session) -> None:
+    ids = session.info.pop(_SESSION_KEY, None)
+    if not ids:
+        return
+    invalidate(ids)
+    # der Worker prüft selbst, ob der Auftrag (noch) READY ist
+    schedule_prerender(sorted(ids))
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+_listening = False
+
+
+def init_app(app) -> None:
+    global _listening
+    if not _listening:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _listening = True
+    app.extensions["rechnung_drafts"] = True
@@ -2,11 +2,17 @@
 from datetime import date, time
 from lsb_app.viewmodels.rechnung_vm import RechnungVM, LeistungVM
 from lsb_app.models import RechnungsadressModus
-from lsb_app.extensions import db
 from markupsafe import Markup
 from decimal import Decimal, ROUND_HALF_UP
 import holidays
-from lsb_app.services.entfernungsrechner import berechne_entfernung
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EntfernungFehlt(ValueError):
+    """Die Auftragsadresse hat (noch) keine Entfernung – Rechnung kann nicht berechnet werden."""
+
 
 def wegegeld_berechnen(dist, uhr) -> str:
     if time(8, 0) <= uhr <= time(20, 0):
@@ -112,26 +118,14 @@ def build_rechnung_vm(auftrag, cfg, rechnungsdatum: date, rechnungsart: str) ->
             betrag="19,82"
         ))
     
-    fahrstrecke = None
-
-    if not auftrag.auftragsadresse.distanz:
-        try:
-            strasse = f"{auftrag.auftragsadresse.strasse} {auftrag.auftragsadresse.hausnummer}"
-            plz = auftrag.auftragsadresse.plz
-            ort = auftrag.auftragsadresse.ort
-            fahrstrecke = berechne_entfernung(strasse=strasse,
-                                    plz=plz,
-                                    ort=ort)
-            
-            if fahrstrecke is not None:
-                auftrag.auftragsadresse.distanz = fahrstrecke
-                db.session.add(auftrag.auftragsadresse)
-                db.session.commit()
-
-        except Exception as e:
-            print(f"Fehler: {e}")
-    else:
-        fahrstrecke = auftrag.auftragsadresse.distanz
+    # Entfernung wird beim Anlegen/Bearbeiten der Adresse aufgelöst (siehe
+    # services/distances.py); hier kein Netz, keine DB, keine Seiteneffekte
+    fahrstrecke = auftrag.auftragsadresse.distanz
+    if fahrstrecke is None:
+        raise EntfernungFehlt(
+            f"Entfernung für Auftrag {auftrag.auftragsnummer or auftrag.id} noch nicht berechnet "
+            "(läuft im Hintergrund, sonst `flask distances backfill` oder Adresse bearbeiten)."
+        )
 
     wg_text, wg_betrag = wegegeld_berechnen(fahrstrecke, uhrzeit)
 
@@ -18,7 +18,7 @@ from lsb_app.models.enums import (
     RechnungsArtEnum,
     RechnungsStatusEnum,
 )
-from lsb_app.blueprints.rechnungen.routes import create_rechnung_for_auftrag
+from lsb_app.blueprints.rechnungen.routes import create_rechnung_for_auftrag, render_pdfs_for_rechnungen
 
 # Deutscher Faker (für Namen / Adressen)
 fake = Faker("de_DE")
@@ -319,8 +319,11 @@ def seed_data():
     - Patient
     - Auftrag
     - Verlaufseinträge
+    - PDFs der angelegten Rechnungen (über den Render-Pool)
     """
 
+    rechnungen: list[Rechnung] = []
+
     #TODO Auftragsadresse != und == Meldeadresse
 
     # READY + Kostenstelle Bestattungsinstitut - Angehörige - Behörde
@@ -466,7 +469,7 @@ def seed_data():
             auftragsadresse_id=adresse.id
         )
 
-        create_rechnung(
+        rechnung = create_rechnung(
             has=RechnungHas(
                 gesendet_datum=True,
             ),
@@ -474,6 +477,7 @@ def seed_data():
             status=RechnungsStatusEnum.SENT,
             auftrag_id=auftrag.id,
         )
+        rechnungen.append(rechnung)
 
         create_verlauf(
             auftrag_id=auftrag.id,
@@ -511,7 +515,7 @@ def seed_data():
             auftragsadresse_id=adresse.id
         )
 
-        create_rechnung(
+        rechnung = create_rechnung(
             has=RechnungHas(
                 gesendet_datum=True,
             ),
@@ -519,6 +523,7 @@ def seed_data():
             status=RechnungsStatusEnum.SENT,
             auftrag_id=auftrag.id,
         )
+        rechnungen.append(rechnung)
 
         create_verlauf(
             auftrag_id=auftrag.id,
@@ -526,4 +531,9 @@ def seed_data():
             datum=auftrag.auftragsdatum,
             ereignis="TB erstellt")
 
+    # PDFs für die Seed-Rechnungen gesammelt rendern (alle Kerne)
+    errors = render_pdfs_for_rechnungen(rechnungen)
+    for rechnung_id, msg in errors.items():
+        print(f"⚠️ PDF für Seed-Rechnung {rechnung_id} fehlgeschlagen: {msg}")
+
     db.session.commit()